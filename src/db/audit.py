@@ -0,0 +1,210 @@
+import atexit
+import datetime
+import json
+import threading
+import weakref
+import zlib
+
+# Payload lớn hơn ngưỡng này (byte) được nén zlib và lưu dạng BLOB
+COMPRESS_THRESHOLD = 512
+
+
+def diff_values(old_values, new_values):
+    """
+    So sánh hai trạng thái bản ghi, chỉ giữ các trường thay đổi
+    Returns:
+        (old_changed, new_changed) - dictionary giá trị cũ/mới của các trường thay đổi
+    """
+    if old_values is None or new_values is None:
+        return old_values, new_values
+
+    old_changed = {}
+    new_changed = {}
+    for key, value in new_values.items():
+        old_value = old_values.get(key)
+        if old_value != value:
+            old_changed[key] = old_value
+            new_changed[key] = value
+    return old_changed, new_changed
+
+
+def encode_payload(values):
+    """
+    Mã hóa giá trị log: JSON text, nén zlib (BLOB) nếu vượt ngưỡng
+    """
+    if values is None:
+        return None
+    text = json.dumps(values, default=str, ensure_ascii=False, separators=(',', ':'))
+    data = text.encode('utf-8')
+    if len(data) > COMPRESS_THRESHOLD:
+        return zlib.compress(data)
+    return text
+
+
+def decode_payload(value):
+    """Giải mã giá trị old_values/new_values (JSON text hoặc BLOB nén)"""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, memoryview)):
+        value = zlib.decompress(bytes(value)).decode('utf-8')
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def reconstruct_state(history, at=None):
+    """
+    Dựng lại trạng thái bản ghi từ lịch sử log
+    Args:
+        history: Danh sách (action, old_values, new_values, timestamp) theo thứ tự thời gian
+        at: Thời điểm cần dựng lại (None: trạng thái mới nhất)
+    Returns:
+        Dictionary trạng thái bản ghi, None nếu chưa tồn tại hoặc đã bị xóa
+    """
+    state = None
+    for action, old_values, new_values, timestamp in history:
+        if at is not None and timestamp and timestamp > at:
+            break
+
+        old_values = decode_payload(old_values)
+        new_values = decode_payload(new_values)
+
+        if isinstance(new_values, dict):
+            if state is None:
+                # Lịch sử bắt đầu giữa chừng: lấy giá trị cũ đã biết làm nền
+                state = dict(old_values) if isinstance(old_values, dict) else {}
+            state.update(new_values)
+        elif new_values is None and old_values is not None and action.startswith('DELETE'):
+            state = None
+    return state
+
+
+class AuditLogWriter:
+    """
+    Ghi SystemLogs bất đồng bộ theo lô
+    Các bản ghi log được đưa vào hàng đợi trong bộ nhớ, một thread nền ghi
+    xuống database khi đủ batch_size bản ghi hoặc sau flush_interval giây
+    """
+
+    COLUMNS = ('user_id', 'action', 'table_name', 'record_id', 'old_values',
+               'new_values', 'ip_address', 'success', 'error_message', 'timestamp')
+
+    INSERT_SQL = (f"INSERT INTO SystemLogs ({', '.join(COLUMNS)}) "
+                  f"VALUES ({', '.join(['?' for _ in COLUMNS])})")
+
+    def __init__(self, db, max_queue=10000, batch_size=200, flush_interval=1.0):
+        """
+        Args:
+            db: Instance Database
+            max_queue: Số log tối đa chờ trong bộ nhớ (đầy thì ghi đồng bộ)
+            batch_size: Số log mỗi lần ghi
+            flush_interval: Thời gian tối đa (giây) một log nằm trong hàng đợi
+        """
+        self.db = db
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+        # Đảm bảo log còn trong hàng đợi được ghi khi thoát chương trình
+        ref = weakref.ref(self)
+        atexit.register(lambda: ref() is not None and ref().close())
+
+    @classmethod
+    def make_entry(cls, data):
+        """Chuyển dictionary log thành tuple theo thứ tự COLUMNS"""
+        if not data.get('timestamp'):
+            # Cùng định dạng (UTC) với CURRENT_TIMESTAMP của SQLite
+            data = dict(data)
+            data['timestamp'] = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        return tuple(data.get(column) for column in cls.COLUMNS)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="AuditLogWriter", daemon=True)
+            self._thread.start()
+
+    def submit(self, entries):
+        """Đưa các log (tuple từ make_entry) vào hàng đợi"""
+        if not entries:
+            return
+
+        if self._closed:
+            self.write(entries)
+            return
+
+        with self._cond:
+            overflow = len(self._buffer) + len(entries) > self.max_queue
+            if not overflow:
+                self._buffer.extend(entries)
+                self._ensure_thread()
+                if len(self._buffer) >= self.batch_size:
+                    self._cond.notify()
+
+        if overflow:
+            # Hàng đợi đầy: ghi phần đang chờ và lô mới ngay trong thread hiện tại
+            self.flush()
+            self.write(entries)
+
+    def write(self, entries):
+        """Ghi đồng bộ các log xuống database"""
+        if entries:
+            self.db.execute_many(self.INSERT_SQL, entries)
+
+    def flush(self):
+        """
+        Ghi toàn bộ log đang chờ
+        Log chỉ được lấy khỏi hàng đợi khi đang giữ khóa ghi, nên khi flush
+        trả về thì mọi log gửi trước đó đều đã nằm trong database
+        """
+        if self.db._in_transaction():
+            # Không ghi log của transaction khác vào transaction đang mở
+            with self._cond:
+                self._cond.notify()
+            return
+
+        with self.db.pool.write_lock:
+            with self._cond:
+                batch = self._buffer
+                self._buffer = []
+            self.write(batch)
+
+    def pending_count(self):
+        """Số log đang chờ ghi"""
+        with self._cond:
+            return len(self._buffer)
+
+    def _run(self):
+        """Vòng lặp của thread ghi nền"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._buffer) >= self.batch_size,
+                    timeout=self.flush_interval
+                )
+                if self._closed:
+                    return
+                if not self._buffer:
+                    continue
+
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Audit log error: {e}")
+
+    def close(self):
+        """Dừng thread nền và ghi nốt log còn lại"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
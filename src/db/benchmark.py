@@ -0,0 +1,174 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from src.db.migrations import ACTIVE_EMPLOYEE_INDEXES, INITIAL_INDEXES
+
+# Index của Employees trước migration 2 (để đo lại trạng thái cũ)
+_LEGACY_EMPLOYEE_INDEXES = [sql for sql in INITIAL_INDEXES if " ON Employees(" in sql]
+
+
+def _index_name(index_sql):
+    return index_sql.split(" IF NOT EXISTS ", 1)[1].split(" ", 1)[0]
+
+
+def seed_employees(db, count=100000, deleted_ratio=0.3, seed=42):
+    """
+    Tạo dữ liệu nhân viên mẫu (một phần đã xóa mềm)
+    Args:
+        count: Số nhân viên
+        deleted_ratio: Tỷ lệ nhân viên có status 'Deleted'
+        seed: Seed ngẫu nhiên (dữ liệu cố định giữa các lần chạy)
+    """
+    rng = random.Random(seed)
+    departments = ['IT', 'HR', 'Marketing', 'Sales', 'Finance', 'Operations']
+    last_names = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Vũ', 'Đặng', 'Bùi']
+
+    db.bulk_insert('Employees', [
+        {
+            'id': f"EMP{i:06d}",
+            'name': f"{rng.choice(last_names)} Văn {rng.randint(1, 50000)}",
+            'department': rng.choice(departments),
+            'salary': rng.randint(8, 50) * 1000000,
+            'join_date': f"20{rng.randint(15, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'email': f"emp{i}@company.com",
+            'position': rng.choice(['Developer', 'Manager', 'Specialist', 'Intern']),
+            'status': 'Deleted' if rng.random() < deleted_ratio else 'Active'
+        }
+        for i in range(1, count + 1)
+    ], chunk_size=5000)
+    db.execute("ANALYZE")
+
+
+def use_legacy_indexes(db):
+    """Đưa Employees về bộ index trước migration 2"""
+    with db.transaction():
+        for index_sql in ACTIVE_EMPLOYEE_INDEXES:
+            db.execute(f"DROP INDEX IF EXISTS {_index_name(index_sql)}")
+        for index_sql in _LEGACY_EMPLOYEE_INDEXES:
+            db.execute(index_sql)
+    db.execute("ANALYZE Employees")
+
+
+def use_active_indexes(db):
+    """Bộ index của migration 2 (index một phần cho nhân viên active)"""
+    with db.transaction():
+        for index_sql in ACTIVE_EMPLOYEE_INDEXES:
+            db.execute(index_sql)
+        db.execute("DROP INDEX IF EXISTS idx_employees_name")
+        db.execute("DROP INDEX IF EXISTS idx_employees_status")
+    db.execute("ANALYZE Employees")
+
+
+def _cases(db):
+    """
+    Các truy vấn được đo: [(tên, hàm)]
+    Danh sách/tra cứu và thống kê nhân viên của EmployeeManager đọc từ danh bạ trong
+    bộ nhớ và bảng DepartmentStats, nên được đo bằng các câu lệnh SQL tương ứng trên Employees
+    """
+    columns = "id, name, department, salary, join_date, email, phone, position"
+    active = db.get_table_count('Employees', "status != 'Deleted'")
+    middle = db.query(
+        "SELECT name, id FROM Employees WHERE status != 'Deleted' ORDER BY name, id LIMIT 1 OFFSET ?",
+        [active // 2]
+    ).fetchone()
+    middle_key = tuple(middle) if middle else None
+
+    def page(after=None):
+        return db.select_page('Employees', columns, "status != 'Deleted'", order_by="name, id", after=after)
+
+    return [
+        ('trang nhân viên', lambda: page()),
+        ('trang nhân viên (giữa danh sách)', lambda: page(middle_key)),
+        ('nhân viên theo phòng ban', lambda: db.select_records(
+            'Employees', columns, "department = ? AND status != 'Deleted'", ['IT'], order_by="name")),
+        ('danh sách phòng ban', lambda: db.select_records(
+            'Employees', "DISTINCT department", "status != 'Deleted' AND department IS NOT NULL",
+            order_by="department")),
+        ('thống kê theo phòng ban', lambda: db.select_records(
+            'Employees', "department, COUNT(*) as count, AVG(salary) as avg_salary", "status != 'Deleted'",
+            order_by="count DESC", group_by="department")),
+        ('lương cao nhất/thấp nhất', lambda: db.select_records(
+            'Employees', "MAX(salary) as max_salary, MIN(salary) as min_salary", "status != 'Deleted'")),
+        ('toàn bộ nhân viên', lambda: db.select_records(
+            'Employees', columns, "status != 'Deleted'", order_by="name, id")),
+    ]
+
+
+def measure(db, repeat=5):
+    """
+    Đo thời gian (trung vị, ms) của từng truy vấn
+    Returns:
+        Dictionary {tên: ms}
+    """
+    results = {}
+    for name, call in _cases(db):
+        call()  # Làm nóng cache trang và cache câu lệnh
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000.0)
+        results[name] = statistics.median(timings)
+    return results
+
+
+def run(employees=100000, deleted_ratio=0.3, repeat=5, db_path=None):
+    """
+    So sánh thời gian các truy vấn nhân viên active với index cũ và index một phần
+    Args:
+        db_path: File database (None: database tạm, xóa sau khi chạy)
+    Returns:
+        Danh sách dictionary {'name', 'legacy_ms', 'active_ms', 'speedup'}
+    """
+    from src.db.database import DatabaseManager
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = DatabaseManager()
+        db = manager.get_database(db_path or os.path.join(tmp_dir, "benchmark.db"))
+        try:
+            seed_employees(db, count=employees, deleted_ratio=deleted_ratio)
+
+            use_legacy_indexes(db)
+            legacy = measure(db, repeat)
+
+            use_active_indexes(db)
+            active = measure(db, repeat)
+        finally:
+            manager.close_database()
+
+    return [
+        {
+            'name': name,
+            'legacy_ms': legacy[name],
+            'active_ms': active[name],
+            'speedup': legacy[name] / active[name] if active[name] else None
+        }
+        for name in legacy
+    ]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark index một phần cho nhân viên active")
+    parser.add_argument("--employees", type=int, default=100000, help="Số nhân viên")
+    parser.add_argument("--deleted-ratio", type=float, default=0.3, help="Tỷ lệ nhân viên đã xóa mềm")
+    parser.add_argument("--repeat", type=int, default=5, help="Số lần đo mỗi truy vấn")
+    parser.add_argument("--db", help="File database (mặc định: database tạm)")
+    args = parser.parse_args(argv)
+
+    results = run(args.employees, args.deleted_ratio, args.repeat, args.db)
+
+    print(f"{args.employees} nhân viên, {args.deleted_ratio:.0%} đã xóa mềm, trung vị {args.repeat} lần đo")
+    print(f"{'Truy vấn':<42}{'Index cũ (ms)':>15}{'Index mới (ms)':>16}{'Tăng tốc':>10}")
+    for item in results:
+        speedup = f"{item['speedup']:.1f}x" if item['speedup'] else "-"
+        print(f"{item['name']:<42}{item['legacy_ms']:>15.2f}{item['active_ms']:>16.2f}{speedup:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
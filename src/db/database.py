@@ -1,14 +1,127 @@
 import sqlite3
 import datetime
 import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from src.db.pool import ConnectionPool
+from src.db.sequences import SequenceAllocator
+from src.db.audit import AuditLogWriter, diff_values, encode_payload, reconstruct_state
+from src.db.log_retention import LogRetentionManager
+from src.db.migrations import MigrationRunner, ROLLUP_REBUILDS
+from src.db import fulltext
+from src.db.normalize import normalize_row, normalized_columns, prefix_range, NORMALIZED_COLUMNS
+from src.db import statements
+from src.db.instrumentation import QueryStats, find_caller
+
+
+class QueryResult:
+    """
+    Kết quả truy vấn gắn với cursor riêng
+    Có thể đọc từng phần (fetchmany) hoặc duyệt bằng vòng lặp for
+    """
+
+    def __init__(self, cursor, arraysize=500, on_close=None):
+        """
+        Args:
+            on_close: Hàm on_close(rows, fetch_time) gọi một lần khi đóng kết quả
+                      (dùng cho thống kê truy vấn)
+        """
+        self._cursor = cursor
+        self._cursor.arraysize = arraysize
+        self._on_close = on_close
+        self._rows = 0
+        self._fetch_time = 0.0
+
+    def _fetch(self, method, *args):
+        """Gọi hàm fetch của cursor, đếm số hàng và thời gian đọc"""
+        start = time.perf_counter()
+        result = method(*args)
+        self._fetch_time += time.perf_counter() - start
+        if isinstance(result, list):
+            self._rows += len(result)
+        elif result is not None:
+            self._rows += 1
+        return result
+
+    @property
+    def columns(self):
+        """Tên các cột trong kết quả"""
+        if self._cursor.description is None:
+            return []
+        return [desc[0] for desc in self._cursor.description]
+
+    @property
+    def rowcount(self):
+        """Số hàng bị ảnh hưởng (INSERT/UPDATE/DELETE)"""
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        """ID của bản ghi vừa được insert"""
+        return self._cursor.lastrowid
+
+    def fetchone(self):
+        """Lấy hàng tiếp theo"""
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        """Lấy tối đa size hàng tiếp theo"""
+        return self._fetch(self._cursor.fetchmany, size or self._cursor.arraysize)
+
+    def fetchall(self):
+        """Lấy toàn bộ các hàng còn lại và đóng cursor"""
+        rows = self._fetch(self._cursor.fetchall)
+        self.close()
+        return rows
+
+    def scalar(self, default=None):
+        """Lấy giá trị cột đầu tiên của hàng đầu tiên"""
+        row = self._fetch(self._cursor.fetchone)
+        self.close()
+        return row[0] if row and row[0] is not None else default
+
+    def __iter__(self):
+        """Duyệt kết quả theo từng lô fetchmany"""
+        try:
+            while True:
+                rows = self._fetch(self._cursor.fetchmany)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            self.close()
+
+    def close(self):
+        """Đóng cursor, giải phóng snapshot đọc"""
+        if self._on_close is not None:
+            on_close, self._on_close = self._on_close, None
+            rows = self._rows if self._cursor.description is not None else self._cursor.rowcount
+            on_close(rows, self._fetch_time)
+
+        try:
+            self._cursor.close()
+        except sqlite3.Error:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
 
 class Database:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, async_audit=True, slow_query_ms=100.0, track_callers=False):
         """
         Khởi tạo kết nối database
         Args:
             db_path: Đường dẫn đến file database
+            async_audit: Ghi SystemLogs bất đồng bộ theo lô (False: ghi ngay)
+            slow_query_ms: Ngưỡng ghi slow query log (ms), None để tắt
+            track_callers: Ghi hàm gọi cho mọi câu lệnh (mặc định chỉ câu lệnh chậm)
         """
         # Nếu không có db_path, tạo file database cùng cấp với file database.py
         if db_path is None:
@@ -21,217 +134,89 @@ class Database:
             os.makedirs(db_dir)
 
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-
-        # Cấu hình database
-        self.conn.execute("PRAGMA foreign_keys = ON")
-        self.conn.execute("PRAGMA journal_mode = WAL")
-
-        self._create_tables()
-
-    def _create_tables(self):
-        """Tạo tất cả các bảng cần thiết"""
-
-        # Bảng Employees - Thông tin nhân viên
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Employees (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                department TEXT NOT NULL,
-                salary REAL NOT NULL,
-                join_date TEXT NOT NULL,
-                phone TEXT,
-                email TEXT,
-                position TEXT,
-                status TEXT DEFAULT 'Active',
-                created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                updated_date TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Bảng Attendance - Chấm công
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Attendance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                attendance_id TEXT UNIQUE,
-                employee_id TEXT NOT NULL,
-                date TEXT NOT NULL,
-                time_in TEXT NOT NULL,
-                time_out TEXT NOT NULL,
-                work_hours REAL,
-                overtime_hours REAL DEFAULT 0,
-                status TEXT DEFAULT 'Present',
-                notes TEXT,
-                created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES Employees(id)
-            )
-        """)
-
-        # Bảng Candidates - Ứng viên
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Candidates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                candidate_id TEXT UNIQUE,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                phone TEXT,
-                position TEXT NOT NULL,
-                experience INTEGER DEFAULT 0,
-                education TEXT,
-                skills TEXT,
-                status TEXT DEFAULT 'Chờ xử lý',
-                application_date TEXT DEFAULT CURRENT_DATE,
-                interview_date TEXT,
-                notes TEXT,
-                resume_path TEXT,
-                created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                updated_date TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Bảng Feedbacks - Phản hồi nhân viên
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Feedbacks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                feedback_id TEXT UNIQUE,
-                employee_id TEXT NOT NULL,
-                category TEXT DEFAULT 'Chung',
-                priority TEXT DEFAULT 'Thấp',
-                subject TEXT,
-                content TEXT NOT NULL,
-                status TEXT DEFAULT 'Chờ xử lý',
-                is_anonymous BOOLEAN DEFAULT 0,
-                created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                updated_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                handler TEXT,
-                response TEXT,
-                response_date TEXT
-            )
-        """)
-
-        # Bảng AdminResponses - Phản hồi của admin (để tương thích)
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS AdminResponses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                response_id TEXT UNIQUE,
-                feedback_id TEXT NOT NULL,
-                response TEXT NOT NULL,
-                created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (feedback_id) REFERENCES Feedbacks(feedback_id)
-            )
-        """)
-
-        # Bảng Payrolls - Bảng lương chi tiết
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Payrolls (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                payroll_id TEXT UNIQUE,
-                employee_id TEXT NOT NULL,
-                month INTEGER NOT NULL,
-                year INTEGER NOT NULL,
-                basic_salary REAL NOT NULL,
-                work_days INTEGER DEFAULT 22,
-                actual_work_days INTEGER DEFAULT 22,
-                absent_days INTEGER DEFAULT 0,
-                overtime_hours REAL DEFAULT 0,
-                overtime_pay REAL DEFAULT 0,
-                allowances REAL DEFAULT 0,
-                lunch_allowance REAL DEFAULT 0,
-                transport_allowance REAL DEFAULT 0,
-                performance_bonus REAL DEFAULT 0,
-                other_bonus REAL DEFAULT 0,
-                gross_salary REAL NOT NULL,
-                social_insurance REAL DEFAULT 0,
-                health_insurance REAL DEFAULT 0,
-                unemployment_insurance REAL DEFAULT 0,
-                tax_deduction REAL DEFAULT 0,
-                other_deductions REAL DEFAULT 0,
-                total_deductions REAL DEFAULT 0,
-                net_salary REAL NOT NULL,
-                status TEXT DEFAULT 'Draft',
-                notes TEXT,
-                created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                updated_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES Employees(id)
-            )
-        """)
-
-        # Bảng SalaryComponents - Các thành phần lương
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS SalaryComponents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id TEXT NOT NULL,
-                component_type TEXT NOT NULL, -- 'allowance', 'bonus', 'deduction'
-                component_name TEXT NOT NULL,
-                amount REAL NOT NULL,
-                is_recurring BOOLEAN DEFAULT 1,
-                effective_date TEXT,
-                end_date TEXT,
-                created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES Employees(id)
-            )
-        """)
-
-        # Bảng UserSessions - Phiên đăng nhập (cho tương lai)
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS UserSessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                session_token TEXT UNIQUE,
-                login_time TEXT DEFAULT CURRENT_TIMESTAMP,
-                logout_time TEXT,
-                ip_address TEXT,
-                user_agent TEXT,
-                is_active BOOLEAN DEFAULT 1
-            )
-        """)
-
-        # Bảng SystemLogs - Log hệ thống
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS SystemLogs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT,
-                action TEXT NOT NULL,
-                table_name TEXT,
-                record_id TEXT,
-                old_values TEXT,
-                new_values TEXT,
-                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                ip_address TEXT,
-                success BOOLEAN DEFAULT 1,
-                error_message TEXT
-            )
-        """)
-
-        # Tạo các index để tối ưu hiệu suất
-        self._create_indexes()
-
-        self.conn.commit()
-
-    def _create_indexes(self):
-        """Tạo các index để tối ưu hiệu suất truy vấn"""
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_employees_department ON Employees(department)",
-            "CREATE INDEX IF NOT EXISTS idx_employees_status ON Employees(status)",
-            "CREATE INDEX IF NOT EXISTS idx_attendance_employee_date ON Attendance(employee_id, date)",
-            "CREATE INDEX IF NOT EXISTS idx_attendance_date ON Attendance(date)",
-            "CREATE INDEX IF NOT EXISTS idx_candidates_status ON Candidates(status)",
-            "CREATE INDEX IF NOT EXISTS idx_candidates_position ON Candidates(position)",
-            "CREATE INDEX IF NOT EXISTS idx_feedbacks_employee ON Feedbacks(employee_id)",
-            "CREATE INDEX IF NOT EXISTS idx_feedbacks_status ON Feedbacks(status)",
-            "CREATE INDEX IF NOT EXISTS idx_feedbacks_category ON Feedbacks(category)",
-            "CREATE INDEX IF NOT EXISTS idx_payrolls_employee_month ON Payrolls(employee_id, month, year)",
-            "CREATE INDEX IF NOT EXISTS idx_payrolls_month_year ON Payrolls(month, year)",
-            "CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON SystemLogs(timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_system_logs_user ON SystemLogs(user_id)"
-        ]
 
-        for index_sql in indexes:
+        # Thống kê thời gian thực thi và slow query log
+        self.stats = QueryStats(slow_threshold_ms=slow_query_ms, track_callers=track_callers)
+
+        # Pool kết nối: một kết nối ghi + kết nối chỉ đọc riêng cho mỗi thread
+        self.pool = ConnectionPool(db_path)
+        self.conn = self.pool.writer
+
+        # Trạng thái riêng của từng thread (cursor cuối cùng, transaction)
+        self._local = threading.local()
+
+        # Cấp phát mã nghiệp vụ (ATT, PAY, FB, CAN, RES)
+        self.sequences = SequenceAllocator(self)
+
+        # Ghi log hệ thống theo lô ở thread nền
+        self.async_audit = async_audit
+        self.audit = AuditLogWriter(self)
+
+        # Lưu trữ log cũ sang file theo tháng
+        self.log_retention = LogRetentionManager(self)
+
+        # Bảng FTS hiện có trong database (nạp khi cần)
+        self._fulltext_tables = None
+
+        # Cache trong bộ nhớ theo bảng (vd: danh bạ nhân viên): {bảng: WeakSet}
+        self._table_caches = {}
+
+        # Schema theo phiên bản (PRAGMA user_version)
+        self.migrations = MigrationRunner(self)
+        self.migrations.migrate()
+
+    @property
+    def cursor(self):
+        """Cursor của câu lệnh cuối cùng trong thread hiện tại"""
+        cur = getattr(self._local, 'cursor', None)
+        if cur is None:
+            cur = self.conn.cursor()
+            self._local.cursor = cur
+        return cur
+
+    def _in_transaction(self):
+        """Thread hiện tại có đang giữ transaction ghi không"""
+        return self._tx_depth() > 0
+
+    def _tx_depth(self):
+        """Độ sâu transaction lồng nhau của thread hiện tại"""
+        return getattr(self._local, 'tx_depth', 0)
+
+    @staticmethod
+    def _is_read_query(query):
+        """Câu lệnh chỉ đọc có thể chạy trên kết nối reader"""
+        head = query.lstrip()[:7].upper()
+        return head.startswith('SELECT') or head.startswith('WITH') or head.startswith('EXPLAIN')
+
+    def _set_cursor(self, cur):
+        """Lưu cursor mới cho thread hiện tại, đóng cursor cũ"""
+        old = getattr(self._local, 'cursor', None)
+        if old is not None:
             try:
-                self.cursor.execute(index_sql)
-            except sqlite3.Error as e:
-                print(f"Warning: Could not create index: {e}")
+                old.close()
+            except sqlite3.Error:
+                pass
+        self._local.cursor = cur
+
+    def _caller(self):
+        """Hàm gọi ngoài package database (chỉ tìm khi bật track_callers)"""
+        return find_caller('src.db.') if self.stats.enabled and self.stats.track_callers else None
+
+    def _record_query(self, query, params, elapsed, rows, caller):
+        """Ghi nhận thời gian thực thi vào thống kê (câu lệnh chậm luôn kèm hàm gọi)"""
+        if caller is None and self.stats.enabled and self.stats.is_slow(elapsed):
+            caller = find_caller('src.db.')
+        self.stats.record(query, elapsed, rows, caller, params, explain=self.explain_query_plan)
+
+    def explain_query_plan(self, query, params=None):
+        """
+        Kế hoạch thực thi của câu lệnh
+        Returns:
+            Danh sách mô tả từng bước (cột detail của EXPLAIN QUERY PLAN)
+        """
+        with self.pool.cursor(readonly=True) as cur:
+            cur.execute(f"EXPLAIN QUERY PLAN {query}", params or ())
+            return [row[3] for row in cur.fetchall()]
 
     def execute(self, query, params=None):
         """
@@ -240,16 +225,75 @@ class Database:
             query: Câu lệnh SQL
             params: Tham số cho câu lệnh SQL
         """
+        caller = self._caller()
         try:
-            if params:
-                self.cursor.execute(query, params)
+            start = time.perf_counter()
+            if self._is_read_query(query) and not self._in_transaction():
+                cur = self.pool.reader().cursor()
+                self._set_cursor(cur)
+                cur.execute(query, params or ())
             else:
-                self.cursor.execute(query)
+                with self.pool.write_lock:
+                    cur = self.conn.cursor()
+                    self._set_cursor(cur)
+                    cur.execute(query, params or ())
+            self._record_query(query, params, time.perf_counter() - start, cur.rowcount, caller)
             return True
         except sqlite3.Error as e:
+            self.stats.record_error(query, caller)
             print(f"Database error: {e}")
             return False
 
+    def query(self, query, params=None, arraysize=500):
+        """
+        Thực thi câu lệnh SQL trên cursor riêng và trả về kết quả
+        Args:
+            query: Câu lệnh SQL
+            params: Tham số cho câu lệnh SQL
+            arraysize: Số hàng mỗi lần fetchmany
+        Returns:
+            QueryResult (raise sqlite3.Error nếu lỗi)
+        """
+        caller = self._caller()
+        try:
+            start = time.perf_counter()
+            if self._is_read_query(query) and not self._in_transaction():
+                cur = self.pool.reader().cursor()
+                cur.execute(query, params or ())
+            else:
+                with self.pool.write_lock:
+                    cur = self.conn.cursor()
+                    cur.execute(query, params or ())
+            elapsed = time.perf_counter() - start
+        except sqlite3.Error:
+            self.stats.record_error(query, caller)
+            raise
+
+        if not self.stats.enabled:
+            return QueryResult(cur, arraysize)
+
+        # Thời gian tính cả phần đọc kết quả, ghi nhận khi QueryResult đóng
+        def record(rows, fetch_time):
+            self._record_query(query, params, elapsed + fetch_time, rows, caller)
+        return QueryResult(cur, arraysize, record)
+
+    def stream(self, query, params=None, batch_size=500):
+        """
+        Đọc kết quả theo từng lô, không nạp toàn bộ vào bộ nhớ
+        Args:
+            query: Câu lệnh SELECT
+            params: Tham số cho câu lệnh SQL
+            batch_size: Số hàng mỗi lô
+        Yields:
+            Danh sách tối đa batch_size hàng
+        """
+        with self.query(query, params, arraysize=batch_size) as result:
+            while True:
+                rows = result.fetchmany()
+                if not rows:
+                    break
+                yield rows
+
     def execute_many(self, query, params_list):
         """
         Thực thi nhiều câu lệnh SQL cùng lúc
@@ -257,12 +301,28 @@ class Database:
             query: Câu lệnh SQL
             params_list: Danh sách các tham số
         """
-        try:
-            self.cursor.executemany(query, params_list)
-            return True
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return False
+        caller = self._caller()
+        with self.pool.write_lock:
+            own_tx = not self._in_transaction()
+            try:
+                if own_tx:
+                    self.begin_transaction()
+                cur = self.conn.cursor()
+                self._set_cursor(cur)
+                start = time.perf_counter()
+                cur.executemany(query, params_list)
+                elapsed = time.perf_counter() - start
+                if own_tx:
+                    self.commit()
+                first_params = params_list[0] if isinstance(params_list, list) and params_list else None
+                self._record_query(query, first_params, elapsed, cur.rowcount, caller)
+                return True
+            except sqlite3.Error as e:
+                self.stats.record_error(query, caller)
+                print(f"Database error: {e}")
+                if own_tx:
+                    self.rollback()
+                return False
 
     def fetch_all(self):
         """Lấy tất cả kết quả từ câu lệnh SELECT cuối cùng"""
@@ -273,26 +333,133 @@ class Database:
         return self.cursor.fetchone()
 
     def commit(self):
-        """Commit các thay đổi"""
+        """
+        Commit các thay đổi
+        Trong transaction lồng nhau chỉ giải phóng savepoint hiện tại,
+        transaction ngoài cùng mới thực sự COMMIT
+        """
+        depth = self._tx_depth()
+        committed = False
         try:
-            self.conn.commit()
+            with self.pool.write_lock:
+                if depth > 1:
+                    self.conn.execute(f"RELEASE SAVEPOINT sp_{depth - 1}")
+                else:
+                    self.conn.commit()
+            committed = True
             return True
         except sqlite3.Error as e:
             print(f"Commit error: {e}")
+            if depth == 1:
+                # Không để transaction treo khi COMMIT thất bại
+                self._rollback_quietly()
             return False
+        finally:
+            self._end_transaction(committed)
 
     def rollback(self):
-        """Rollback các thay đổi"""
+        """
+        Rollback các thay đổi
+        Trong transaction lồng nhau chỉ rollback về savepoint hiện tại
+        """
+        depth = self._tx_depth()
         try:
-            self.conn.rollback()
+            with self.pool.write_lock:
+                if depth > 1:
+                    self.conn.execute(f"ROLLBACK TO SAVEPOINT sp_{depth - 1}")
+                    self.conn.execute(f"RELEASE SAVEPOINT sp_{depth - 1}")
+                else:
+                    self.conn.rollback()
             return True
         except sqlite3.Error as e:
             print(f"Rollback error: {e}")
             return False
+        finally:
+            self.sequences.discard_blocks()
+            self._end_transaction()
+
+    def _rollback_quietly(self):
+        try:
+            self.conn.rollback()
+        except sqlite3.Error:
+            pass
+        self.sequences.discard_blocks()
 
     def begin_transaction(self):
-        """Bắt đầu transaction"""
-        self.execute("BEGIN TRANSACTION")
+        """
+        Bắt đầu transaction (giữ khóa ghi cho tới khi commit/rollback)
+        Gọi lồng nhau sẽ tạo SAVEPOINT thay vì transaction mới
+        """
+        depth = self._tx_depth()
+        if depth == 0:
+            self.pool.write_lock.acquire()
+        try:
+            if depth == 0:
+                self.conn.execute("BEGIN")
+            else:
+                self.conn.execute(f"SAVEPOINT sp_{depth}")
+        except sqlite3.Error as e:
+            if depth == 0:
+                self.pool.write_lock.release()
+            print(f"Database error: {e}")
+            return False
+        self._local.tx_depth = depth + 1
+        self._pending_logs().append([])
+        return True
+
+    def _pending_logs(self):
+        """Log chờ commit của thread hiện tại, mỗi mức transaction một danh sách"""
+        pending = getattr(self._local, 'pending_logs', None)
+        if pending is None:
+            pending = []
+            self._local.pending_logs = pending
+        return pending
+
+    def _end_transaction(self, committed=False):
+        """
+        Giảm độ sâu transaction, nhả khóa ghi khi thoát transaction ngoài cùng
+        Log của mức vừa kết thúc được chuyển lên mức cha khi commit savepoint,
+        đưa vào hàng đợi ghi khi commit transaction ngoài cùng, bị bỏ khi rollback
+        """
+        depth = self._tx_depth()
+        if depth == 0:
+            return
+        self._local.tx_depth = depth - 1
+
+        pending_stack = self._pending_logs()
+        entries = pending_stack.pop() if pending_stack else []
+        if committed and depth > 1 and pending_stack:
+            pending_stack[-1].extend(entries)
+
+        if depth == 1:
+            self.pool.write_lock.release()
+            if committed:
+                self.audit.submit(entries)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work: commit khi khối with kết thúc, rollback khi có exception
+        Các khối lồng nhau dùng SAVEPOINT, chỉ khối ngoài cùng mới COMMIT
+        Ví dụ:
+            with db.transaction():
+                db.insert_record(...)
+                db.log_action(...)
+        """
+        if not self.begin_transaction():
+            raise sqlite3.OperationalError("Không thể bắt đầu transaction")
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        else:
+            if not self.commit():
+                raise sqlite3.OperationalError("Không thể commit transaction")
+
+    def next_id(self, prefix):
+        """Lấy mã nghiệp vụ kế tiếp (ví dụ: next_id('ATT') -> 'ATT000123')"""
+        return self.sequences.next_id(prefix)
 
     def get_last_insert_id(self):
         """Lấy ID của bản ghi vừa được insert"""
@@ -302,26 +469,50 @@ class Database:
         """Lấy số lượng hàng bị ảnh hưởng bởi câu lệnh cuối cùng"""
         return self.cursor.rowcount
 
+    def get_data_version(self, blocking=True):
+        """
+        PRAGMA data_version của kết nối ghi: thay đổi khi kết nối khác (process khác)
+        commit vào database, không đổi với thay đổi qua chính instance này
+        Args:
+            blocking: False để trả về None thay vì chờ khi kết nối ghi đang bận
+        """
+        if not self.pool.write_lock.acquire(blocking=blocking):
+            return None
+        try:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+        finally:
+            self.pool.write_lock.release()
+
     # Các phương thức tiện ích cho từng bảng
 
     def get_table_info(self, table_name):
         """Lấy thông tin cấu trúc bảng"""
-        self.execute(f"PRAGMA table_info({table_name})")
-        return self.fetch_all()
+        return self.query(f"PRAGMA table_info({table_name})").fetchall()
 
     def table_exists(self, table_name):
-        """Kiểm tra bảng có tồn tại không"""
-        self.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-        return self.fetch_one() is not None
+        """Kiểm tra bảng (hoặc view, vd: Attendance) có tồn tại không"""
+        result = self.query("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name=?", (table_name,))
+        return result.scalar() is not None
 
     def get_table_count(self, table_name, condition=None, params=None):
         """Đếm số lượng bản ghi trong bảng"""
-        query = f"SELECT COUNT(*) FROM {table_name}"
-        if condition:
-            query += f" WHERE {condition}"
-        self.execute(query, params)
-        result = self.fetch_one()
-        return result[0] if result else 0
+        query = statements.build_count(table_name, condition)
+        try:
+            return self.query(query, params).scalar(0)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return 0
+
+    def record_exists(self, table_name, condition, params=None):
+        """Kiểm tra có bản ghi thỏa điều kiện không (dừng ở hàng đầu tiên)"""
+        try:
+            return self.query(statements.build_exists(table_name, condition), params).scalar() is not None
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return False
 
     def insert_record(self, table_name, data):
         """
@@ -330,16 +521,38 @@ class Database:
             table_name: Tên bảng
             data: Dictionary chứa dữ liệu {column: value}
         """
-        columns = ', '.join(data.keys())
-        placeholders = ', '.join(['?' for _ in data])
-        query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
+        data = normalize_row(table_name, data)
+        query = statements.build_insert(table_name, tuple(data))
 
+        # Không commit ở đây: ngoài transaction kết nối ghi ở chế độ autocommit,
+        # trong transaction việc commit do khối ngoài cùng quyết định
         success = self.execute(query, list(data.values()))
         if success:
-            self.commit()
             return self.get_last_insert_id()
         return None
 
+    def upsert_record(self, table_name, data, conflict_columns, update_columns=None):
+        """
+        Insert bản ghi, hoặc cập nhật bản ghi trùng khóa (INSERT ... ON CONFLICT)
+        Args:
+            table_name: Tên bảng
+            data: Dictionary chứa dữ liệu {column: value}
+            conflict_columns: Các cột của ràng buộc UNIQUE
+            update_columns: Các cột cập nhật khi trùng (mặc định: mọi cột không
+                thuộc conflict_columns; rỗng: DO NOTHING)
+        Returns:
+            Số hàng đã ghi (0: trùng khóa và không cập nhật), None nếu có lỗi
+        """
+        data = normalize_row(table_name, data)
+        if table_name in NORMALIZED_COLUMNS and update_columns:
+            update_columns = normalized_columns(table_name, update_columns)
+        query = statements.build_insert(table_name, tuple(data), conflict_columns, update_columns)
+
+        success = self.execute(query, list(data.values()))
+        if success:
+            return self.get_row_count()
+        return None
+
     def update_record(self, table_name, data, condition, condition_params=None):
         """
         Cập nhật bản ghi
@@ -349,8 +562,8 @@ class Database:
             condition: Điều kiện WHERE
             condition_params: Tham số cho điều kiện
         """
-        set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
-        query = f"UPDATE {table_name} SET {set_clause} WHERE {condition}"
+        data = normalize_row(table_name, data)
+        query = statements.build_update(table_name, tuple(data), condition)
 
         params = list(data.values())
         if condition_params:
@@ -358,7 +571,6 @@ class Database:
 
         success = self.execute(query, params)
         if success:
-            self.commit()
             return self.get_row_count()
         return 0
 
@@ -370,13 +582,97 @@ class Database:
             condition: Điều kiện WHERE
             params: Tham số cho điều kiện
         """
-        query = f"DELETE FROM {table_name} WHERE {condition}"
+        query = statements.build_delete(table_name, condition)
         success = self.execute(query, params)
         if success:
-            self.commit()
             return self.get_row_count()
         return 0
 
+    def _build_select(self, table_name, columns="*", condition=None, order_by=None,
+                      limit=None, group_by=None, joins=None):
+        """Tạo câu lệnh SELECT từ các thành phần (dùng cache mẫu SQL)"""
+        return statements.build_select(table_name, columns, condition, order_by, limit, group_by, joins)
+
+    def bulk_insert(self, table_name, rows, chunk_size=1000):
+        """
+        Insert nhiều bản ghi trong một transaction
+        Args:
+            table_name: Tên bảng
+            rows: Danh sách dictionary {column: value}
+            chunk_size: Số hàng mỗi lần executemany
+        Returns:
+            Dictionary {'processed': số hàng đã ghi, 'failed': [{'index', 'row', 'error'}]}
+        """
+        return self.bulk_upsert(table_name, rows, chunk_size=chunk_size)
+
+    def bulk_upsert(self, table_name, rows, conflict_columns=None, update_columns=None, chunk_size=1000):
+        """
+        Insert/cập nhật nhiều bản ghi bằng executemany trong một transaction
+        Các hàng được nhóm theo tập cột; hàng lỗi được báo cáo riêng,
+        không làm hỏng cả lô
+        Args:
+            table_name: Tên bảng
+            rows: Danh sách dictionary {column: value}
+            conflict_columns: Các cột của ràng buộc UNIQUE dùng cho ON CONFLICT
+                (None: chỉ INSERT)
+            update_columns: Các cột cập nhật khi trùng (mặc định: mọi cột
+                không thuộc conflict_columns; rỗng: DO NOTHING)
+            chunk_size: Số hàng mỗi lần executemany
+        Returns:
+            Dictionary {'processed': số hàng đã ghi, 'failed': [{'index', 'row', 'error'}]}
+        """
+        if table_name in NORMALIZED_COLUMNS and update_columns:
+            update_columns = normalized_columns(table_name, update_columns)
+
+        # Nhóm các hàng theo tập cột để dùng chung một câu lệnh
+        groups = {}
+        for index, row in enumerate(rows):
+            row = normalize_row(table_name, row)
+            groups.setdefault(tuple(row.keys()), []).append((index, row))
+
+        result = {'processed': 0, 'failed': []}
+
+        with self.transaction():
+            for columns, group in groups.items():
+                query = self._build_upsert(table_name, columns, conflict_columns, update_columns)
+
+                for start in range(0, len(group), chunk_size):
+                    chunk = group[start:start + chunk_size]
+                    self._bulk_write_chunk(query, chunk, result)
+
+        if result['processed']:
+            self.invalidate_caches(table_name)
+        return result
+
+    def _build_upsert(self, table_name, columns, conflict_columns=None, update_columns=None):
+        """Tạo câu lệnh INSERT ... ON CONFLICT cho một tập cột (dùng cache mẫu SQL)"""
+        return statements.build_insert(table_name, columns, conflict_columns, update_columns)
+
+    def _bulk_write_chunk(self, query, chunk, result):
+        """
+        Ghi một lô bằng executemany trong savepoint
+        Nếu lô lỗi thì rollback savepoint và ghi lại từng hàng để tách hàng lỗi
+        """
+        cur = self.conn.cursor()
+        caller = self._caller()
+        try:
+            start = time.perf_counter()
+            with self.transaction():
+                cur.executemany(query, [list(row.values()) for _, row in chunk])
+            self._record_query(query, list(chunk[0][1].values()), time.perf_counter() - start,
+                               len(chunk), caller)
+            result['processed'] += len(chunk)
+            return
+        except sqlite3.Error:
+            self.stats.record_error(query, caller)
+
+        for index, row in chunk:
+            try:
+                cur.execute(query, list(row.values()))
+                result['processed'] += 1
+            except sqlite3.Error as e:
+                result['failed'].append({'index': index, 'row': row, 'error': str(e)})
+
     def select_records(self, table_name, columns="*", condition=None, params=None,
                        order_by=None, limit=None, group_by=None, joins=None):
         """
@@ -391,21 +687,267 @@ class Database:
             group_by: Nhóm theo
             joins: JOIN với bảng khác
         """
-        query = f"SELECT {columns} FROM {table_name}"
+        query = self._build_select(table_name, columns, condition, order_by, limit, group_by, joins)
+        try:
+            return self.query(query, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return []
+
+    def get_record(self, table_name, condition, params=None, columns="*"):
+        """
+        Lấy một bản ghi dưới dạng dictionary {cột: giá trị}
+        Returns:
+            Dictionary bản ghi, None nếu không tìm thấy hoặc có lỗi
+        """
+        query = self._build_select(table_name, columns, condition, limit=1)
+        try:
+            with self.query(query, params) as result:
+                row = result.fetchone()
+                return dict(zip(result.columns, row)) if row else None
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+
+    def iter_records(self, table_name, columns="*", condition=None, params=None,
+                     order_by=None, limit=None, group_by=None, joins=None, batch_size=500):
+        """
+        Duyệt bản ghi theo từng lô (giống select_records nhưng không nạp toàn bộ)
+        Args:
+            batch_size: Số hàng đọc mỗi lần fetchmany
+        Yields:
+            Từng hàng kết quả
+        """
+        query = self._build_select(table_name, columns, condition, order_by, limit, group_by, joins)
+        for rows in self.stream(query, params, batch_size):
+            yield from rows
+
+    @staticmethod
+    def _parse_order_by(order_by):
+        """Tách chuỗi ORDER BY thành danh sách (cột, 'ASC'/'DESC')"""
+        keys = []
+        for part in order_by.split(','):
+            tokens = part.split()
+            direction = tokens[1].upper() if len(tokens) > 1 else 'ASC'
+            keys.append((tokens[0], direction))
+        return keys
+
+    @staticmethod
+    def _build_seek_condition(keys, after):
+        """
+        Tạo điều kiện "sau khóa after" theo thứ tự sắp xếp keys
+        Returns:
+            (condition, params)
+        """
+        if len({direction for _, direction in keys}) == 1:
+            # Cùng chiều sắp xếp: so sánh row value, SQLite tìm thẳng trên index
+            operator = '<' if keys[0][1] == 'DESC' else '>'
+            columns = ', '.join(column for column, _ in keys)
+            placeholders = ', '.join(['?' for _ in keys])
+            return f"({columns}) {operator} ({placeholders})", list(after)
+
+        # Khác chiều: (c1 > ?) OR (c1 = ? AND c2 < ?) OR ...
+        terms = []
+        params = []
+        for i, (column, direction) in enumerate(keys):
+            operator = '<' if direction == 'DESC' else '>'
+            parts = [f"{prev} = ?" for prev, _ in keys[:i]] + [f"{column} {operator} ?"]
+            terms.append(f"({' AND '.join(parts)})")
+            params.extend(after[:i + 1])
+        return f"({' OR '.join(terms)})", params
+
+    def select_page(self, table_name, columns="*", condition=None, params=None,
+                    order_by=None, after=None, page_size=100, joins=None):
+        """
+        Lấy một trang bản ghi theo keyset pagination (seek)
+        Trang kế tiếp được tìm bằng điều kiện trên khóa sắp xếp thay vì OFFSET,
+        nên chi phí mỗi trang không phụ thuộc vị trí trang khi có index phù hợp
+        Args:
+            order_by: Sắp xếp, bắt buộc; các cột phải NOT NULL và cột cuối là
+                      khóa duy nhất (vd: "name, id" hoặc "created_date DESC, id DESC")
+            after: Khóa trang trước (next_key), None để lấy trang đầu
+            page_size: Số bản ghi mỗi trang
+            Các tham số khác giống select_records
+        Returns:
+            Dictionary {'rows': [bản ghi], 'next_key': khóa trang sau hoặc None nếu hết}
+        """
+        keys = self._parse_order_by(order_by)
+        conditions = [f"({condition})"] if condition else []
+        params = list(params or [])
+
+        if after is not None:
+            seek_condition, seek_params = self._build_seek_condition(keys, after)
+            conditions.append(seek_condition)
+            params += seek_params
+
+        # Lấy thêm các cột khóa ở cuối mỗi hàng để tính next_key
+        key_columns = ', '.join(column for column, _ in keys)
+        query = self._build_select(
+            table_name, f"{columns}, {key_columns}", " AND ".join(conditions) or None,
+            order_by, page_size + 1, joins=joins
+        )
+        try:
+            rows = self.query(query, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return {'rows': [], 'next_key': None}
+
+        key_count = len(keys)
+        next_key = tuple(rows[page_size - 1][-key_count:]) if len(rows) > page_size else None
+        return {'rows': [row[:-key_count] for row in rows[:page_size]], 'next_key': next_key}
+
+    # Phương thức tìm kiếm toàn văn (FTS5)
+
+    def fulltext_table(self, table_name):
+        """
+        Bảng FTS của bảng gốc nếu đã được tạo trong database
+        Returns:
+            Tên bảng FTS, None nếu không có (SQLite không hỗ trợ FTS5 hoặc chưa migrate)
+        """
+        fts_name = fulltext.fulltext_table_for(table_name)
+        if fts_name is None:
+            return None
+
+        if self._fulltext_tables is None:
+            try:
+                names = self.query(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+                        ', '.join(['?' for _ in fulltext.FULLTEXT_TABLES])),
+                    list(fulltext.FULLTEXT_TABLES)
+                ).fetchall()
+                self._fulltext_tables = {row[0] for row in names}
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                return None
+        return fts_name if fts_name in self._fulltext_tables else None
+
+    @staticmethod
+    def _prefix_condition(table_name, search_term):
+        """
+        Điều kiện tìm tiền tố trên các cột chuẩn hóa (*_norm) của bảng
+        Returns:
+            (condition, params), None nếu bảng không có cột chuẩn hóa hoặc chuỗi rỗng
+        """
+        mapping = NORMALIZED_COLUMNS.get(table_name)
+        bounds = prefix_range(search_term) if mapping else None
+        if not bounds:
+            return None
+
+        terms = [f"({column} >= ? AND {column} < ?)" for column in mapping.values()]
+        return ' OR '.join(terms), list(bounds) * len(terms)
+
+    def search_condition(self, table_name, search_term, like_columns):
+        """
+        Điều kiện WHERE tìm kiếm theo chuỗi người dùng nhập
+        Dùng MATCH trên bảng FTS (không dấu, tìm theo tiền tố từ); nếu không có
+        bảng FTS hoặc chuỗi không có từ nào thì dùng LIKE '%...%' trên like_columns.
+        Bảng có cột chuẩn hóa được tìm thêm theo tiền tố trên các cột *_norm
+        (vd: "dang" khớp "Đặng", điều FTS không làm được)
+        Args:
+            like_columns: Các cột tìm bằng LIKE khi không dùng được FTS
+        Returns:
+            (condition, params)
+        """
+        fts_name = self.fulltext_table(table_name)
+        match_query = fulltext.build_match_query(search_term)
+        if fts_name and match_query:
+            terms = [f"{table_name}.rowid IN (SELECT rowid FROM {fts_name} WHERE {fts_name} MATCH ?)"]
+            params = [match_query]
+        else:
+            pattern = f"%{search_term.strip()}%"
+            terms = [f"{col} LIKE ?" for col in like_columns]
+            params = [pattern] * len(like_columns)
+
+        prefix = self._prefix_condition(table_name, search_term)
+        if prefix:
+            terms.append(prefix[0])
+            params += prefix[1]
+        return f"({' OR '.join(terms)})", params
+
+    def search_records(self, table_name, search_term, like_columns, columns="*",
+                       condition=None, params=None, order_by=None, limit=None):
+        """
+        Tìm kiếm bản ghi, sắp xếp theo mức độ liên quan (bm25) khi dùng được FTS;
+        bản ghi chỉ khớp tiền tố cột chuẩn hóa xếp sau
+        Args:
+            search_term: Chuỗi người dùng nhập
+            like_columns: Các cột tìm bằng LIKE khi không dùng được FTS
+            condition: Điều kiện thêm (vd: "status != 'Deleted'")
+            order_by: Sắp xếp phụ sau mức độ liên quan (hoặc sắp xếp chính khi dùng LIKE)
+            Các tham số khác giống select_records
+        """
+        search, search_params = self.search_condition(table_name, search_term, like_columns)
+        where = f"{condition} AND {search}" if condition else search
+        params = list(params or [])
+
+        fts_name = self.fulltext_table(table_name)
+        match_query = fulltext.build_match_query(search_term)
+        if not (fts_name and match_query):
+            return self.select_records(table_name, columns, where, params + search_params,
+                                       order_by=order_by, limit=limit)
+
+        joins = (f"LEFT JOIN (SELECT rowid AS fts_rowid, rank AS fts_rank FROM {fts_name} "
+                 f"WHERE {fts_name} MATCH ?) fts ON fts.fts_rowid = {table_name}.rowid")
+        rank_order = "fts.fts_rank IS NULL, fts.fts_rank"
+        return self.select_records(
+            table_name, columns, where, [match_query] + params + search_params,
+            order_by=f"{rank_order}, {order_by}" if order_by else rank_order,
+            limit=limit, joins=joins
+        )
+
+    def rebuild_fulltext(self, table_name=None):
+        """
+        Dựng lại index FTS từ bảng gốc
+        Args:
+            table_name: Bảng gốc (None: mọi bảng FTS)
+        """
+        names = [self.fulltext_table(table_name)] if table_name else [
+            self.fulltext_table(spec['content']) for spec in fulltext.FULLTEXT_TABLES.values()
+        ]
+        try:
+            with self.transaction():
+                for fts_name in names:
+                    if fts_name:
+                        self.execute(fulltext.rebuild_statement(fts_name))
+            return True
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return False
+
+    def rebuild_rollups(self, table_name=None):
+        """
+        Tính lại bảng tổng hợp do trigger cập nhật (sửa sai lệch so với bảng gốc)
+        Args:
+            table_name: Bảng tổng hợp, vd: 'AttendanceMonthly' (None: mọi bảng tổng hợp)
+        """
+        names = [table_name] if table_name else list(ROLLUP_REBUILDS)
+        # Bảng nguồn có thể đang được migration nền dựng lại
+        self.migrations.wait()
+        try:
+            with self.transaction():
+                for name in names:
+                    for sql in ROLLUP_REBUILDS[name]:
+                        self.execute(sql)
+            return True
+        except (sqlite3.Error, KeyError) as e:
+            print(f"Database error: {e}")
+            return False
 
-        if joins:
-            query += f" {joins}"
-        if condition:
-            query += f" WHERE {condition}"
-        if group_by:
-            query += f" GROUP BY {group_by}"
-        if order_by:
-            query += f" ORDER BY {order_by}"
-        if limit:
-            query += f" LIMIT {limit}"
+    def register_cache(self, table_name, cache):
+        """
+        Đăng ký cache trong bộ nhớ của một bảng (đối tượng có phương thức invalidate())
+        Cache được xóa sau bulk_insert/bulk_upsert vào bảng và sau restore_database.
+        Ghi từng hàng (insert_record, update_record, execute...) không xóa cache:
+        manager sở hữu cache tự cập nhật, code khác ghi vào bảng phải gọi invalidate_caches
+        """
+        self._table_caches.setdefault(table_name, weakref.WeakSet()).add(cache)
 
-        self.execute(query, params)
-        return self.fetch_all()
+    def invalidate_caches(self, table_name=None):
+        """Xóa cache trong bộ nhớ của bảng (None: mọi bảng), lần đọc sau nạp lại"""
+        tables = [table_name] if table_name is not None else list(self._table_caches)
+        for table in tables:
+            for cache in list(self._table_caches.get(table, ())):
+                cache.invalidate()
 
     # Phương thức backup và restore
 
@@ -435,6 +977,9 @@ class Database:
                 backup_conn = sqlite3.connect(backup_path)
                 backup_conn.backup(self.conn)
                 backup_conn.close()
+                self._fulltext_tables = None
+                # Ghi qua chính kết nối này: PRAGMA data_version không đổi
+                self.invalidate_caches()
                 return True
             return False
         except sqlite3.Error as e:
@@ -445,6 +990,10 @@ class Database:
         """Tối ưu hóa database (VACUUM)"""
         try:
             self.execute("VACUUM")
+            # VACUUM có thể đánh lại rowid của bảng không có INTEGER PRIMARY KEY
+            for spec in fulltext.FULLTEXT_TABLES.values():
+                if not spec['stable_rowid'] and self.fulltext_table(spec['content']):
+                    self.rebuild_fulltext(spec['content'])
             return True
         except sqlite3.Error as e:
             print(f"Vacuum error: {e}")
@@ -477,10 +1026,27 @@ class Database:
 
         return stats
 
+    def get_statement_cache_stats(self):
+        """Thống kê cache mẫu SQL (hits/misses theo loại câu lệnh)"""
+        return statements.get_cache_stats()
+
+    def get_query_stats(self, order_by='total_ms', limit=None):
+        """Thống kê thời gian thực thi theo câu lệnh (xem QueryStats.get_stats)"""
+        return self.stats.get_stats(order_by, limit)
+
+    def get_slow_queries(self):
+        """Các câu lệnh chậm gần nhất kèm EXPLAIN QUERY PLAN"""
+        return self.stats.get_slow_queries()
+
+    def export_query_stats(self, path=None):
+        """Xuất thống kê truy vấn dạng JSON (ghi vào path nếu có)"""
+        return self.stats.export_json(path)
+
     # Phương thức log hệ thống
 
     def log_action(self, user_id, action, table_name=None, record_id=None,
-                   old_values=None, new_values=None, ip_address=None, success=True, error_message=None):
+                   old_values=None, new_values=None, ip_address=None, success=True, error_message=None,
+                   durable=False):
         """
         Ghi log hành động của user
         Args:
@@ -493,6 +1059,7 @@ class Database:
             ip_address: Địa chỉ IP
             success: Thành công hay không
             error_message: Thông báo lỗi nếu có
+            durable: True để ghi ngay (đồng bộ) thay vì qua hàng đợi
         """
         log_data = {
             'user_id': user_id,
@@ -506,10 +1073,54 @@ class Database:
             'error_message': error_message
         }
 
-        return self.insert_record('SystemLogs', log_data)
+        return self.log_actions([log_data], durable=durable)
+
+    def log_change(self, user_id, action, table_name=None, record_id=None,
+                   old_values=None, new_values=None, durable=False, **kwargs):
+        """
+        Ghi log thay đổi bản ghi, chỉ lưu các trường thay đổi
+        Args:
+            old_values: Dictionary trạng thái cũ (None khi tạo mới)
+            new_values: Dictionary giá trị mới (None khi xóa hẳn)
+            Các tham số khác giống log_action
+        """
+        old_values, new_values = diff_values(old_values, new_values)
+        return self.log_action(
+            user_id, action, table_name, record_id,
+            old_values=encode_payload(old_values),
+            new_values=encode_payload(new_values),
+            durable=durable,
+            **kwargs
+        )
+
+    def log_actions(self, log_list, durable=False):
+        """
+        Ghi nhiều log cùng lúc
+        Trong transaction, log chỉ được đưa vào hàng đợi khi transaction commit
+        Args:
+            log_list: Danh sách dictionary log (các khóa như log_action)
+            durable: True để ghi ngay (đồng bộ) thay vì qua hàng đợi
+        """
+        entries = [AuditLogWriter.make_entry(log_data) for log_data in log_list]
+        if not entries:
+            return True
+
+        if durable or not self.async_audit:
+            return self.execute_many(AuditLogWriter.INSERT_SQL, entries)
+
+        if self._in_transaction():
+            self._pending_logs()[-1].extend(entries)
+        else:
+            self.audit.submit(entries)
+        return True
+
+    def flush_logs(self):
+        """Ghi ngay các log đang chờ trong hàng đợi"""
+        self.audit.flush()
 
     def get_user_logs(self, user_id, limit=100):
         """Lấy log của user"""
+        self.flush_logs()
         return self.select_records(
             'SystemLogs',
             condition='user_id = ?',
@@ -518,22 +1129,26 @@ class Database:
             limit=limit
         )
 
-    def get_system_logs(self, start_date=None, end_date=None, limit=1000):
-        """Lấy log hệ thống"""
-        condition = None
-        params = []
-
+    def _system_logs_condition(self, start_date=None, end_date=None):
+        """Điều kiện lọc log theo thời gian"""
         if start_date and end_date:
-            condition = "timestamp BETWEEN ? AND ?"
-            params = [start_date, end_date]
+            return "timestamp BETWEEN ? AND ?", [start_date, end_date]
         elif start_date:
-            condition = "timestamp >= ?"
-            params = [start_date]
+            return "timestamp >= ?", [start_date]
         elif end_date:
-            condition = "timestamp <= ?"
-            params = [end_date]
+            return "timestamp <= ?", [end_date]
+        return None, []
 
-        return self.select_records(
+    def get_system_logs(self, start_date=None, end_date=None, limit=1000, include_archive=True):
+        """
+        Lấy log hệ thống
+        Args:
+            include_archive: Đọc thêm từ các file lưu trữ theo tháng nếu chưa đủ limit
+        """
+        self.flush_logs()
+        condition, params = self._system_logs_condition(start_date, end_date)
+
+        logs = self.select_records(
             'SystemLogs',
             condition=condition,
             params=params,
@@ -541,14 +1156,65 @@ class Database:
             limit=limit
         )
 
+        if include_archive and (not limit or len(logs) < limit):
+            remaining = limit - len(logs) if limit else None
+            logs += self.log_retention.query_archives(start_date, end_date, remaining)
+            # Cột thứ 8 (index 7) của SystemLogs là timestamp
+            logs.sort(key=lambda row: row[7] or '', reverse=True)
+
+        return logs
+
+    def get_record_history(self, table_name, record_id):
+        """
+        Lấy lịch sử thay đổi của một bản ghi (kể cả log đã lưu trữ)
+        Returns:
+            Danh sách (action, old_values, new_values, timestamp) theo thứ tự thời gian
+        """
+        self.flush_logs()
+        columns = "id, action, old_values, new_values, timestamp"
+        rows = self.log_retention.query_record_history(table_name, record_id, columns)
+        rows += self.select_records(
+            'SystemLogs',
+            columns=columns,
+            condition='table_name = ? AND record_id = ?',
+            params=[table_name, str(record_id)]
+        )
+        rows.sort(key=lambda row: (row[4] or '', row[0]))
+        return [row[1:] for row in rows]
+
+    def reconstruct_record(self, table_name, record_id, at=None):
+        """
+        Dựng lại trạng thái bản ghi từ SystemLogs
+        Args:
+            at: Thời điểm (UTC, 'YYYY-MM-DD HH:MM:SS'); None để lấy trạng thái mới nhất
+        Returns:
+            Dictionary trạng thái bản ghi, None nếu chưa tồn tại hoặc đã bị xóa
+        """
+        return reconstruct_state(self.get_record_history(table_name, record_id), at)
+
+    def archive_system_logs(self, retention_days=None):
+        """Chuyển log cũ sang file lưu trữ theo tháng (xem LogRetentionManager)"""
+        return self.log_retention.archive_old_logs(retention_days)
+
+    def iter_system_logs(self, start_date=None, end_date=None, batch_size=500):
+        """Duyệt log hệ thống theo từng lô (dùng cho export/báo cáo lớn)"""
+        self.flush_logs()
+        condition, params = self._system_logs_condition(start_date, end_date)
+
+        return self.iter_records(
+            'SystemLogs',
+            condition=condition,
+            params=params,
+            order_by='timestamp DESC',
+            batch_size=batch_size
+        )
+
     # Phương thức kiểm tra và sửa chữa
 
     def check_database_integrity(self):
         """Kiểm tra tính toàn vẹn database"""
         try:
-            self.execute("PRAGMA integrity_check")
-            result = self.fetch_one()
-            return result[0] == 'ok' if result else False
+            return self.query("PRAGMA integrity_check").scalar() == 'ok'
         except sqlite3.Error as e:
             print(f"Integrity check error: {e}")
             return False
@@ -566,7 +1232,13 @@ class Database:
         """Đóng kết nối database"""
         try:
             if self.conn:
-                self.conn.close()
+                # Migration nền đang dùng kết nối ghi: dừng trước khi đóng
+                migrations = getattr(self, 'migrations', None)
+                if migrations is not None:
+                    migrations.stop()
+                self.audit.close()
+                self.pool.close()
+                self.conn = None
                 return True
         except sqlite3.Error as e:
             print(f"Close error: {e}")
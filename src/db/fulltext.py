@@ -0,0 +1,100 @@
+import re
+import sqlite3
+
+# Bỏ dấu tiếng Việt khi tách từ (tìm "nguyen" khớp "Nguyễn"); riêng "đ" là chữ
+# cái riêng nên không được bỏ dấu
+TOKENIZE = "unicode61 remove_diacritics 2"
+
+# Bảng FTS5 external content: chỉ lưu index, nội dung đọc từ bảng gốc theo rowid
+#   content: Bảng gốc
+#   columns: Các cột được đánh index
+#   stable_rowid: Bảng gốc có INTEGER PRIMARY KEY (rowid không đổi khi VACUUM)
+FULLTEXT_TABLES = {
+    'EmployeesFts': {
+        'content': 'Employees',
+        'columns': ('id', 'name', 'department', 'position'),
+        'stable_rowid': False
+    },
+    'CandidatesFts': {
+        'content': 'Candidates',
+        'columns': ('name', 'email', 'position', 'skills'),
+        'stable_rowid': True
+    },
+    'FeedbacksFts': {
+        'content': 'Feedbacks',
+        'columns': ('employee_id', 'content', 'subject', 'response'),
+        'stable_rowid': True
+    },
+}
+
+_WORD = re.compile(r"\S+")
+_TOKEN = re.compile(r"\w+")
+
+
+def fulltext_table_for(table_name):
+    """Tên bảng FTS của bảng gốc (None nếu không có)"""
+    for fts_name, spec in FULLTEXT_TABLES.items():
+        if spec['content'] == table_name:
+            return fts_name
+    return None
+
+
+def fts5_available(conn):
+    """SQLite hiện tại có module FTS5 không"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def fulltext_schema(fts_name):
+    """
+    Các câu lệnh tạo bảng FTS và trigger đồng bộ với bảng gốc
+    Trigger UPDATE chỉ chạy khi cột được đánh index thay đổi
+    """
+    spec = FULLTEXT_TABLES[fts_name]
+    table_name = spec['content']
+    columns = spec['columns']
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"new.{col}" for col in columns)
+    old_values = ', '.join(f"old.{col}" for col in columns)
+
+    insert_new = f"INSERT INTO {fts_name}(rowid, {column_list}) VALUES (new.rowid, {new_values});"
+    delete_old = (f"INSERT INTO {fts_name}({fts_name}, rowid, {column_list}) "
+                  f"VALUES ('delete', old.rowid, {old_values});")
+
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_name} USING fts5("
+        f"{column_list}, content='{table_name}', content_rowid='rowid', tokenize='{TOKENIZE}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_ai AFTER INSERT ON {table_name} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_ad AFTER DELETE ON {table_name} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_au AFTER UPDATE OF {column_list} ON {table_name} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def rebuild_statement(fts_name):
+    """Câu lệnh dựng lại toàn bộ index FTS từ bảng gốc"""
+    return f"INSERT INTO {fts_name}({fts_name}) VALUES ('rebuild')"
+
+
+def build_match_query(search_term):
+    """
+    Chuyển chuỗi người dùng nhập thành biểu thức MATCH của FTS5
+    Mỗi từ (tách theo khoảng trắng) thành một cụm có tìm tiền tố ở token cuối,
+    các từ nối bằng AND: "nguyen van" -> "nguyen"* "van"*,
+    "a@b.com" -> "a b com"*
+    Returns:
+        Biểu thức MATCH, None nếu không có token nào (vd: chỉ có ký tự đặc biệt)
+    """
+    if not search_term:
+        return None
+
+    phrases = []
+    for word in _WORD.findall(search_term):
+        tokens = _TOKEN.findall(word)
+        if tokens:
+            phrases.append(f"\"{' '.join(tokens)}\"*")
+    return ' '.join(phrases) if phrases else None
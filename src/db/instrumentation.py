@@ -0,0 +1,247 @@
+import collections
+import datetime
+import json
+import re
+import sys
+import threading
+from functools import lru_cache
+
+# Ngưỡng (ms) của các ô histogram thời gian thực thi; ô cuối chứa mọi giá trị lớn hơn
+HISTOGRAM_BOUNDS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Câu lệnh có thể EXPLAIN QUERY PLAN
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    Chuẩn hóa câu lệnh SQL để gom nhóm thống kê:
+    literal chuỗi/số thành ?, danh sách IN (?, ?, ...) thành (?+), gộp khoảng trắng
+    """
+    text = _STRING_LITERAL.sub('?', sql)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _IN_LIST.sub('(?+)', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def find_caller(skip_prefix):
+    """
+    Tìm hàm gọi đầu tiên nằm ngoài package database (vd: 'src.logic.employee.get_all_employees')
+    Args:
+        skip_prefix: Tiền tố tên module cần bỏ qua (vd: 'src.db.')
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(skip_prefix) and module != 'contextlib':
+            code = frame.f_code
+            return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+        frame = frame.f_back
+    return None
+
+
+class QueryStats:
+    """
+    Thống kê thời gian thực thi câu lệnh SQL theo fingerprint
+    Mỗi fingerprint có số lần chạy, số hàng, tổng/min/max thời gian, histogram,
+    các hàm gọi; câu lệnh chậm hơn slow_threshold_ms được ghi vào slow log
+    kèm EXPLAIN QUERY PLAN
+    """
+
+    def __init__(self, enabled=True, slow_threshold_ms=100.0, max_slow_entries=200,
+                 explain_slow=True, track_callers=False):
+        """
+        Args:
+            enabled: Bật/tắt thu thập
+            slow_threshold_ms: Ngưỡng câu lệnh chậm (ms), None để tắt slow log
+            max_slow_entries: Số câu lệnh chậm giữ lại gần nhất
+            explain_slow: Tự chạy EXPLAIN QUERY PLAN cho câu lệnh chậm
+            track_callers: Tìm hàm gọi cho mọi câu lệnh (phải duyệt stack mỗi lần);
+                           khi tắt chỉ câu lệnh chậm được ghi hàm gọi
+        """
+        self.enabled = enabled
+        self.slow_threshold_ms = slow_threshold_ms
+        self.explain_slow = explain_slow
+        self.track_callers = track_callers
+        self.started_at = datetime.datetime.now()
+
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._slow = collections.deque(maxlen=max_slow_entries)
+
+    def _entry(self, key):
+        entry = self._stats.get(key)
+        if entry is None:
+            entry = {
+                'count': 0,
+                'errors': 0,
+                'rows': 0,
+                'total_ms': 0.0,
+                'min_ms': None,
+                'max_ms': 0.0,
+                'histogram': [0] * (len(HISTOGRAM_BOUNDS_MS) + 1),
+                'callers': collections.Counter()
+            }
+            self._stats[key] = entry
+        return entry
+
+    def is_slow(self, elapsed):
+        """Thời gian thực thi (giây) có vượt ngưỡng câu lệnh chậm không"""
+        return self.slow_threshold_ms is not None and elapsed * 1000.0 >= self.slow_threshold_ms
+
+    def record(self, sql, elapsed, rows=None, caller=None, params=None, explain=None):
+        """
+        Ghi nhận một lần thực thi
+        Args:
+            sql: Câu lệnh SQL
+            elapsed: Thời gian thực thi (giây)
+            rows: Số hàng đọc/ghi (None nếu không xác định)
+            caller: Hàm gọi (xem find_caller)
+            params: Tham số (chỉ lưu vào slow log)
+            explain: Hàm explain(sql, params) -> danh sách dòng kế hoạch
+        """
+        if not self.enabled:
+            return
+
+        key = fingerprint(sql)
+        elapsed_ms = elapsed * 1000.0
+
+        bucket = len(HISTOGRAM_BOUNDS_MS)
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                bucket = i
+                break
+
+        with self._lock:
+            entry = self._entry(key)
+            entry['count'] += 1
+            entry['rows'] += rows if rows and rows > 0 else 0
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['min_ms'] = elapsed_ms if entry['min_ms'] is None else min(entry['min_ms'], elapsed_ms)
+            entry['histogram'][bucket] += 1
+            if caller:
+                entry['callers'][caller] += 1
+
+        if self.is_slow(elapsed):
+            self._record_slow(sql, key, elapsed_ms, rows, caller, params, explain)
+
+    def record_error(self, sql, caller=None):
+        """Ghi nhận một lần thực thi lỗi"""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._entry(fingerprint(sql))
+            entry['errors'] += 1
+            if caller:
+                entry['callers'][caller] += 1
+
+    def _record_slow(self, sql, key, elapsed_ms, rows, caller, params, explain):
+        plan = None
+        if self.explain_slow and explain is not None and sql.lstrip()[:7].upper().startswith(_EXPLAINABLE):
+            try:
+                plan = explain(sql, params)
+            except Exception as e:
+                plan = [f"EXPLAIN error: {e}"]
+
+        with self._lock:
+            self._slow.append({
+                'timestamp': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'fingerprint': key,
+                'sql': sql,
+                'params': [str(p) for p in params] if params else [],
+                'elapsed_ms': round(elapsed_ms, 3),
+                'rows': rows,
+                'caller': caller,
+                'plan': plan
+            })
+
+    def get_stats(self, order_by='total_ms', limit=None):
+        """
+        Thống kê theo fingerprint, sắp xếp giảm dần theo order_by
+        Returns:
+            Danh sách dictionary (fingerprint, count, rows, total/avg/min/max ms, histogram, callers)
+        """
+        with self._lock:
+            items = [
+                {
+                    'fingerprint': key,
+                    'count': entry['count'],
+                    'errors': entry['errors'],
+                    'rows': entry['rows'],
+                    'total_ms': round(entry['total_ms'], 3),
+                    'avg_ms': round(entry['total_ms'] / entry['count'], 3) if entry['count'] else 0.0,
+                    'min_ms': round(entry['min_ms'], 3) if entry['min_ms'] is not None else None,
+                    'max_ms': round(entry['max_ms'], 3),
+                    'histogram': self._histogram_dict(entry['histogram']),
+                    'callers': dict(entry['callers'].most_common())
+                }
+                for key, entry in self._stats.items()
+            ]
+
+        items.sort(key=lambda item: item[order_by], reverse=True)
+        return items[:limit] if limit else items
+
+    @staticmethod
+    def _histogram_dict(counts):
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return dict(zip(labels, counts))
+
+    def get_slow_queries(self):
+        """Các câu lệnh chậm gần nhất (mới nhất trước)"""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def get_caller_stats(self):
+        """Tổng thời gian/số lần theo hàm gọi (ước lượng chia đều theo số lần gọi)"""
+        callers = {}
+        for item in self.get_stats():
+            avg_ms = item['avg_ms']
+            for caller, count in item['callers'].items():
+                summary = callers.setdefault(caller, {'count': 0, 'total_ms': 0.0})
+                summary['count'] += count
+                summary['total_ms'] += avg_ms * count
+
+        result = [
+            {'caller': caller, 'count': summary['count'], 'total_ms': round(summary['total_ms'], 3)}
+            for caller, summary in callers.items()
+        ]
+        result.sort(key=lambda item: item['total_ms'], reverse=True)
+        return result
+
+    def to_dict(self):
+        """Toàn bộ thống kê dưới dạng dictionary"""
+        return {
+            'started_at': self.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+            'exported_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'slow_threshold_ms': self.slow_threshold_ms,
+            'histogram_bounds_ms': list(HISTOGRAM_BOUNDS_MS),
+            'queries': self.get_stats(),
+            'callers': self.get_caller_stats(),
+            'slow_queries': self.get_slow_queries()
+        }
+
+    def export_json(self, path=None):
+        """
+        Xuất thống kê dạng JSON
+        Args:
+            path: File đích (None: chỉ trả về chuỗi JSON)
+        """
+        text = json.dumps(self.to_dict(), ensure_ascii=False, indent=2, default=str)
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+    def reset(self):
+        """Xóa toàn bộ thống kê"""
+        with self._lock:
+            self._stats = {}
+            self._slow.clear()
+            self.started_at = datetime.datetime.now()
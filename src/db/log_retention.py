@@ -0,0 +1,211 @@
+import datetime
+import os
+import pathlib
+import re
+import sqlite3
+
+
+class LogRetentionManager:
+    """
+    Lưu trữ SystemLogs cũ sang các file database theo tháng
+    (log_archive/system_logs_YYYY_MM.db) để bảng log trong database chính
+    luôn nhỏ; các file lưu trữ vẫn được đọc lại qua Database.get_system_logs
+    """
+
+    ARCHIVE_PATTERN = re.compile(r'^system_logs_(\d{4})_(\d{2})\.db$')
+
+    def __init__(self, db, archive_dir=None, retention_days=180, chunk_size=5000):
+        """
+        Args:
+            db: Instance Database
+            archive_dir: Thư mục chứa file lưu trữ (mặc định: log_archive cạnh file database)
+            retention_days: Số ngày log được giữ trong bảng SystemLogs
+            chunk_size: Số log chuyển mỗi lần
+        """
+        if archive_dir is None:
+            archive_dir = os.path.join(os.path.dirname(os.path.abspath(db.db_path)), "log_archive")
+
+        self.db = db
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.chunk_size = chunk_size
+        self._columns = None
+
+    def archive_path(self, month_key):
+        """Đường dẫn file lưu trữ của tháng ('YYYY-MM')"""
+        year, month = month_key.split('-')
+        return os.path.join(self.archive_dir, f"system_logs_{year}_{month}.db")
+
+    def list_archives(self):
+        """Danh sách tháng đã lưu trữ ('YYYY-MM'), mới nhất trước"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+
+        months = []
+        for name in os.listdir(self.archive_dir):
+            match = self.ARCHIVE_PATTERN.match(name)
+            if match:
+                months.append(f"{match.group(1)}-{match.group(2)}")
+        return sorted(months, reverse=True)
+
+    def _get_columns(self):
+        """Các cột của bảng SystemLogs"""
+        if self._columns is None:
+            self._columns = [row[1] for row in self.db.get_table_info('SystemLogs')]
+        return self._columns
+
+    def _open_archive(self, month_key):
+        """Mở (và tạo nếu chưa có) file lưu trữ của tháng"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        conn = sqlite3.connect(self.archive_path(month_key))
+
+        # Dùng đúng cấu trúc bảng SystemLogs của database chính
+        create_sql = self.db.query(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'SystemLogs'"
+        ).scalar()
+        conn.execute(create_sql.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1))
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON SystemLogs(timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_system_logs_record ON SystemLogs(table_name, record_id)")
+        return conn
+
+    def get_cutoff(self, retention_days=None):
+        """Mốc thời gian (UTC, cùng định dạng cột timestamp): log cũ hơn sẽ được lưu trữ"""
+        days = self.retention_days if retention_days is None else retention_days
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+        return cutoff.strftime("%Y-%m-%d %H:%M:%S")
+
+    def archive_old_logs(self, retention_days=None):
+        """
+        Chuyển log cũ hơn thời hạn lưu giữ sang file lưu trữ theo tháng
+        Mỗi lô được ghi vào file lưu trữ trước rồi mới xóa khỏi bảng chính,
+        nên có thể chạy lại an toàn nếu bị gián đoạn
+        Returns:
+            Dictionary {'archived': số log đã chuyển, 'months': [tháng]}
+        """
+        self.db.flush_logs()
+        cutoff = self.get_cutoff(retention_days)
+        columns = self._get_columns()
+        insert_sql = (f"INSERT OR IGNORE INTO SystemLogs ({', '.join(columns)}) "
+                      f"VALUES ({', '.join(['?' for _ in columns])})")
+
+        archived = 0
+        months = set()
+        archives = {}
+        try:
+            while True:
+                rows = self.db.select_records(
+                    'SystemLogs',
+                    columns=', '.join(columns),
+                    condition="timestamp < ?",
+                    params=[cutoff],
+                    order_by="timestamp",
+                    limit=self.chunk_size
+                )
+                if not rows:
+                    break
+
+                by_month = {}
+                timestamp_index = columns.index('timestamp')
+                for row in rows:
+                    by_month.setdefault(row[timestamp_index][:7], []).append(row)
+
+                for month_key, month_rows in by_month.items():
+                    if month_key not in archives:
+                        archives[month_key] = self._open_archive(month_key)
+                    conn = archives[month_key]
+                    # id là khóa chính (chép từ bảng chính): log đã có trong file bị bỏ qua
+                    conn.executemany(insert_sql, month_rows)
+                    conn.commit()
+                    months.add(month_key)
+
+                id_index = columns.index('id')
+                deleted = self.db.execute_many("DELETE FROM SystemLogs WHERE id = ?",
+                                               [(row[id_index],) for row in rows])
+                if not deleted:
+                    # Không dừng thì lô này sẽ được đọc và lưu trữ lại mãi
+                    raise Exception(f"Không thể xóa log đã lưu trữ khỏi SystemLogs "
+                                    f"(đã chuyển {archived} log trước lô lỗi)")
+                archived += len(rows)
+        finally:
+            for conn in archives.values():
+                conn.close()
+
+        return {'archived': archived, 'months': sorted(months)}
+
+    def _month_overlaps(self, month_key, start_date=None, end_date=None):
+        """Tháng lưu trữ có giao với khoảng thời gian cần đọc không"""
+        year, month = map(int, month_key.split('-'))
+        month_start = f"{year}-{month:02d}-01"
+        month_end = f"{year + 1}-01-01" if month == 12 else f"{year}-{month + 1:02d}-01"
+
+        if end_date and month_start > end_date:
+            return False
+        if start_date and month_end <= start_date:
+            return False
+        return True
+
+    def query_archives(self, start_date=None, end_date=None, limit=1000):
+        """
+        Đọc log từ các file lưu trữ, mới nhất trước
+        Args:
+            start_date, end_date: Khoảng thời gian (giống get_system_logs)
+            limit: Số log tối đa (None: không giới hạn)
+        """
+        condition, params = self.db._system_logs_condition(start_date, end_date)
+        query = "SELECT * FROM SystemLogs"
+        if condition:
+            query += f" WHERE {condition}"
+        query += " ORDER BY timestamp DESC LIMIT ?"
+
+        results = []
+        for month_key in self.list_archives():
+            if limit is not None and len(results) >= limit:
+                break
+            if not self._month_overlaps(month_key, start_date, end_date):
+                continue
+
+            conn = self._connect_readonly(month_key)
+            try:
+                remaining = limit - len(results) if limit is not None else -1
+                results.extend(conn.execute(query, params + [remaining]).fetchall())
+            except sqlite3.Error as e:
+                print(f"Archive read error: {e}")
+            finally:
+                conn.close()
+        return results
+
+    def query_record_history(self, table_name, record_id, columns="*"):
+        """
+        Đọc log của một bản ghi từ mọi file lưu trữ
+        Returns:
+            Danh sách hàng (thứ tự chưa sắp xếp)
+        """
+        query = f"SELECT {columns} FROM SystemLogs WHERE table_name = ? AND record_id = ?"
+
+        results = []
+        for month_key in self.list_archives():
+            conn = self._connect_readonly(month_key)
+            try:
+                results.extend(conn.execute(query, (table_name, str(record_id))).fetchall())
+            except sqlite3.Error as e:
+                print(f"Archive read error: {e}")
+            finally:
+                conn.close()
+        return results
+
+    def _connect_readonly(self, month_key):
+        """Mở file lưu trữ ở chế độ chỉ đọc"""
+        uri = pathlib.Path(os.path.abspath(self.archive_path(month_key))).as_uri() + "?mode=ro"
+        return sqlite3.connect(uri, uri=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.db.database import get_db
+
+    parser = argparse.ArgumentParser(description="Lưu trữ SystemLogs cũ theo tháng")
+    parser.add_argument("--days", type=int, default=180, help="Số ngày log được giữ lại")
+    args = parser.parse_args()
+
+    result = get_db().log_retention.archive_old_logs(args.days)
+    print(f"Đã lưu trữ {result['archived']} log: {', '.join(result['months']) or 'không có'}")
@@ -0,0 +1,1075 @@
+import re
+import threading
+import time
+
+from src.db import fulltext
+from src.db.normalize import NORMALIZED_COLUMNS, fold
+
+# Schema ban đầu: các bảng nghiệp vụ và bảng hệ thống
+INITIAL_TABLES = [
+    # Bảng Employees - Thông tin nhân viên
+    """
+    CREATE TABLE IF NOT EXISTS Employees (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        department TEXT NOT NULL,
+        salary REAL NOT NULL,
+        join_date TEXT NOT NULL,
+        phone TEXT,
+        email TEXT,
+        position TEXT,
+        status TEXT DEFAULT 'Active',
+        created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_date TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Bảng Attendance - Chấm công
+    """
+    CREATE TABLE IF NOT EXISTS Attendance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        attendance_id TEXT UNIQUE,
+        employee_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time_in TEXT NOT NULL,
+        time_out TEXT NOT NULL,
+        work_hours REAL,
+        overtime_hours REAL DEFAULT 0,
+        status TEXT DEFAULT 'Present',
+        notes TEXT,
+        created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES Employees(id)
+    )
+    """,
+    # Bảng Candidates - Ứng viên
+    """
+    CREATE TABLE IF NOT EXISTS Candidates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        candidate_id TEXT UNIQUE,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        phone TEXT,
+        position TEXT NOT NULL,
+        experience INTEGER DEFAULT 0,
+        education TEXT,
+        skills TEXT,
+        status TEXT DEFAULT 'Chờ xử lý',
+        application_date TEXT DEFAULT CURRENT_DATE,
+        interview_date TEXT,
+        notes TEXT,
+        resume_path TEXT,
+        created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_date TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Bảng Feedbacks - Phản hồi nhân viên
+    """
+    CREATE TABLE IF NOT EXISTS Feedbacks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        feedback_id TEXT UNIQUE,
+        employee_id TEXT NOT NULL,
+        category TEXT DEFAULT 'Chung',
+        priority TEXT DEFAULT 'Thấp',
+        subject TEXT,
+        content TEXT NOT NULL,
+        status TEXT DEFAULT 'Chờ xử lý',
+        is_anonymous BOOLEAN DEFAULT 0,
+        created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        handler TEXT,
+        response TEXT,
+        response_date TEXT
+    )
+    """,
+    # Bảng AdminResponses - Phản hồi của admin (để tương thích)
+    """
+    CREATE TABLE IF NOT EXISTS AdminResponses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        response_id TEXT UNIQUE,
+        feedback_id TEXT NOT NULL,
+        response TEXT NOT NULL,
+        created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (feedback_id) REFERENCES Feedbacks(feedback_id)
+    )
+    """,
+    # Bảng Payrolls - Bảng lương chi tiết
+    """
+    CREATE TABLE IF NOT EXISTS Payrolls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        payroll_id TEXT UNIQUE,
+        employee_id TEXT NOT NULL,
+        month INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        basic_salary REAL NOT NULL,
+        work_days INTEGER DEFAULT 22,
+        actual_work_days INTEGER DEFAULT 22,
+        absent_days INTEGER DEFAULT 0,
+        overtime_hours REAL DEFAULT 0,
+        overtime_pay REAL DEFAULT 0,
+        allowances REAL DEFAULT 0,
+        lunch_allowance REAL DEFAULT 0,
+        transport_allowance REAL DEFAULT 0,
+        performance_bonus REAL DEFAULT 0,
+        other_bonus REAL DEFAULT 0,
+        gross_salary REAL NOT NULL,
+        social_insurance REAL DEFAULT 0,
+        health_insurance REAL DEFAULT 0,
+        unemployment_insurance REAL DEFAULT 0,
+        tax_deduction REAL DEFAULT 0,
+        other_deductions REAL DEFAULT 0,
+        total_deductions REAL DEFAULT 0,
+        net_salary REAL NOT NULL,
+        status TEXT DEFAULT 'Draft',
+        notes TEXT,
+        created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES Employees(id)
+    )
+    """,
+    # Bảng SalaryComponents - Các thành phần lương
+    """
+    CREATE TABLE IF NOT EXISTS SalaryComponents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id TEXT NOT NULL,
+        component_type TEXT NOT NULL, -- 'allowance', 'bonus', 'deduction'
+        component_name TEXT NOT NULL,
+        amount REAL NOT NULL,
+        is_recurring BOOLEAN DEFAULT 1,
+        effective_date TEXT,
+        end_date TEXT,
+        created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES Employees(id)
+    )
+    """,
+    # Bảng UserSessions - Phiên đăng nhập (cho tương lai)
+    """
+    CREATE TABLE IF NOT EXISTS UserSessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        session_token TEXT UNIQUE,
+        login_time TEXT DEFAULT CURRENT_TIMESTAMP,
+        logout_time TEXT,
+        ip_address TEXT,
+        user_agent TEXT,
+        is_active BOOLEAN DEFAULT 1
+    )
+    """,
+    # Bảng SystemLogs - Log hệ thống
+    """
+    CREATE TABLE IF NOT EXISTS SystemLogs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        action TEXT NOT NULL,
+        table_name TEXT,
+        record_id TEXT,
+        old_values TEXT,
+        new_values TEXT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        ip_address TEXT,
+        success BOOLEAN DEFAULT 1,
+        error_message TEXT
+    )
+    """,
+    # Bảng Sequences - Giá trị kế tiếp cho các mã nghiệp vụ
+    """
+    CREATE TABLE IF NOT EXISTS Sequences (
+        name TEXT PRIMARY KEY,
+        next_value INTEGER NOT NULL
+    )
+    """,
+]
+
+# Các index để tối ưu hiệu suất truy vấn
+INITIAL_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_employees_department ON Employees(department)",
+    "CREATE INDEX IF NOT EXISTS idx_employees_status ON Employees(status)",
+    "CREATE INDEX IF NOT EXISTS idx_employees_name ON Employees(name, id)",
+    "CREATE INDEX IF NOT EXISTS idx_attendance_employee_date ON Attendance(employee_id, date)",
+    "CREATE INDEX IF NOT EXISTS idx_attendance_date ON Attendance(date)",
+    "CREATE INDEX IF NOT EXISTS idx_attendance_date_time ON Attendance(date, time_in, attendance_id)",
+    "CREATE INDEX IF NOT EXISTS idx_candidates_status ON Candidates(status)",
+    "CREATE INDEX IF NOT EXISTS idx_candidates_position ON Candidates(position)",
+    "CREATE INDEX IF NOT EXISTS idx_candidates_application ON Candidates(application_date, id)",
+    "CREATE INDEX IF NOT EXISTS idx_candidates_email ON Candidates(email)",
+    "CREATE INDEX IF NOT EXISTS idx_candidates_interview ON Candidates(interview_date)",
+    "CREATE INDEX IF NOT EXISTS idx_feedbacks_employee ON Feedbacks(employee_id)",
+    "CREATE INDEX IF NOT EXISTS idx_feedbacks_status ON Feedbacks(status)",
+    "CREATE INDEX IF NOT EXISTS idx_feedbacks_category ON Feedbacks(category)",
+    "CREATE INDEX IF NOT EXISTS idx_feedbacks_created ON Feedbacks(created_date, id)",
+    "CREATE INDEX IF NOT EXISTS idx_payrolls_employee_month ON Payrolls(employee_id, month, year)",
+    "CREATE INDEX IF NOT EXISTS idx_payrolls_month_year ON Payrolls(month, year)",
+    "CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON SystemLogs(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_system_logs_user ON SystemLogs(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_system_logs_record ON SystemLogs(table_name, record_id)"
+]
+
+
+def _initial_schema(cur):
+    """Migration 1: tạo schema ban đầu (an toàn với database cũ chưa có user_version)"""
+    for table_sql in INITIAL_TABLES:
+        cur.execute(table_sql)
+    for index_sql in INITIAL_INDEXES:
+        cur.execute(index_sql)
+
+
+# Index một phần chỉ chứa nhân viên chưa xóa mềm; các câu lệnh phải có đúng
+# điều kiện "status != 'Deleted'" (literal, không dùng tham số) để planner chọn được
+ACTIVE_EMPLOYEE_PREDICATE = "status != 'Deleted'"
+
+ACTIVE_EMPLOYEE_INDEXES = [
+    # Danh sách/trang nhân viên ORDER BY name, id
+    f"CREATE INDEX IF NOT EXISTS idx_employees_active_name ON Employees(name, id) "
+    f"WHERE {ACTIVE_EMPLOYEE_PREDICATE}",
+    # Lọc theo phòng ban ORDER BY name
+    f"CREATE INDEX IF NOT EXISTS idx_employees_active_department ON Employees(department, name) "
+    f"WHERE {ACTIVE_EMPLOYEE_PREDICATE}",
+    # Index phủ cho COUNT/AVG/MIN/MAX lương và thống kê theo phòng ban; SQLite chỉ coi
+    # index một phần là phủ khi có cả cột trong điều kiện (status)
+    f"CREATE INDEX IF NOT EXISTS idx_employees_active_salary ON Employees(department, salary, status) "
+    f"WHERE {ACTIVE_EMPLOYEE_PREDICATE}",
+]
+
+
+def _active_employee_indexes(cur):
+    """
+    Migration 2: index một phần cho nhân viên active
+    Bỏ idx_employees_name (đã được idx_employees_active_name thay thế) và
+    idx_employees_status (điều kiện != không dùng được index thường)
+    """
+    for index_sql in ACTIVE_EMPLOYEE_INDEXES:
+        cur.execute(index_sql)
+    cur.execute("DROP INDEX IF EXISTS idx_employees_name")
+    cur.execute("DROP INDEX IF EXISTS idx_employees_status")
+
+
+def _fulltext_search(cur):
+    """Migration 3: bảng FTS5 (không dấu) cho tìm kiếm nhân viên, ứng viên, phản hồi"""
+    if not fulltext.fts5_available(cur.connection):
+        print("FTS5 không khả dụng: tìm kiếm dùng LIKE")
+        return
+    for fts_name in fulltext.FULLTEXT_TABLES:
+        for sql in fulltext.fulltext_schema(fts_name):
+            cur.execute(sql)
+        cur.execute(fulltext.rebuild_statement(fts_name))
+
+
+NORMALIZED_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS idx_{table_name.lower()}_{norm_column} ON {table_name}({norm_column})"
+    for table_name, mapping in NORMALIZED_COLUMNS.items()
+    for norm_column in mapping.values()
+]
+
+
+def _normalized_columns(cur):
+    """
+    Migration 4: cột chuẩn hóa (không dấu, chữ thường) cho tên, email, vị trí
+    của nhân viên và ứng viên; điền giá trị cho dữ liệu có sẵn
+    """
+    for table_name, mapping in NORMALIZED_COLUMNS.items():
+        existing = {row[1] for row in cur.execute(f"PRAGMA table_info({table_name})").fetchall()}
+        for norm_column in mapping.values():
+            if norm_column not in existing:
+                cur.execute(f"ALTER TABLE {table_name} ADD COLUMN {norm_column} TEXT")
+
+        columns = list(mapping)
+        rows = cur.execute(f"SELECT rowid, {', '.join(columns)} FROM {table_name}").fetchall()
+        set_clause = ', '.join(f"{norm_column} = ?" for norm_column in mapping.values())
+        cur.executemany(
+            f"UPDATE {table_name} SET {set_clause} WHERE rowid = ?",
+            [[fold(value) for value in row[1:]] + [row[0]] for row in rows]
+        )
+
+    for index_sql in NORMALIZED_INDEXES:
+        cur.execute(index_sql)
+
+
+# Bảng tổng hợp theo phòng ban của nhân viên active (status != 'Deleted'),
+# được trigger trên Employees cập nhật
+DEPARTMENT_STATS_TABLE = """
+    CREATE TABLE IF NOT EXISTS DepartmentStats (
+        department TEXT PRIMARY KEY,
+        employee_count INTEGER NOT NULL,
+        salary_sum REAL NOT NULL,
+        min_salary REAL,
+        max_salary REAL
+    )
+"""
+
+# Cộng một nhân viên active vào phòng ban
+_STATS_ADD = """
+    INSERT INTO DepartmentStats (department, employee_count, salary_sum, min_salary, max_salary)
+    VALUES (new.department, 1, new.salary, new.salary, new.salary)
+    ON CONFLICT(department) DO UPDATE SET
+        employee_count = employee_count + 1,
+        salary_sum = salary_sum + excluded.salary_sum,
+        min_salary = MIN(min_salary, excluded.min_salary),
+        max_salary = MAX(max_salary, excluded.max_salary);
+"""
+
+# Trừ một nhân viên khỏi phòng ban; khi bỏ đúng giá trị min/max thì tính lại
+# từ Employees (tìm trên idx_employees_active_salary), phòng ban rỗng bị xóa
+_STATS_REMOVE = """
+    UPDATE DepartmentStats SET
+        employee_count = employee_count - 1,
+        salary_sum = salary_sum - old.salary,
+        min_salary = CASE WHEN old.salary <= min_salary THEN
+            (SELECT MIN(salary) FROM Employees WHERE department = old.department AND status != 'Deleted')
+            ELSE min_salary END,
+        max_salary = CASE WHEN old.salary >= max_salary THEN
+            (SELECT MAX(salary) FROM Employees WHERE department = old.department AND status != 'Deleted')
+            ELSE max_salary END
+    WHERE department = old.department;
+    DELETE FROM DepartmentStats WHERE department = old.department AND employee_count <= 0;
+"""
+
+DEPARTMENT_STATS_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_department_stats_insert AFTER INSERT ON Employees
+    WHEN new.status != 'Deleted' BEGIN {_STATS_ADD} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_department_stats_delete AFTER DELETE ON Employees
+    WHEN old.status != 'Deleted' BEGIN {_STATS_REMOVE} END""",
+    # Cập nhật (kể cả xóa mềm/khôi phục) = bỏ giá trị cũ + thêm giá trị mới
+    f"""CREATE TRIGGER IF NOT EXISTS trg_department_stats_update_old
+    AFTER UPDATE OF department, salary, status ON Employees
+    WHEN old.status != 'Deleted' BEGIN {_STATS_REMOVE} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_department_stats_update_new
+    AFTER UPDATE OF department, salary, status ON Employees
+    WHEN new.status != 'Deleted' BEGIN {_STATS_ADD} END""",
+]
+
+# Tính lại toàn bộ từ Employees
+DEPARTMENT_STATS_REBUILD = [
+    "DELETE FROM DepartmentStats",
+    """
+    INSERT INTO DepartmentStats (department, employee_count, salary_sum, min_salary, max_salary)
+    SELECT department, COUNT(*), SUM(salary), MIN(salary), MAX(salary)
+    FROM Employees WHERE status != 'Deleted' GROUP BY department
+    """,
+]
+
+
+def _department_stats(cur):
+    """Migration 5: bảng DepartmentStats và trigger cập nhật"""
+    cur.execute(DEPARTMENT_STATS_TABLE)
+    for trigger_sql in DEPARTMENT_STATS_TRIGGERS:
+        cur.execute(trigger_sql)
+    for sql in DEPARTMENT_STATS_REBUILD:
+        cur.execute(sql)
+
+
+# Mỗi nhân viên chỉ có một bản ghi chấm công mỗi ngày; là đích ON CONFLICT
+# của các câu lệnh ghi chấm công. Migration 6 tạo index này trên bảng tạm khi
+# dựng lại Attendance: bản ghi trùng (chỉ có thể sinh ra khi hai luồng ghi cùng
+# lúc) bị bỏ khi chép, giữ bản ghi được tạo trước; index thường
+# idx_attendance_employee_date không còn cần nữa
+ATTENDANCE_KEY_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_key ON {table}(employee_id, date)"
+
+
+# Tổng hợp chấm công theo nhân viên và tháng, được trigger trên Attendance cập nhật
+# (khóa chính bắt đầu bằng năm, tháng: đọc cả tháng là quét một khoảng của khóa)
+ATTENDANCE_MONTHLY_TABLE = """
+    CREATE TABLE IF NOT EXISTS AttendanceMonthly (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        employee_id TEXT NOT NULL,
+        total_days INTEGER NOT NULL,
+        total_work_hours REAL NOT NULL,
+        total_overtime_hours REAL NOT NULL,
+        late_days INTEGER NOT NULL,
+        present_days INTEGER NOT NULL,
+        PRIMARY KEY (year, month, employee_id)
+    )
+"""
+
+# Năm/tháng của cột date ('YYYY-MM-DD'); {row} là new/old trong trigger hoặc tên bảng
+_TEXT_DATE_MONTH = ("CAST(substr({row}.date, 1, 4) AS INTEGER)", "CAST(substr({row}.date, 6, 2) AS INTEGER)")
+
+
+def _monthly_rollup_sql(table, year_month, date_column):
+    """
+    Trigger và câu lệnh tính lại AttendanceMonthly cho bảng chấm công
+    Args:
+        table: Bảng chấm công nguồn
+        year_month: (biểu thức năm, biểu thức tháng) theo {row}
+        date_column: Cột ngày (trigger cập nhật chạy khi cột này đổi)
+    Returns:
+        (danh sách CREATE TRIGGER, danh sách câu lệnh tính lại toàn bộ)
+    """
+    year, month = year_month
+    match = (f"year = {year.format(row='old')} AND month = {month.format(row='old')} "
+             f"AND employee_id = old.employee_id")
+
+    # Cộng một ngày chấm công vào tháng
+    add = f"""
+    INSERT INTO AttendanceMonthly (year, month, employee_id, total_days, total_work_hours,
+                                   total_overtime_hours, late_days, present_days)
+    VALUES ({year.format(row='new')}, {month.format(row='new')}, new.employee_id, 1,
+            COALESCE(new.work_hours, 0), COALESCE(new.overtime_hours, 0),
+            CASE WHEN new.status = 'Late' THEN 1 ELSE 0 END,
+            CASE WHEN new.status = 'Present' THEN 1 ELSE 0 END)
+    ON CONFLICT(year, month, employee_id) DO UPDATE SET
+        total_days = total_days + 1,
+        total_work_hours = total_work_hours + excluded.total_work_hours,
+        total_overtime_hours = total_overtime_hours + excluded.total_overtime_hours,
+        late_days = late_days + excluded.late_days,
+        present_days = present_days + excluded.present_days;
+    """
+
+    # Trừ một ngày chấm công khỏi tháng; tháng không còn ngày nào bị xóa
+    remove = f"""
+    UPDATE AttendanceMonthly SET
+        total_days = total_days - 1,
+        total_work_hours = total_work_hours - COALESCE(old.work_hours, 0),
+        total_overtime_hours = total_overtime_hours - COALESCE(old.overtime_hours, 0),
+        late_days = late_days - CASE WHEN old.status = 'Late' THEN 1 ELSE 0 END,
+        present_days = present_days - CASE WHEN old.status = 'Present' THEN 1 ELSE 0 END
+    WHERE {match};
+    DELETE FROM AttendanceMonthly WHERE {match} AND total_days <= 0;
+    """
+
+    update_of = f"AFTER UPDATE OF employee_id, {date_column}, work_hours, overtime_hours, status ON {table}"
+    triggers = [
+        f"CREATE TRIGGER IF NOT EXISTS trg_attendance_monthly_insert AFTER INSERT ON {table} BEGIN {add} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_attendance_monthly_delete AFTER DELETE ON {table} BEGIN {remove} END",
+        # Cập nhật (kể cả upsert ON CONFLICT DO UPDATE) = bỏ giá trị cũ + thêm giá trị mới
+        f"CREATE TRIGGER IF NOT EXISTS trg_attendance_monthly_update_old {update_of} BEGIN {remove} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_attendance_monthly_update_new {update_of} BEGIN {add} END",
+    ]
+
+    rebuild = [
+        "DELETE FROM AttendanceMonthly",
+        f"""
+    INSERT INTO AttendanceMonthly (year, month, employee_id, total_days, total_work_hours,
+                                   total_overtime_hours, late_days, present_days)
+    SELECT {year.format(row=table)}, {month.format(row=table)}, employee_id,
+           COUNT(*), COALESCE(SUM(work_hours), 0), COALESCE(SUM(overtime_hours), 0),
+           SUM(CASE WHEN status = 'Late' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN status = 'Present' THEN 1 ELSE 0 END)
+    FROM {table} GROUP BY 1, 2, employee_id
+    """,
+    ]
+    return triggers, rebuild
+
+
+ATTENDANCE_MONTHLY_TRIGGERS, ATTENDANCE_MONTHLY_REBUILD = _monthly_rollup_sql(
+    'Attendance', _TEXT_DATE_MONTH, 'date'
+)
+
+
+def _attendance_monthly(cur):
+    """Migration 7: bảng AttendanceMonthly và trigger cập nhật"""
+    cur.execute(ATTENDANCE_MONTHLY_TABLE)
+    for trigger_sql in ATTENDANCE_MONTHLY_TRIGGERS:
+        cur.execute(trigger_sql)
+    for sql in ATTENDANCE_MONTHLY_REBUILD:
+        cur.execute(sql)
+
+
+# Lưu chấm công dạng số: ngày là số ngày tính từ 1970-01-01, giờ là số phút
+# tính từ 00:00. View Attendance giữ nguyên dạng TEXT cũ cho các nơi đọc/ghi cũ
+ATTENDANCE_DATA_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        attendance_id TEXT UNIQUE,
+        employee_id TEXT NOT NULL,
+        day INTEGER NOT NULL,
+        minute_in INTEGER NOT NULL,
+        minute_out INTEGER NOT NULL,
+        work_hours REAL,
+        overtime_hours REAL DEFAULT 0,
+        status TEXT DEFAULT 'Present',
+        notes TEXT,
+        created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        CHECK (minute_in BETWEEN 0 AND 1439 AND minute_out BETWEEN 0 AND 1439),
+        FOREIGN KEY (employee_id) REFERENCES Employees(id)
+    )
+"""
+
+# Khóa (nhân viên, ngày): tạo cùng bảng tạm khi dựng lại, theo bảng khi đổi tên
+ATTENDANCE_DAY_KEY_INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_employee_day ON {table}(employee_id, day)"
+)
+
+ATTENDANCE_DATA_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_attendance_day ON AttendanceData(day)",
+    "CREATE INDEX IF NOT EXISTS idx_attendance_day_time ON AttendanceData(day, minute_in, attendance_id)",
+]
+
+# Cột dạng TEXT tính từ cột số: {cột của view: biểu thức trên AttendanceData}
+ATTENDANCE_TEXT_COLUMNS = {
+    'date': "date(day * 86400, 'unixepoch')",
+    'time_in': "printf('%02d:%02d', minute_in / 60, minute_in % 60)",
+    'time_out': "printf('%02d:%02d', minute_out / 60, minute_out % 60)",
+}
+
+# Các cột của view Attendance (cùng thứ tự với bảng Attendance cũ)
+ATTENDANCE_VIEW_COLUMNS = (
+    'id', 'attendance_id', 'employee_id', 'date', 'time_in', 'time_out',
+    'work_hours', 'overtime_hours', 'status', 'notes', 'created_date'
+)
+
+# Chuỗi 'YYYY-MM-DD'/'HH:MM' của view thành số khi ghi qua view ({row}: new)
+_DAY_FROM_TEXT = "CAST(julianday({row}.date) - 2440587.5 AS INTEGER)"
+# (giờ sai định dạng cho NULL, bị NOT NULL từ chối)
+_MINUTES_FROM_TEXT = ("CASE WHEN {value} GLOB '[0-9]:[0-5][0-9]' OR {value} GLOB '[01][0-9]:[0-5][0-9]' "
+                      "OR {value} GLOB '2[0-3]:[0-5][0-9]' "
+                      "THEN CAST(substr({value}, 1, instr({value}, ':') - 1) AS INTEGER) * 60 "
+                      "+ CAST(substr({value}, instr({value}, ':') + 1) AS INTEGER) END")
+
+ATTENDANCE_VIEW = "CREATE VIEW IF NOT EXISTS Attendance AS SELECT {} FROM AttendanceData".format(
+    ', '.join(f"{ATTENDANCE_TEXT_COLUMNS[column]} AS {column}" if column in ATTENDANCE_TEXT_COLUMNS else column
+              for column in ATTENDANCE_VIEW_COLUMNS)
+)
+
+_VIEW_VALUES = {
+    'day': _DAY_FROM_TEXT.format(row='new'),
+    'minute_in': _MINUTES_FROM_TEXT.format(value='new.time_in'),
+    'minute_out': _MINUTES_FROM_TEXT.format(value='new.time_out'),
+}
+
+# Ghi qua view (INSTEAD OF): số hàng thay đổi và lastrowid không được SQLite
+# báo lại, INSERT ... ON CONFLICT không dùng được với view; AttendanceManager
+# ghi thẳng vào AttendanceData
+ATTENDANCE_VIEW_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_view_insert INSTEAD OF INSERT ON Attendance BEGIN
+        INSERT INTO AttendanceData (id, attendance_id, employee_id, day, minute_in, minute_out,
+                                    work_hours, overtime_hours, status, notes, created_date)
+        VALUES (new.id, new.attendance_id, new.employee_id, {_VIEW_VALUES['day']},
+                {_VIEW_VALUES['minute_in']}, {_VIEW_VALUES['minute_out']},
+                new.work_hours, COALESCE(new.overtime_hours, 0), COALESCE(new.status, 'Present'),
+                new.notes, COALESCE(new.created_date, CURRENT_TIMESTAMP));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_view_update INSTEAD OF UPDATE ON Attendance BEGIN
+        UPDATE AttendanceData SET
+            attendance_id = new.attendance_id, employee_id = new.employee_id, day = {_VIEW_VALUES['day']},
+            minute_in = {_VIEW_VALUES['minute_in']}, minute_out = {_VIEW_VALUES['minute_out']},
+            work_hours = new.work_hours, overtime_hours = new.overtime_hours, status = new.status,
+            notes = new.notes, created_date = new.created_date
+        WHERE id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_view_delete INSTEAD OF DELETE ON Attendance BEGIN
+        DELETE FROM AttendanceData WHERE id = old.id;
+    END
+    """,
+]
+
+# Năm/tháng của cột day (số ngày tính từ 1970-01-01)
+_DAY_MONTH = ("CAST(strftime('%Y', {row}.day * 86400, 'unixepoch') AS INTEGER)",
+              "CAST(strftime('%m', {row}.day * 86400, 'unixepoch') AS INTEGER)")
+
+ATTENDANCE_DATA_MONTHLY_TRIGGERS, ATTENDANCE_DATA_MONTHLY_REBUILD = _monthly_rollup_sql(
+    'AttendanceData', _DAY_MONTH, 'day'
+)
+
+
+
+def _legacy_day_sql(column):
+    """
+    Biểu thức SQL đổi ngày 'YYYY-MM-DD' của bảng Attendance cũ thành số ngày
+    tính từ 1970-01-01; chấp nhận cả '2024-1-5' mà validate_attendance_data cho
+    qua, NULL nếu sai định dạng hoặc ngày không có thật (vd: 2024-02-30)
+    """
+    text = f"trim({column})"
+    rest = f"substr({text}, 6)"
+    month = f"substr({rest}, 1, instr({rest}, '-') - 1)"
+    day = f"substr({rest}, instr({rest}, '-') + 1)"
+    padded = f"printf('%s-%02d-%02d', substr({text}, 1, 4), {month}, {day})"
+    return (f"CASE WHEN {text} GLOB '[0-9][0-9][0-9][0-9]-*' "
+            f"AND ({month} GLOB '[0-9]' OR {month} GLOB '[0-9][0-9]') "
+            f"AND ({day} GLOB '[0-9]' OR {day} GLOB '[0-9][0-9]') "
+            f"AND date({padded}, '+0 days') = {padded} "
+            f"THEN CAST(julianday({padded}) - 2440587.5 AS INTEGER) END")
+
+
+def _legacy_minutes_sql(column):
+    """
+    Biểu thức SQL đổi giờ 'HH:MM'/'H:MM' (có thể kèm giây) của bảng Attendance
+    cũ thành số phút tính từ 00:00, NULL nếu sai định dạng
+    """
+    text = f"ltrim({column})"
+    return (f"CASE WHEN {text} GLOB '[0-9]:[0-5][0-9]*' OR {text} GLOB '[01][0-9]:[0-5][0-9]*' "
+            f"OR {text} GLOB '2[0-3]:[0-5][0-9]*' "
+            f"THEN CAST(substr({text}, 1, instr({text}, ':') - 1) AS INTEGER) * 60 "
+            f"+ CAST(substr({text}, instr({text}, ':') + 1, 2) AS INTEGER) END")
+
+
+# Cột của AttendanceData tính từ bảng Attendance cũ (migration 8)
+ATTENDANCE_DATA_COLUMNS = {
+    column: column for column in ATTENDANCE_VIEW_COLUMNS if column not in ATTENDANCE_TEXT_COLUMNS
+}
+ATTENDANCE_DATA_COLUMNS.update({
+    'day': _legacy_day_sql('date'),
+    'minute_in': _legacy_minutes_sql('time_in'),
+    'minute_out': _legacy_minutes_sql('time_out'),
+})
+
+# Bản ghi cũ không đổi được sang dạng số: được chuyển nguyên dạng TEXT sang
+# AttendanceRejects thay vì làm migration dừng
+ATTENDANCE_REJECT_CONDITION = " OR ".join(
+    f"({ATTENDANCE_DATA_COLUMNS[column]}) IS NULL" for column in ('day', 'minute_in', 'minute_out')
+)
+
+
+# Tên bảng trong câu lệnh CREATE TABLE (dùng để tạo bảng tạm cùng cấu trúc)
+_CREATE_TABLE = re.compile(r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|\w+)',
+                           re.IGNORECASE)
+
+# Bảng tổng hợp do trigger cập nhật: {bảng: câu lệnh tính lại toàn bộ}
+ROLLUP_REBUILDS = {
+    'DepartmentStats': DEPARTMENT_STATS_REBUILD,
+    'AttendanceMonthly': ATTENDANCE_DATA_MONTHLY_REBUILD,
+}
+
+
+class TableRebuild:
+    """
+    Dựng lại một bảng lớn theo lô mà không khóa database lâu:
+    1. Tạo bảng tạm {table}__rebuild theo cấu trúc mới và trigger chép các
+       thay đổi mới trên bảng cũ sang bảng tạm
+    2. Chép dữ liệu cũ theo từng lô rowid, mỗi lô một transaction ngắn
+    3. Trong một transaction: xóa bảng cũ, đổi tên bảng tạm, tạo lại index/trigger
+    Có thể chạy lại nếu bị gián đoạn (bảng tạm được giữ, hàng đã chép được bỏ qua)
+    """
+
+    def __init__(self, table_name, create_sql=None, columns=None, unique_indexes=(), statements=(),
+                 replaced=(), chunk_size=2000, pause=0.01, target_name=None,
+                 rejects_table=None, reject_condition=None, on_rejects=()):
+        """
+        Args:
+            table_name: Tên bảng cần dựng lại
+            create_sql: Câu lệnh tạo bảng mới, dùng {table} thay cho tên bảng
+                        (None: giữ nguyên cấu trúc bảng hiện tại)
+            columns: Dictionary {cột mới: biểu thức trên các cột cũ}
+                     (mặc định: các cột có ở cả hai bảng)
+            unique_indexes: Các câu lệnh CREATE UNIQUE INDEX trên bảng mới ({table}), tạo cùng
+                            bảng tạm: hàng trùng khóa bị bỏ khi chép, giữ hàng có rowid nhỏ nhất
+            statements: Các câu lệnh (CREATE INDEX, trigger...) chạy sau khi đổi bảng
+                        (index/trigger hiện có của bảng được tạo lại tự động)
+            replaced: Tên các index/trigger hiện có không tạo lại (được thay bằng
+                      unique_indexes/statements)
+            chunk_size: Số hàng chép mỗi lô
+            pause: Thời gian nghỉ giữa các lô (giây) để nhường khóa ghi
+            target_name: Tên bảng mới (mặc định: giữ tên cũ); khi đổi tên, index/trigger
+                         của bảng cũ không được tạo lại
+            rejects_table: Bảng nhận nguyên dạng các hàng không chuyển đổi được
+            reject_condition: Điều kiện SQL trên cột cũ của hàng không chuyển đổi được
+                              (không chép sang bảng mới mà chuyển sang rejects_table)
+            on_rejects: Các câu lệnh chạy khi đổi bảng nếu có hàng bị loại
+                        (vd: tính lại bảng tổng hợp đã đếm các hàng này)
+        """
+        self.table_name = table_name
+        self.create_sql = create_sql
+        self.columns = columns
+        self.unique_indexes = list(unique_indexes)
+        self.statements = list(statements)
+        self.replaced = set(replaced)
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.target_name = target_name or table_name
+        self.rejects_table = rejects_table
+        self.reject_condition = reject_condition if rejects_table else None
+        self.on_rejects = list(on_rejects)
+
+    @property
+    def shadow_name(self):
+        return f"{self.table_name}__rebuild"
+
+    def _trigger_names(self):
+        return [f"{self.shadow_name}_{event}" for event in ('insert', 'update', 'delete')]
+
+    def _shadow_sql(self, db):
+        """Câu lệnh tạo bảng tạm"""
+        if self.create_sql is not None:
+            return self.create_sql.format(table=self.shadow_name)
+        create_sql = db.query(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table_name,)
+        ).scalar()
+        return _CREATE_TABLE.sub(f"CREATE TABLE IF NOT EXISTS {self.shadow_name}", create_sql, count=1)
+
+    def _column_map(self, db):
+        """Danh sách (cột mới, biểu thức) dùng để chép dữ liệu"""
+        if self.columns is not None:
+            return list(self.columns.items())
+        old_columns = {row[1] for row in db.get_table_info(self.table_name)}
+        return [(row[1], row[1]) for row in db.get_table_info(self.shadow_name) if row[1] in old_columns]
+
+    def _copy_sql(self, column_map, condition):
+        target = ', '.join(['rowid'] + [column for column, _ in column_map])
+        source = ', '.join(['rowid'] + [expr for _, expr in column_map])
+        if self.reject_condition:
+            condition = f"{condition} AND ({self.reject_condition}) IS NOT TRUE"
+        # Chép theo thứ tự rowid: khi trùng khóa UNIQUE, hàng cũ nhất được giữ
+        return (f"INSERT OR IGNORE INTO {self.shadow_name} ({target}) "
+                f"SELECT {source} FROM {self.table_name} WHERE {condition} ORDER BY rowid")
+
+    def _reject_sql(self, condition):
+        """Chép nguyên dạng các hàng không chuyển đổi được sang rejects_table"""
+        return (f"INSERT OR REPLACE INTO {self.rejects_table} SELECT rowid, * FROM {self.table_name} "
+                f"WHERE {condition} AND ({self.reject_condition}) IS TRUE")
+
+    def _prepare(self, db):
+        """Tạo bảng tạm và trigger đồng bộ thay đổi mới"""
+        with db.transaction():
+            db.conn.execute(self._shadow_sql(db))
+            for sql in self.unique_indexes:
+                db.conn.execute(sql.format(table=self.shadow_name))
+            column_map = self._column_map(db)
+            # Xóa rồi chép lại hàng; không dùng INSERT OR REPLACE vì REPLACE xóa
+            # cả hàng khác trùng khóa UNIQUE của bảng mới
+            sync = (f"DELETE FROM {self.shadow_name} WHERE rowid = NEW.rowid; "
+                    f"{self._copy_sql(column_map, 'rowid = NEW.rowid')};")
+            remove = f"DELETE FROM {self.shadow_name} WHERE rowid = OLD.rowid;"
+            if self.reject_condition:
+                db.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.rejects_table} AS "
+                                f"SELECT rowid AS source_rowid, * FROM {self.table_name} WHERE 0")
+                db.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{self.rejects_table}_source "
+                                f"ON {self.rejects_table}(source_rowid)")
+                sync = (f"DELETE FROM {self.rejects_table} WHERE source_rowid = NEW.rowid; {sync} "
+                        f"{self._reject_sql('rowid = NEW.rowid')};")
+                remove += f" DELETE FROM {self.rejects_table} WHERE source_rowid = OLD.rowid;"
+            insert_trigger, update_trigger, delete_trigger = self._trigger_names()
+            db.conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {insert_trigger} AFTER INSERT ON {self.table_name} "
+                f"BEGIN {sync} END"
+            )
+            db.conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {update_trigger} AFTER UPDATE ON {self.table_name} "
+                f"BEGIN {sync} END"
+            )
+            db.conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {delete_trigger} AFTER DELETE ON {self.table_name} "
+                f"BEGIN {remove} END"
+            )
+        return column_map
+
+    def _copy(self, db, column_map, progress=None, stop=None):
+        """
+        Chép dữ liệu theo từng lô rowid
+        Returns:
+            False nếu bị dừng giữa chừng (stop được đặt)
+        """
+        copy_sql = self._copy_sql(column_map, "rowid > ? AND rowid <= ?")
+        total = db.get_table_count(self.table_name)
+        # Hàng thêm sau khi đã có trigger được trigger chép sang, chỉ cần chép tới rowid hiện tại
+        max_rowid = db.query(f"SELECT MAX(rowid) FROM {self.table_name}").scalar(0)
+        copied = 0
+        last_rowid = 0
+        while last_rowid < max_rowid:
+            if stop is not None and stop.is_set():
+                return False
+            with db.transaction():
+                chunk_end = db.query(
+                    f"SELECT MAX(rowid) FROM (SELECT rowid FROM {self.table_name} "
+                    f"WHERE rowid > ? AND rowid <= ? ORDER BY rowid LIMIT ?)",
+                    (last_rowid, max_rowid, self.chunk_size)
+                ).scalar()
+                if chunk_end is None:
+                    break
+                if self.reject_condition:
+                    db.conn.execute(self._reject_sql("rowid > ? AND rowid <= ?"), (last_rowid, chunk_end))
+                db.conn.execute(copy_sql, (last_rowid, chunk_end))
+
+            copied += self.chunk_size
+            last_rowid = chunk_end
+            if progress:
+                progress(self.table_name, min(copied, total), total)
+            # Nhường khóa ghi cho các thao tác khác giữa các lô
+            time.sleep(self.pause)
+        return True
+
+    @staticmethod
+    def _sequence(db, table_name):
+        """Giá trị AUTOINCREMENT hiện tại của bảng (None nếu không có)"""
+        if not db.query("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'").scalar():
+            return None
+        return db.query("SELECT seq FROM sqlite_sequence WHERE name = ?", (table_name,)).scalar()
+
+    def _swap(self, db, version):
+        """
+        Thay bảng cũ bằng bảng mới và cập nhật user_version trong một transaction
+        Returns:
+            Số hàng bị chuyển sang rejects_table
+        """
+        target = self.target_name
+        with db.pool.write_lock:
+            # Giữ lại index/trigger hiện có (trừ trigger đồng bộ của bảng tạm và các mục được thay thế)
+            skipped = self.replaced | set(self._trigger_names())
+            recreate = [
+                sql for name, sql in db.query(
+                    "SELECT name, sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') "
+                    "AND sql IS NOT NULL",
+                    (self.table_name,)
+                ).fetchall()
+                if name not in skipped
+            ] if target == self.table_name else []
+            sequence = self._sequence(db, self.table_name)
+            rejected = db.query(f"SELECT COUNT(*) FROM {self.rejects_table}").scalar(0) if self.reject_condition else 0
+
+            # Không kiểm tra khóa ngoại/tham chiếu view trong lúc đổi bảng;
+            # hai PRAGMA này không đổi được bên trong transaction
+            db.conn.execute("PRAGMA foreign_keys = OFF")
+            db.conn.execute("PRAGMA legacy_alter_table = ON")
+            try:
+                with db.transaction():
+                    for trigger in self._trigger_names():
+                        db.conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                    db.conn.execute(f"DROP TABLE {self.table_name}")
+                    db.conn.execute(f"ALTER TABLE {self.shadow_name} RENAME TO {target}")
+                    for sql in recreate + self.statements + (self.on_rejects if rejected else []):
+                        db.conn.execute(sql)
+                    if self.reject_condition and not rejected:
+                        db.conn.execute(f"DROP TABLE {self.rejects_table}")
+
+                    # Không cấp lại id AUTOINCREMENT đã dùng ở bảng cũ (kể cả của hàng đã xóa)
+                    if sequence is not None:
+                        db.conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?",
+                                        (sequence, target))
+
+                    # Bảng mới có rowid khác: dựng lại index FTS của bảng
+                    fts_name = fulltext.fulltext_table_for(target)
+                    if fts_name and db.table_exists(fts_name):
+                        db.conn.execute(fulltext.rebuild_statement(fts_name))
+
+                    violations = db.query(f"PRAGMA foreign_key_check({target})").fetchall()
+                    if violations:
+                        raise RuntimeError(f"Vi phạm khóa ngoại sau khi dựng lại {target}: {violations[:5]}")
+                    db.conn.execute(f"PRAGMA user_version = {int(version)}")
+            finally:
+                db.conn.execute("PRAGMA legacy_alter_table = OFF")
+                db.conn.execute("PRAGMA foreign_keys = ON")
+        return rejected
+
+    def run(self, db, version, progress=None, stop=None):
+        """
+        Thực hiện dựng lại bảng
+        Args:
+            version: user_version ghi lại khi đổi bảng xong
+            progress: Hàm progress(table_name, copied, total) báo tiến độ
+            stop: threading.Event; khi được đặt, dừng sau lô đang chép (bảng tạm
+                  được giữ để chạy tiếp lần sau)
+        """
+        column_map = self._prepare(db)
+        if not self._copy(db, column_map, progress, stop):
+            return
+        rejected = self._swap(db, version)
+        if rejected:
+            print(f"Migration {version}: {rejected} hàng {self.table_name} không chuyển đổi được, "
+                  f"giữ nguyên trong bảng {self.rejects_table}")
+            db.log_change(
+                user_id='system',
+                action='MIGRATION_REJECTS',
+                table_name=self.table_name,
+                record_id=self.rejects_table,
+                new_values={'version': version, 'rejected': rejected}
+            )
+
+
+class Migration:
+    """
+    Một bước thay đổi schema
+    Migration thường chạy trong một transaction khi khởi động; migration có
+    rebuild (TableRebuild) chạy nền theo lô
+    """
+
+    def __init__(self, version, description, apply=None, rebuild=None):
+        """
+        Args:
+            version: Số phiên bản schema sau migration (tăng dần, lưu ở PRAGMA user_version)
+            description: Mô tả ngắn
+            apply: Hàm apply(cursor) chạy các câu lệnh DDL/DML
+            rebuild: TableRebuild cho bảng lớn (chạy nền)
+        """
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.rebuild = rebuild
+
+    @property
+    def background(self):
+        return self.rebuild is not None
+
+
+# Danh sách migration theo thứ tự; chỉ thêm mới vào cuối, không sửa migration đã phát hành
+MIGRATIONS = [
+    Migration(1, "Schema ban đầu", apply=_initial_schema),
+    Migration(2, "Index một phần cho nhân viên active", apply=_active_employee_indexes),
+    Migration(3, "Tìm kiếm toàn văn FTS5", apply=_fulltext_search),
+    Migration(4, "Cột chuẩn hóa cho tìm kiếm không dấu", apply=_normalized_columns),
+    Migration(5, "Thống kê theo phòng ban (DepartmentStats)", apply=_department_stats),
+    Migration(6, "Khóa UNIQUE (nhân viên, ngày) cho chấm công",
+              rebuild=TableRebuild('Attendance', unique_indexes=[ATTENDANCE_KEY_INDEX],
+                                   replaced=('idx_attendance_employee_date',))),
+    Migration(7, "Tổng hợp chấm công theo tháng (AttendanceMonthly)", apply=_attendance_monthly),
+    # Chuyển Attendance sang AttendanceData lưu ngày/giờ dạng số, view Attendance cùng tên, cùng cột
+    # với bảng cũ; AttendanceMonthly giữ nguyên (chỉ tính lại khi có bản ghi bị loại)
+    Migration(8, "Lưu ngày/giờ chấm công dạng số (AttendanceData, view Attendance)",
+              rebuild=TableRebuild('Attendance', ATTENDANCE_DATA_TABLE, columns=ATTENDANCE_DATA_COLUMNS,
+                                   target_name='AttendanceData', unique_indexes=[ATTENDANCE_DAY_KEY_INDEX],
+                                   statements=ATTENDANCE_DATA_INDEXES + [ATTENDANCE_VIEW]
+                                   + ATTENDANCE_VIEW_TRIGGERS + ATTENDANCE_DATA_MONTHLY_TRIGGERS,
+                                   rejects_table='AttendanceRejects',
+                                   reject_condition=ATTENDANCE_REJECT_CONDITION,
+                                   on_rejects=ATTENDANCE_DATA_MONTHLY_REBUILD)),
+]
+
+
+class MigrationRunner:
+    """
+    Áp dụng các migration theo user_version
+    Khi schema đã mới nhất, khởi động chỉ tốn một lần đọc PRAGMA user_version
+    """
+
+    def __init__(self, db, migrations=None):
+        """
+        Args:
+            db: Instance Database
+            migrations: Danh sách Migration (mặc định: MIGRATIONS)
+        """
+        self.db = db
+        self.migrations = sorted(MIGRATIONS if migrations is None else migrations, key=lambda m: m.version)
+        self.latest_version = self.migrations[-1].version if self.migrations else 0
+        self._thread = None
+        self._stop = threading.Event()
+        self.error = None
+
+    def current_version(self):
+        """Phiên bản schema hiện tại của database"""
+        with self.db.pool.connection(readonly=False) as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def pending(self):
+        """Các migration chưa áp dụng"""
+        version = self.current_version()
+        return [m for m in self.migrations if m.version > version]
+
+    def is_new_database(self):
+        """Database chưa có bảng dữ liệu nào (mới tạo, chưa chạy migration 1)"""
+        with self.db.pool.connection(readonly=False) as conn:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' LIMIT 1"
+            ).fetchone() is None
+
+    def _apply(self, migration, progress=None):
+        """Áp dụng một migration"""
+        try:
+            if migration.background:
+                migration.rebuild.run(self.db, migration.version, progress, self._stop)
+                return
+
+            with self.db.transaction():
+                cur = self.db.conn.cursor()
+                try:
+                    if migration.apply:
+                        migration.apply(cur)
+                    cur.execute(f"PRAGMA user_version = {int(migration.version)}")
+                finally:
+                    cur.close()
+        except Exception as e:
+            print(f"Migration {migration.version} ({migration.description}) error: {e}")
+            raise
+
+    def migrate(self, background=True, progress=None):
+        """
+        Áp dụng các migration còn thiếu theo thứ tự
+        Args:
+            background: True để chạy migration dựng lại bảng (và các migration sau nó)
+                        ở thread nền; False để chạy tất cả ngay (database chưa có bảng
+                        nào luôn chạy ngay)
+            progress: Hàm báo tiến độ cho migration dựng lại bảng
+        Returns:
+            Phiên bản schema sau các migration đã chạy đồng bộ
+        """
+        current = self.current_version()
+        if current >= self.latest_version:
+            return self.latest_version
+        # Database mới (chưa có bảng nào): dựng lại bảng rỗng không mất thời gian.
+        # Database cũ có dữ liệu từ trước khi dùng user_version cũng ở phiên bản 0
+        if current == 0 and self.is_new_database():
+            background = False
+
+        pending = self.pending()
+        for index, migration in enumerate(pending):
+            if migration.background and background:
+                self._start_background(pending[index:], progress)
+                return self.current_version()
+            self._apply(migration, progress)
+        return self.current_version()
+
+    def _start_background(self, migrations, progress):
+        if self.is_running():
+            return
+
+        def run():
+            try:
+                for migration in migrations:
+                    if self._stop.is_set():
+                        break
+                    self._apply(migration, progress)
+            except Exception as e:
+                self.error = e
+
+        self.error = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="SchemaMigration", daemon=True)
+        self._thread.start()
+
+    def is_running(self):
+        """Có migration đang chạy nền không"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=None):
+        """
+        Dừng migration nền sau lô đang chép (khi đóng database); phần còn lại
+        được chạy tiếp ở lần khởi động sau
+        Returns:
+            True nếu thread nền đã dừng
+        """
+        self._stop.set()
+        return self.wait(timeout)
+
+    def wait(self, timeout=None):
+        """
+        Chờ migration nền hoàn tất
+        Returns:
+            True nếu đã xong (không còn chạy)
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.is_running()
+
+    def require(self, version=None, timeout=None):
+        """
+        Chờ tới khi schema đạt phiên bản version (mặc định: mới nhất); gọi trước
+        khi dùng bảng mà migration chạy nền tạo ra hoặc dựng lại
+        Raises:
+            RuntimeError nếu migration nền bị lỗi hoặc chưa xong sau timeout
+        """
+        version = self.latest_version if version is None else version
+        if self.current_version() >= version:
+            return
+        self.wait(timeout)
+        if self.current_version() < version:
+            reason = self.error or "migration chưa chạy xong"
+            raise RuntimeError(f"Schema chưa được nâng lên phiên bản {version}: {reason}")
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.db.database import get_db
+
+    parser = argparse.ArgumentParser(description="Áp dụng migration cho database")
+    parser.add_argument("--status", action="store_true", help="Chỉ hiển thị phiên bản schema")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="Tính lại các bảng tổng hợp (DepartmentStats, AttendanceMonthly)")
+    args = parser.parse_args()
+
+    runner = get_db().migrations
+    if args.rebuild_rollups:
+        print("Đã tính lại bảng tổng hợp" if get_db().rebuild_rollups() else "Không thể tính lại bảng tổng hợp")
+    elif not args.status:
+        runner.migrate(background=False,
+                       progress=lambda table, copied, total: print(f"{table}: {copied}/{total}"))
+    print(f"Schema: phiên bản {runner.current_version()}/{runner.latest_version}")
@@ -0,0 +1,86 @@
+import unicodedata
+
+
+def _build_fold_table():
+    """
+    Bảng chuyển ký tự có dấu -> không dấu, dựng một lần khi import
+    Gồm các khối Latin có chữ tiếng Việt (kể cả dạng dựng sẵn như "ễ")
+    và các dấu kết hợp (chuỗi dạng NFD)
+    """
+    table = {}
+    for start, end in ((0x00C0, 0x0250), (0x1E00, 0x1F00)):
+        for code in range(start, end):
+            char = chr(code)
+            base = ''.join(c for c in unicodedata.normalize('NFD', char) if not unicodedata.combining(c))
+            if base and base != char:
+                table[code] = base.lower()
+
+    # Dấu kết hợp (U+0300 - U+036F) bị bỏ
+    for code in range(0x0300, 0x0370):
+        table[code] = None
+
+    # "đ" không tách được bằng NFD
+    table[ord('đ')] = 'd'
+    table[ord('Đ')] = 'd'
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+
+# Cột chuẩn hóa của từng bảng: {bảng: {cột gốc: cột chuẩn hóa}}
+NORMALIZED_COLUMNS = {
+    'Employees': {'name': 'name_norm', 'email': 'email_norm', 'position': 'position_norm'},
+    'Candidates': {'name': 'name_norm', 'email': 'email_norm', 'position': 'position_norm'},
+}
+
+
+def fold(text):
+    """
+    Chuẩn hóa chuỗi để tìm kiếm: bỏ dấu, chữ thường, gộp khoảng trắng
+    "  Nguyễn  Văn Đức " -> "nguyen van duc"
+    """
+    if text is None:
+        return None
+    return ' '.join(str(text).translate(_FOLD_TABLE).lower().split())
+
+
+def normalize_row(table_name, data):
+    """
+    Bổ sung các cột chuẩn hóa cho dữ liệu ghi vào bảng
+    Returns:
+        Dictionary mới có thêm cột *_norm (giữ nguyên data nếu bảng không có cột chuẩn hóa)
+    """
+    mapping = NORMALIZED_COLUMNS.get(table_name)
+    if not mapping or not any(column in data for column in mapping):
+        return data
+
+    row = dict(data)
+    for column, norm_column in mapping.items():
+        if column in data:
+            row[norm_column] = fold(data[column])
+    return row
+
+
+def normalized_columns(table_name, columns):
+    """Danh sách cột kèm các cột chuẩn hóa tương ứng (dùng cho update_columns của upsert)"""
+    mapping = NORMALIZED_COLUMNS.get(table_name, {})
+    result = list(columns)
+    for column in columns:
+        norm_column = mapping.get(column)
+        if norm_column and norm_column not in result:
+            result.append(norm_column)
+    return result
+
+
+def prefix_range(term):
+    """
+    Khoảng [low, high) của mọi chuỗi bắt đầu bằng term (đã chuẩn hóa), để tìm
+    tiền tố bằng "col >= ? AND col < ?" trên index
+    Returns:
+        (low, high), None nếu term rỗng
+    """
+    low = fold(term)
+    if not low:
+        return None
+    high = low[:-1] + chr(ord(low[-1]) + 1)
+    return low, high
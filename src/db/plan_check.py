@@ -0,0 +1,407 @@
+import json
+import os
+import random
+import re
+import tempfile
+from contextlib import contextmanager
+
+from src.db.instrumentation import fingerprint
+
+# Bảng có từ số hàng này trở lên được coi là lớn: SCAN toàn bảng bị báo lỗi
+LARGE_TABLE_ROWS = 1000
+
+# File baseline mặc định (kế hoạch thực thi đã được chấp nhận)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_plan_baseline.json")
+
+# Tên bảng trong kế hoạch có thể kèm schema (vd: "SCAN main.EmployeesFts_config")
+_SCAN = re.compile(r'^SCAN (?:\w+\.)?(\w+)(?: USING (?:COVERING )?INDEX (\w+))?')
+_VIRTUAL = re.compile(r'^SCAN (?:\w+\.)?(\w+) VIRTUAL TABLE INDEX')
+_SEARCH = re.compile(r'^SEARCH (?:\w+\.)?(\w+) USING (?:(?:COVERING )?INDEX (\w+)|(INTEGER PRIMARY KEY))')
+_CHECKED = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+
+def seed_database(db, employees=1000, days=20, seed=42):
+    """
+    Tạo dữ liệu mẫu đủ lớn để planner chọn kế hoạch như trên dữ liệu thật
+    Args:
+        employees: Số nhân viên
+        days: Số ngày chấm công mỗi nhân viên
+        seed: Seed ngẫu nhiên (dữ liệu cố định giữa các lần chạy)
+    """
+    rng = random.Random(seed)
+    departments = ['IT', 'HR', 'Marketing', 'Sales', 'Finance', 'Operations']
+    statuses = ['Chờ xử lý', 'Đang xử lý', 'Đã xử lý']
+
+    db.bulk_insert('Employees', [
+        {
+            'id': f"EMP{i:06d}",
+            'name': f"Nhân viên {rng.randint(1, 5000)}",
+            'department': rng.choice(departments),
+            'salary': rng.randint(8, 50) * 1000000,
+            'join_date': f"20{rng.randint(15, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'position': rng.choice(['Developer', 'Manager', 'Specialist', 'Intern']),
+            'status': 'Deleted' if i % 20 == 0 else 'Active'
+        }
+        for i in range(1, employees + 1)
+    ])
+
+    db.bulk_insert('Attendance', [
+        {
+            'attendance_id': f"ATT{(e - 1) * days + d:06d}",
+            'employee_id': f"EMP{e:06d}",
+            'date': f"2024-{(d // 28) + 1:02d}-{(d % 28) + 1:02d}",
+            'time_in': f"0{rng.randint(7, 9)}:{rng.randint(0, 59):02d}",
+            'time_out': f"1{rng.randint(7, 9)}:{rng.randint(0, 59):02d}",
+            'work_hours': 8.0,
+            'status': 'Present'
+        }
+        for e in range(1, employees + 1)
+        for d in range(days)
+    ])
+
+    db.bulk_insert('Candidates', [
+        {
+            'candidate_id': f"CAN{i:06d}",
+            'name': f"Ứng viên {i}",
+            'email': f"candidate{i}@example.com",
+            'position': rng.choice(['Developer', 'Tester', 'Designer', 'Analyst']),
+            'experience': rng.randint(0, 15),
+            'status': rng.choice(statuses),
+            'application_date': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        }
+        for i in range(1, employees + 1)
+    ])
+
+    db.bulk_insert('Feedbacks', [
+        {
+            'feedback_id': f"FB{i:06d}",
+            'employee_id': f"EMP{rng.randint(1, employees):06d}",
+            'category': rng.choice(['Chung', 'Lương thưởng', 'Môi trường']),
+            'priority': rng.choice(['Thấp', 'Trung bình', 'Cao']),
+            'content': f"Nội dung phản hồi {i}",
+            'status': rng.choice(statuses),
+            'created_date': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 09:00:00"
+        }
+        for i in range(1, employees + 1)
+    ])
+
+    db.bulk_insert('Payrolls', [
+        {
+            'payroll_id': f"PAY{(e - 1) * 6 + m:06d}",
+            'employee_id': f"EMP{e:06d}",
+            'month': m,
+            'year': 2024,
+            'basic_salary': 10000000,
+            'gross_salary': 12000000,
+            'net_salary': 10500000
+        }
+        for e in range(1, employees + 1)
+        for m in range(1, 7)
+    ])
+
+    # Thống kê cho planner
+    db.execute("ANALYZE")
+
+
+def run_workload():
+    """
+    Gọi các phương thức đọc/ghi chính của các manager trên database hiện tại (get_db)
+    Returns:
+        Danh sách (tên phương thức, lỗi hoặc None)
+    """
+    from src.logic.employee import EmployeeManager
+    from src.logic.attendance import AttendanceManager
+    from src.logic.candidate import CandidateManager
+    from src.logic.feedback import FeedbackManager
+    from src.logic.salary import SalaryManager
+
+    employee = EmployeeManager()
+    attendance = AttendanceManager()
+    candidate = CandidateManager()
+    feedback = FeedbackManager()
+    salary = SalaryManager()
+
+    calls = [
+        ('EmployeeManager.employee_exists', lambda: employee.employee_exists('EMP000010')),
+        ('EmployeeManager.get_all_employees_page', lambda: employee.get_all_employees_page()),
+        ('EmployeeManager.search_employee_page', lambda: employee.search_employee_page('IT')),
+        ('EmployeeManager.search_employee', lambda: employee.search_employee('Nhân viên 12')),
+        ('EmployeeManager.get_employee_by_id', lambda: employee.get_employee_by_id('EMP000010')),
+        ('EmployeeManager.get_employees_by_department', lambda: employee.get_employees_by_department('IT')),
+        ('EmployeeManager.get_employee_statistics', lambda: employee.get_employee_statistics()),
+        ('EmployeeManager.get_departments', lambda: employee.get_departments()),
+        ('EmployeeManager.update_employee',
+         lambda: employee.update_employee('EMP000011', 'Nhân viên sửa', 'IT', 20000000, '2020-01-01')),
+
+        ('AttendanceManager.attendance_exists', lambda: attendance.attendance_exists('EMP000010', '2024-01-05')),
+        ('AttendanceManager.get_attendance_by_id', lambda: attendance.get_attendance_by_id('ATT000010')),
+        ('AttendanceManager.get_attendance_by_employee',
+         lambda: attendance.get_attendance_by_employee('EMP000010', '2024-01-01', '2024-01-31')),
+        ('AttendanceManager.get_attendance_by_date_range_page',
+         lambda: attendance.get_attendance_by_date_range_page('2024-01-01', '2024-01-10')),
+        ('AttendanceManager.get_attendance_statistics',
+         lambda: attendance.get_attendance_statistics('2024-01-01', '2024-01-31')),
+        ('AttendanceManager.get_monthly_attendance_summary',
+         lambda: attendance.get_monthly_attendance_summary(2024, 1)),
+        ('AttendanceManager.update_attendance',
+         lambda: attendance.update_attendance('ATT000011', 'EMP000001', '2024-01-12', '08:00', '17:00')),
+
+        ('CandidateManager.email_exists', lambda: candidate.email_exists('candidate10@example.com')),
+        ('CandidateManager.get_candidate_by_id', lambda: candidate.get_candidate_by_id('CAN000010')),
+        ('CandidateManager.get_all_candidates_page', lambda: candidate.get_all_candidates_page()),
+        ('CandidateManager.search_candidates_page', lambda: candidate.search_candidates_page('Dev')),
+        ('CandidateManager.search_candidates', lambda: candidate.search_candidates('candidate12@example')),
+        ('CandidateManager.get_candidates_by_status', lambda: candidate.get_candidates_by_status('Chờ xử lý')),
+        ('CandidateManager.get_candidate_statistics', lambda: candidate.get_candidate_statistics()),
+        ('CandidateManager.get_interview_schedule', lambda: candidate.get_interview_schedule('2024-01-01', '2024-12-31')),
+        ('CandidateManager.update_candidate_status',
+         lambda: candidate.update_candidate_status('CAN000010', 'Đã phỏng vấn')),
+
+        ('FeedbackManager.get_all_feedbacks_extended_page', lambda: feedback.get_all_feedbacks_extended_page()),
+        ('FeedbackManager.search_feedbacks_page', lambda: feedback.search_feedbacks_page('EMP0001')),
+        ('FeedbackManager.search_feedbacks', lambda: feedback.search_feedbacks('phan hoi 12')),
+        ('FeedbackManager.get_feedbacks_by_status', lambda: feedback.get_feedbacks_by_status('Chờ xử lý')),
+        ('FeedbackManager.get_feedbacks_by_category', lambda: feedback.get_feedbacks_by_category('Chung')),
+        ('FeedbackManager.get_feedback_by_id', lambda: feedback.get_feedback_by_id('FB000010')),
+        ('FeedbackManager.get_recent_feedbacks', lambda: feedback.get_recent_feedbacks()),
+        ('FeedbackManager.get_feedback_statistics', lambda: feedback.get_feedback_statistics()),
+        ('FeedbackManager.get_feedbacks_by_employee', lambda: feedback.get_feedbacks_by_employee('EMP000010')),
+        ('FeedbackManager.update_feedback_status',
+         lambda: feedback.update_feedback_status('FB000010', 'Đang xử lý', 'admin')),
+
+        ('SalaryManager.get_payroll_by_employee', lambda: salary.get_payroll_by_employee('EMP000010', 1, 2024)),
+        ('SalaryManager.get_monthly_payroll_report', lambda: salary.get_monthly_payroll_report(1, 2024)),
+        ('SalaryManager.get_salary_statistics', lambda: salary.get_salary_statistics(1, 2024)),
+        ('SalaryManager.analyze_salary_trends', lambda: salary.analyze_salary_trends('EMP000010')),
+        ('SalaryManager.get_salary_components', lambda: salary.get_salary_components('EMP000010')),
+        ('SalaryManager.get_payroll_by_id', lambda: salary.get_payroll_by_id('PAY000010')),
+        ('SalaryManager.update_payroll_status', lambda: salary.update_payroll_status('PAY000010', 'Approved')),
+    ]
+
+    results = []
+    for name, call in calls:
+        try:
+            call()
+            results.append((name, None))
+        except Exception as e:
+            results.append((name, str(e)))
+    return results
+
+
+class QueryPlanChecker:
+    """
+    Kiểm tra kế hoạch thực thi (EXPLAIN QUERY PLAN) của các câu lệnh mà
+    các manager gửi tới database: báo SCAN toàn bảng trên bảng lớn và so sánh
+    với baseline để phát hiện câu lệnh trước đây dùng index nay không dùng nữa
+    """
+
+    def __init__(self, db, large_table_rows=LARGE_TABLE_ROWS):
+        """
+        Args:
+            db: Instance Database (đã có dữ liệu)
+            large_table_rows: Ngưỡng số hàng của bảng lớn
+        """
+        self.db = db
+        self.large_table_rows = large_table_rows
+        self._table_rows = {}
+
+    @contextmanager
+    def capture(self):
+        """
+        Ghi lại mọi câu lệnh chạy trên kết nối ghi và kết nối đọc của thread hiện tại
+        Yields:
+            Danh sách câu lệnh (SQL đã thay tham số) được bổ sung dần
+        """
+        captured = []
+
+        def trace(sql):
+            # Câu lệnh bên trong trigger được báo dạng comment "-- ..."
+            if not sql.startswith('--'):
+                captured.append(sql)
+
+        connections = {id(conn): conn for conn in (self.db.conn, self.db.pool.reader())}
+        for conn in connections.values():
+            conn.set_trace_callback(trace)
+        try:
+            yield captured
+        finally:
+            for conn in connections.values():
+                conn.set_trace_callback(None)
+
+    def _row_count(self, table_name):
+        """Số hàng của bảng (0 với tên không phải bảng: CTE, subquery, view)"""
+        if table_name not in self._table_rows:
+            try:
+                is_table = self.db.query(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [table_name]
+                ).scalar() is not None
+                self._table_rows[table_name] = self.db.get_table_count(table_name) if is_table else 0
+            except Exception:
+                self._table_rows[table_name] = 0
+        return self._table_rows[table_name]
+
+    def analyze(self, sql):
+        """
+        Phân tích kế hoạch thực thi của một câu lệnh
+        Returns:
+            Dictionary {'plan', 'full_scans', 'index_scans', 'indexes'}
+        """
+        plan = self.db.explain_query_plan(sql)
+        full_scans, index_scans, indexes = set(), set(), set()
+
+        for detail in plan:
+            # Bảng FTS5: truy vấn MATCH dùng index toàn văn
+            virtual = _VIRTUAL.match(detail)
+            if virtual:
+                indexes.add(virtual.group(1))
+                index_scans.add(virtual.group(1))
+                continue
+
+            scan = _SCAN.match(detail)
+            if scan:
+                table_name, index_name = scan.groups()
+                if index_name:
+                    indexes.add(index_name)
+                    index_scans.add(table_name)
+                elif self._row_count(table_name) >= self.large_table_rows:
+                    full_scans.add(table_name)
+                continue
+
+            search = _SEARCH.match(detail)
+            if search:
+                indexes.add(search.group(2) or search.group(3))
+
+        return {
+            'plan': plan,
+            'full_scans': sorted(full_scans),
+            'index_scans': sorted(index_scans),
+            'indexes': sorted(indexes)
+        }
+
+    def check(self, workload=run_workload):
+        """
+        Chạy workload, gom câu lệnh theo fingerprint và phân tích kế hoạch
+        Returns:
+            Dictionary {'queries': {fingerprint: kết quả analyze + 'sql'}, 'errors': [(phương thức, lỗi)]}
+        """
+        with self.capture() as captured:
+            results = workload()
+
+        queries = {}
+        for sql in captured:
+            if not sql.lstrip()[:7].upper().startswith(_CHECKED):
+                continue
+            key = fingerprint(sql)
+            if key in queries or 'sqlite_master' in key:
+                continue
+            try:
+                queries[key] = dict(self.analyze(sql), sql=sql)
+            except Exception as e:
+                queries[key] = {'plan': [f"EXPLAIN error: {e}"], 'full_scans': [],
+                                'index_scans': [], 'indexes': [], 'sql': sql}
+
+        return {
+            'queries': queries,
+            'errors': [(name, error) for name, error in results if error]
+        }
+
+    @staticmethod
+    def compare(report, baseline):
+        """
+        So sánh kết quả với baseline
+        Returns:
+            Danh sách hồi quy {'fingerprint', 'reason'}: câu lệnh đã có trong baseline
+            nay SCAN toàn bảng mới hoặc không còn dùng index đã dùng trước đây
+        """
+        regressions = []
+        for key, current in report['queries'].items():
+            previous = baseline.get(key)
+            if previous is None:
+                continue
+
+            new_scans = set(current['full_scans']) - set(previous['full_scans'])
+            if new_scans:
+                regressions.append({'fingerprint': key,
+                                    'reason': f"SCAN toàn bảng mới: {', '.join(sorted(new_scans))}"})
+
+            lost = set(previous['indexes']) - set(current['indexes'])
+            if lost and not current['indexes']:
+                regressions.append({'fingerprint': key,
+                                    'reason': f"Không còn dùng index: {', '.join(sorted(lost))}"})
+        return regressions
+
+    @staticmethod
+    def load_baseline(path=DEFAULT_BASELINE):
+        """Đọc baseline {fingerprint: {'full_scans', 'indexes', 'plan'}} (rỗng nếu chưa có)"""
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def save_baseline(report, path=DEFAULT_BASELINE):
+        """Ghi kết quả hiện tại làm baseline"""
+        baseline = {
+            key: {'full_scans': item['full_scans'], 'indexes': item['indexes'], 'plan': item['plan']}
+            for key, item in sorted(report['queries'].items())
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+
+
+def main(argv=None):
+    import argparse
+    from src.db.database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Kiểm tra EXPLAIN QUERY PLAN của các câu lệnh trong src/logic")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="File baseline JSON")
+    parser.add_argument("--update-baseline", action="store_true", help="Ghi kết quả hiện tại làm baseline")
+    parser.add_argument("--employees", type=int, default=1000, help="Số nhân viên trong dữ liệu mẫu")
+    parser.add_argument("--strict", action="store_true",
+                        help="Báo lỗi cả khi có SCAN toàn bảng lớn chưa có trong baseline")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Các manager lấy database qua get_db(): trỏ singleton sang database tạm
+        manager = DatabaseManager()
+        db = manager.get_database(os.path.join(tmp_dir, "plan_check.db"))
+        try:
+            seed_database(db, employees=args.employees)
+            checker = QueryPlanChecker(db)
+            report = checker.check()
+        finally:
+            manager.close_database()
+
+    for name, error in report['errors']:
+        print(f"[LỖI] {name}: {error}")
+
+    flagged = {key: item for key, item in report['queries'].items() if item['full_scans']}
+    for key, item in sorted(flagged.items()):
+        print(f"[SCAN] {', '.join(item['full_scans'])}: {key}")
+        for detail in item['plan']:
+            print(f"        {detail}")
+
+    if args.update_baseline:
+        QueryPlanChecker.save_baseline(report, args.baseline)
+        print(f"Đã ghi baseline ({len(report['queries'])} câu lệnh): {args.baseline}")
+        return 0
+
+    baseline = QueryPlanChecker.load_baseline(args.baseline)
+    regressions = QueryPlanChecker.compare(report, baseline)
+    for item in regressions:
+        print(f"[HỒI QUY] {item['reason']}: {item['fingerprint']}")
+
+    new_scans = [key for key in flagged if key not in baseline]
+    for key in new_scans:
+        print(f"[MỚI] Câu lệnh chưa có trong baseline SCAN toàn bảng: {key}")
+
+    print(f"{len(report['queries'])} câu lệnh, {len(flagged)} SCAN toàn bảng lớn, "
+          f"{len(regressions)} hồi quy")
+
+    failed = regressions or report['errors'] or (args.strict and new_scans)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+import sqlite3
+import threading
+import os
+import pathlib
+from contextlib import contextmanager
+
+from src.db.statements import CACHED_STATEMENTS
+
+
+class ConnectionPool:
+    """
+    Quản lý kết nối SQLite cho nhiều thread:
+    - Một kết nối ghi (writer) duy nhất, được bảo vệ bởi write_lock
+    - Mỗi thread có một kết nối chỉ đọc (reader) riêng, mở khi cần
+    """
+
+    def __init__(self, db_path, max_readers=16, timeout=30.0):
+        """
+        Khởi tạo pool kết nối
+        Args:
+            db_path: Đường dẫn đến file database
+            max_readers: Số kết nối chỉ đọc tối đa được mở cùng lúc
+            timeout: Thời gian chờ khóa (giây)
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self.max_readers = max_readers
+
+        # Database trong bộ nhớ không thể chia sẻ giữa nhiều kết nối
+        self.shared_reader = db_path in (':memory:', '') or db_path.startswith('file::memory:')
+
+        self.write_lock = threading.RLock()
+        self._writer = self._connect(readonly=False)
+
+        self._local = threading.local()
+        self._readers = []  # [(thread, connection)]
+        self._readers_lock = threading.Lock()
+        self._reader_slots = threading.BoundedSemaphore(max_readers)
+        self._closed = False
+
+    def _connect(self, readonly):
+        """Mở một kết nối mới"""
+        if readonly:
+            uri = pathlib.Path(os.path.abspath(self.db_path)).as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False,
+                                   cached_statements=CACHED_STATEMENTS)
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            # isolation_level=None: tự quản lý transaction bằng BEGIN/COMMIT
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                                   isolation_level=None, cached_statements=CACHED_STATEMENTS)
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    @property
+    def writer(self):
+        """Kết nối ghi dùng chung"""
+        return self._writer
+
+    def reader(self):
+        """Lấy kết nối chỉ đọc của thread hiện tại (mở mới nếu chưa có)"""
+        if self.shared_reader:
+            return self._writer
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        self._prune_dead_readers()
+        if not self._reader_slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("Hết kết nối chỉ đọc trong pool")
+        try:
+            conn = self._connect(readonly=True)
+        except sqlite3.Error:
+            self._reader_slots.release()
+            raise
+
+        with self._readers_lock:
+            self._readers.append((threading.current_thread(), conn))
+        self._local.conn = conn
+        return conn
+
+    def _prune_dead_readers(self):
+        """Đóng kết nối của các thread đã kết thúc"""
+        with self._readers_lock:
+            alive = []
+            for thread, conn in self._readers:
+                if thread.is_alive():
+                    alive.append((thread, conn))
+                else:
+                    self._close_quietly(conn)
+                    self._reader_slots.release()
+            self._readers = alive
+
+    @contextmanager
+    def connection(self, readonly=True):
+        """
+        Mượn một kết nối (checkout/checkin)
+        Kết nối ghi được giữ khóa trong suốt khối with
+        """
+        if readonly and not self.shared_reader:
+            yield self.reader()
+            return
+
+        with self.write_lock:
+            yield self._writer
+
+    @contextmanager
+    def cursor(self, readonly=True):
+        """Mượn một cursor riêng, tự đóng khi ra khỏi khối with"""
+        with self.connection(readonly) as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    def release_reader(self):
+        """Trả lại kết nối chỉ đọc của thread hiện tại"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._readers_lock:
+            self._readers = [(t, c) for t, c in self._readers if c is not conn]
+        self._close_quietly(conn)
+        self._reader_slots.release()
+
+    def get_stats(self):
+        """Thống kê trạng thái pool"""
+        with self._readers_lock:
+            return {
+                'readers_open': len(self._readers),
+                'max_readers': self.max_readers,
+                'shared_reader': self.shared_reader
+            }
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        """Đóng tất cả kết nối"""
+        if self._closed:
+            return
+        self._closed = True
+        with self._readers_lock:
+            for _, conn in self._readers:
+                self._close_quietly(conn)
+            self._readers = []
+        self._writer.close()
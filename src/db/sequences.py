@@ -0,0 +1,108 @@
+import threading
+
+
+class SequenceAllocator:
+    """
+    Cấp phát mã nghiệp vụ có tiền tố (ATT000001, PAY000001, ...)
+    Giá trị kế tiếp được lưu trong bảng Sequences; mỗi thread giữ sẵn một khối
+    mã đã đặt trước nên phần lớn các lần cấp phát không cần truy vấn database
+    """
+
+    # Tiền tố -> (bảng, cột mã) dùng để khởi tạo sequence từ dữ liệu cũ
+    SEQUENCES = {
+        'ATT': ('Attendance', 'attendance_id'),
+        'PAY': ('Payrolls', 'payroll_id'),
+        'FB': ('Feedbacks', 'feedback_id'),
+        'CAN': ('Candidates', 'candidate_id'),
+        'RES': ('AdminResponses', 'response_id'),
+    }
+
+    def __init__(self, db, block_size=20, width=6):
+        """
+        Args:
+            db: Instance Database
+            block_size: Số mã đặt trước mỗi lần truy cập bảng Sequences
+            width: Số chữ số của phần số trong mã
+        """
+        self.db = db
+        self.block_size = block_size
+        self.width = width
+        self._local = threading.local()
+
+    def _blocks(self):
+        """Các khối mã đã đặt trước của thread hiện tại {prefix: [next, end]}"""
+        blocks = getattr(self._local, 'blocks', None)
+        if blocks is None:
+            blocks = {}
+            self._local.blocks = blocks
+        return blocks
+
+    def format_id(self, prefix, value):
+        """Định dạng mã từ tiền tố và số thứ tự"""
+        return f"{prefix}{value:0{self.width}d}"
+
+    def next_id(self, prefix):
+        """Lấy mã kế tiếp cho tiền tố"""
+        blocks = self._blocks()
+        block = blocks.get(prefix)
+        if block is None or block[0] >= block[1]:
+            start = self._reserve(prefix, self.block_size)
+            block = [start, start + self.block_size]
+            blocks[prefix] = block
+
+        value = block[0]
+        block[0] += 1
+        return self.format_id(prefix, value)
+
+    def next_ids(self, prefix, count):
+        """Lấy count mã liên tiếp (dùng cho ghi hàng loạt)"""
+        if count <= 0:
+            return []
+        start = self._reserve(prefix, count)
+        return [self.format_id(prefix, value) for value in range(start, start + count)]
+
+    def _reserve(self, prefix, count):
+        """
+        Đặt trước count giá trị trong bảng Sequences
+        Returns:
+            Giá trị đầu tiên của khối
+        """
+        with self.db.transaction():
+            # UPDATE trước để giữ khóa ghi, tránh hai tiến trình nhận cùng một khối
+            with self.db.query(
+                "UPDATE Sequences SET next_value = next_value + ? WHERE name = ?",
+                (count, prefix)
+            ) as result:
+                updated = result.rowcount
+
+            if updated == 0:
+                start = self._initial_value(prefix)
+                self.db.query(
+                    "INSERT INTO Sequences (name, next_value) VALUES (?, ?)",
+                    (prefix, start + count)
+                ).close()
+                return start
+
+            next_value = self.db.query(
+                "SELECT next_value FROM Sequences WHERE name = ?", (prefix,)
+            ).scalar()
+            return next_value - count
+
+    def _initial_value(self, prefix):
+        """Giá trị khởi đầu: lớn hơn mọi mã đã có trong bảng nghiệp vụ"""
+        if prefix not in self.SEQUENCES:
+            return 1
+
+        table_name, column = self.SEQUENCES[prefix]
+        max_value = self.db.query(
+            f"SELECT MAX(CAST(SUBSTR({column}, ?) AS INTEGER)) FROM {table_name} WHERE {column} LIKE ?",
+            (len(prefix) + 1, f"{prefix}%")
+        ).scalar(0)
+        return max_value + 1
+
+    def discard_blocks(self):
+        """
+        Bỏ các khối mã của thread hiện tại
+        Gọi khi rollback vì việc đặt trước trong transaction cũng bị hoàn tác
+        """
+        self._local.blocks = {}
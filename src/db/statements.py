@@ -0,0 +1,145 @@
+from functools import lru_cache
+
+# Số câu lệnh đã biên dịch mà mỗi kết nối sqlite3 giữ lại (mặc định của sqlite3 là 128)
+CACHED_STATEMENTS = 512
+
+# Số mẫu SQL giữ lại cho mỗi loại câu lệnh
+TEMPLATE_CACHE_SIZE = 1024
+
+
+def _as_tuple(values):
+    """Chuyển danh sách cột sang tuple để dùng làm khóa cache"""
+    if values is None:
+        return None
+    if isinstance(values, str):
+        return (values,)
+    return tuple(values)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _select(table_name, columns, condition, order_by, limit, group_by, joins):
+    query = f"SELECT {columns} FROM {table_name}"
+
+    if joins:
+        query += f" {joins}"
+    if condition:
+        query += f" WHERE {condition}"
+    if group_by:
+        query += f" GROUP BY {group_by}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    if limit:
+        query += f" LIMIT {limit}"
+    return query
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _count(table_name, condition):
+    query = f"SELECT COUNT(*) FROM {table_name}"
+    if condition:
+        query += f" WHERE {condition}"
+    return query
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _exists(table_name, condition):
+    return f"SELECT 1 FROM {table_name} WHERE {condition} LIMIT 1"
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _insert(table_name, columns, conflict_columns, update_columns):
+    placeholders = ', '.join(['?' for _ in columns])
+    query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+
+    if conflict_columns:
+        if update_columns is None:
+            update_columns = [col for col in columns if col not in conflict_columns]
+        query += f" ON CONFLICT({', '.join(conflict_columns)})"
+        if update_columns:
+            set_clause = ', '.join([f"{col} = excluded.{col}" for col in update_columns])
+            query += f" DO UPDATE SET {set_clause}"
+        else:
+            query += " DO NOTHING"
+    return query
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _update(table_name, columns, condition):
+    set_clause = ', '.join([f"{column} = ?" for column in columns])
+    return f"UPDATE {table_name} SET {set_clause} WHERE {condition}"
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _delete(table_name, condition):
+    return f"DELETE FROM {table_name} WHERE {condition}"
+
+
+def build_select(table_name, columns="*", condition=None, order_by=None,
+                 limit=None, group_by=None, joins=None):
+    """Câu lệnh SELECT từ các thành phần"""
+    return _select(table_name, columns, condition, order_by, limit, group_by, joins)
+
+
+def build_count(table_name, condition=None):
+    """Câu lệnh SELECT COUNT(*)"""
+    return _count(table_name, condition)
+
+
+def build_exists(table_name, condition):
+    """Câu lệnh kiểm tra tồn tại (dừng ở hàng đầu tiên)"""
+    return _exists(table_name, condition)
+
+
+def build_insert(table_name, columns, conflict_columns=None, update_columns=None):
+    """
+    Câu lệnh INSERT cho một tập cột
+    Args:
+        conflict_columns: Các cột của ràng buộc UNIQUE dùng cho ON CONFLICT (None: chỉ INSERT)
+        update_columns: Các cột cập nhật khi trùng (mặc định: mọi cột không thuộc
+            conflict_columns; rỗng: DO NOTHING)
+    """
+    return _insert(table_name, _as_tuple(columns), _as_tuple(conflict_columns), _as_tuple(update_columns))
+
+
+def build_update(table_name, columns, condition):
+    """Câu lệnh UPDATE ... SET cột = ? cho một tập cột"""
+    return _update(table_name, _as_tuple(columns), condition)
+
+
+def build_delete(table_name, condition):
+    """Câu lệnh DELETE"""
+    return _delete(table_name, condition)
+
+
+_BUILDERS = {
+    'select': _select,
+    'count': _count,
+    'exists': _exists,
+    'insert': _insert,
+    'update': _update,
+    'delete': _delete,
+}
+
+
+def get_cache_stats():
+    """
+    Thống kê cache mẫu SQL
+    Returns:
+        Dictionary {loại câu lệnh: {'hits', 'misses', 'size'}} và tổng 'total'
+    """
+    stats = {}
+    total = {'hits': 0, 'misses': 0, 'size': 0}
+    for name, builder in _BUILDERS.items():
+        info = builder.cache_info()
+        stats[name] = {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
+        for key in total:
+            total[key] += stats[name][key]
+    stats['total'] = total
+    stats['cached_statements'] = CACHED_STATEMENTS
+    return stats
+
+
+def clear_cache():
+    """Xóa cache mẫu SQL và đặt lại bộ đếm"""
+    for builder in _BUILDERS.values():
+        builder.cache_clear()
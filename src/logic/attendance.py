@@ -1,17 +1,170 @@
 from src.db.database import get_db
+from src.db.audit import diff_values, encode_payload
+from src.db.migrations import ATTENDANCE_TEXT_COLUMNS, ATTENDANCE_VIEW_COLUMNS
+from src.db.normalize import fold
+from src.logic.employee_directory import get_directory
+from src.logic.work_hours import (
+    EPOCH_ORDINAL, MINUTES_PER_DAY, attendance_status, calculate_attendance_minutes, calculate_work_hours,
+    format_date, format_time, parse_date, parse_time, split_hours_columns, widen_minutes, widen_shift
+)
+import csv
 import datetime
+import functools
+import os
 import re
-import json
+
+# Bảng lưu chấm công: ngày là số ngày tính từ 1970-01-01, giờ là số phút tính
+# từ 00:00 (migration 8). View Attendance có cùng dạng TEXT với bảng cũ
+ATTENDANCE_TABLE = 'AttendanceData'
+# Phiên bản schema có AttendanceData và AttendanceMonthly; các migration dựng
+# lại bảng chấm công chạy nền nên phải chờ trước khi dùng
+ATTENDANCE_SCHEMA_VERSION = 8
+# Khóa của bản ghi chấm công (ràng buộc UNIQUE)
+ATTENDANCE_KEY = ('employee_id', 'day')
+# Cách xử lý khi nhân viên đã có bản ghi chấm công trong ngày:
+#   error: báo lỗi
+#   first: giữ bản ghi đã có
+#   last: ghi đè bằng giờ vào/giờ ra mới
+#   widen: mở rộng thành khoảng bao cả hai ca (vào sớm hơn, ra muộn hơn)
+CONFLICT_POLICIES = ('error', 'first', 'last', 'widen')
+# Các cột được ghi lại khi gộp vào bản ghi đã có
+SHIFT_COLUMNS = ('minute_in', 'minute_out', 'work_hours', 'overtime_hours', 'status')
+SHIFT_LOG_COLUMNS = ('time_in', 'time_out', 'work_hours', 'overtime_hours', 'status')
+# Tổng số phút của ca tính trong SQL (ca qua đêm khi giờ ra <= giờ vào)
+_SHIFT_MINUTES = f"(minute_out - minute_in + {MINUTES_PER_DAY - 1}) % {MINUTES_PER_DAY} + 1"
+
+# Nhập dữ liệu máy chấm công: (mã nhân viên, thời điểm, chiều vào/ra)
+PUNCH_COLUMNS = ('employee_id', 'timestamp', 'direction')
+_PUNCH_HEADER_ALIASES = {
+    'employee_id': ('employee_id', 'emp_id', 'id', 'ma nv', 'ma nhan vien'),
+    'timestamp': ('timestamp', 'datetime', 'time', 'punch_time', 'thoi gian', 'thoi diem'),
+    'direction': ('direction', 'type', 'in/out', 'state', 'loai', 'vao/ra'),
+}
+_PUNCH_HEADERS = {alias: column for column, aliases in _PUNCH_HEADER_ALIASES.items() for alias in aliases}
+# Máy chấm công thường xuất 0/1 (check-in/check-out)
+_PUNCH_DIRECTIONS = {
+    'in': True, 'i': True, 'check in': True, 'checkin': True, 'vao': True, '0': True,
+    'out': False, 'o': False, 'check out': False, 'checkout': False, 'ra': False, '1': False,
+}
+_PUNCH_DATE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+_PUNCH_DATE_DMY = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})$')
+_PUNCH_TIME = re.compile(r'^(\d{1,2}):(\d{2})(?::\d{2}(?:\.\d+)?)?$')
+# Hai lần quẹt cùng chiều cách nhau không quá số phút này được tính là một
+DUPLICATE_PUNCH_MINUTES = 2
+# Cặp vào/ra dài hơn số phút này không được ghép thành ca
+MAX_SHIFT_MINUTES = 24 * 60
+
+_INSERT_SHIFT = (
+    f"INSERT INTO {ATTENDANCE_TABLE} (attendance_id, employee_id, day, minute_in, minute_out, work_hours, "
+    "overtime_hours, status, created_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+# Cột của các hàng ghi bằng _INSERT_SHIFT
+_PUNCH_ROW_COLUMNS = ('attendance_id', 'employee_id', 'day', 'minute_in', 'minute_out', 'work_hours',
+                      'overtime_hours', 'status', 'created_date')
+_UPSERT_SHIFT = {
+    'error': _INSERT_SHIFT,
+    'first': f"{_INSERT_SHIFT} ON CONFLICT({', '.join(ATTENDANCE_KEY)}) DO NOTHING",
+    'last': f"{_INSERT_SHIFT} ON CONFLICT({', '.join(ATTENDANCE_KEY)}) DO UPDATE SET "
+            + ', '.join(f"{column} = excluded.{column}" for column in SHIFT_COLUMNS),
+}
+_UPSERT_SHIFT['widen'] = _UPSERT_SHIFT['last']
+
+
+def _text_columns(*columns):
+    """Cột SELECT trên AttendanceData; ngày/giờ được đổi về dạng TEXT như view Attendance"""
+    return ', '.join(
+        f"{ATTENDANCE_TEXT_COLUMNS[column]} AS {column}" if column in ATTENDANCE_TEXT_COLUMNS else column
+        for column in columns
+    )
+
+
+# Các cột trả về của các hàm lấy danh sách chấm công
+_RECORD_COLUMNS = _text_columns(
+    'attendance_id', 'employee_id', 'date', 'time_in', 'time_out', 'work_hours', 'overtime_hours', 'status', 'notes'
+)
+_ALL_COLUMNS = _text_columns(*ATTENDANCE_VIEW_COLUMNS)
+
+
+# Bản ghi đã có trong khoảng ngày của một lô nhập: khóa, số phút và các cột dạng TEXT để ghi log
+_EXISTING_COLUMNS = ('day', 'minute_in', 'minute_out') + ATTENDANCE_VIEW_COLUMNS
+# Cột của log bản ghi chấm công (cùng dạng với add_attendance)
+_LOG_COLUMNS = ('attendance_id', 'employee_id', 'date', 'time_in', 'time_out',
+                'work_hours', 'overtime_hours', 'status', 'notes', 'created_date')
+
+
+def _import_log(user_id, action, record, old=None):
+    """
+    Log của một bản ghi chấm công được nhập (cột dạng TEXT như view Attendance)
+    để dựng lại được lịch sử từng bản ghi; bản ghi bị ghi đè chỉ lưu các trường thay đổi
+    Args:
+        record: Dictionary cột của AttendanceData đã ghi (day, minute_in, minute_out...)
+        old: Dictionary bản ghi cũ theo _EXISTING_COLUMNS (None khi thêm mới)
+    """
+    text = {
+        'date': format_date(record['day']),
+        'time_in': format_time(record['minute_in']),
+        'time_out': format_time(record['minute_out'])
+    }
+    values = {column: text.get(column, record.get(column)) for column in _LOG_COLUMNS}
+    if old is not None:
+        values = {column: value for column, value in values.items() if column in SHIFT_LOG_COLUMNS}
+        old = {column: old[column] for column in _LOG_COLUMNS}
+    old_values, new_values = diff_values(old, values)
+    return {
+        'user_id': user_id,
+        'action': action,
+        'table_name': 'Attendance',
+        'record_id': record['attendance_id'],
+        'old_values': encode_payload(old_values),
+        'new_values': encode_payload(new_values)
+    }
+
+
+def _stored_row(record):
+    """Dữ liệu chấm công dạng TEXT (date, time_in, time_out) thành cột của AttendanceData"""
+    row = {column: value for column, value in record.items() if column not in ATTENDANCE_TEXT_COLUMNS}
+    row['day'] = parse_date(record['date'])
+    row['minute_in'] = parse_time(record['time_in'])
+    row['minute_out'] = parse_time(record['time_out'])
+    return row
+
+
+def _requires_schema(method):
+    """Phương thức đọc/ghi chấm công: kiểm tra bảng chấm công đã sẵn sàng trước khi chạy"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._ensure_tables()
+        return method(self, *args, **kwargs)
+    return wrapper
 
 
 class AttendanceManager:
     def __init__(self):
         self.db = get_db()
-        self._ensure_tables()
+        self._schema_ready = False
+
+    def schema_ready(self):
+        """Migration nền đã dựng xong bảng chấm công chưa (không chờ)"""
+        if not self._schema_ready:
+            self._schema_ready = self.db.migrations.current_version() >= ATTENDANCE_SCHEMA_VERSION
+        return self._schema_ready
+
+    def schema_upgrading(self):
+        """Bảng chấm công đang được migration nền dựng lại"""
+        return not self.schema_ready() and self.db.migrations.is_running()
 
     def _ensure_tables(self):
-        """Đảm bảo các bảng cần thiết tồn tại - đã được xử lý trong database.py"""
-        pass
+        """
+        Đảm bảo các bảng cần thiết tồn tại; không chờ migration nền đang dựng lại
+        bảng chấm công (tránh treo giao diện) mà báo lỗi để thử lại sau
+        Raises:
+            RuntimeError nếu bảng chấm công chưa sẵn sàng
+        """
+        if self.schema_ready():
+            return
+        if self.schema_upgrading():
+            raise RuntimeError("Dữ liệu chấm công đang được nâng cấp, vui lòng thử lại sau")
+        self.db.migrations.require(ATTENDANCE_SCHEMA_VERSION, timeout=0)
 
     def validate_attendance_data(self, employee_id, date, time_in, time_out):
         """Validate dữ liệu chấm công"""
@@ -60,55 +213,70 @@ class AttendanceManager:
 
     def calculate_work_hours(self, time_in, time_out):
         """Tính toán giờ làm việc và giờ làm thêm"""
-        try:
-            time_in_obj = datetime.datetime.strptime(time_in, "%H:%M")
-            time_out_obj = datetime.datetime.strptime(time_out, "%H:%M")
-
-            # Handle overnight shifts
-            if time_out_obj <= time_in_obj:
-                time_out_obj = time_out_obj.replace(day=time_out_obj.day + 1)
-
-            duration = time_out_obj - time_in_obj
-            total_hours = duration.total_seconds() / 3600
-
-            # Standard work hours (8 hours)
-            standard_hours = 8
-            work_hours = min(total_hours, standard_hours)
-            overtime_hours = max(0, total_hours - standard_hours)
-
-            return round(work_hours, 2), round(overtime_hours, 2)
-        except Exception:
-            return 0, 0
+        return calculate_work_hours(time_in, time_out)
 
+    @_requires_schema
     def attendance_exists(self, employee_id, date):
         """Kiểm tra đã chấm công cho ngày này chưa"""
         try:
-            count = self.db.get_table_count(
-                'Attendance',
-                'employee_id = ? AND date = ?',
-                [employee_id, date]
+            return self.db.record_exists(
+                ATTENDANCE_TABLE,
+                'employee_id = ? AND day = ?',
+                [employee_id, self._to_day(date)]
             )
-            return count > 0
         except Exception:
             return False
 
-    def add_attendance(self, employee_id, date, time_in, time_out, notes=None):
-        """Thêm bản ghi chấm công"""
+    @staticmethod
+    def _to_day(date):
+        """Ngày "YYYY-MM-DD" thành số ngày lưu trong AttendanceData"""
+        day = parse_date(date)
+        if day is None:
+            raise ValueError(f"Định dạng ngày không đúng (YYYY-MM-DD): {date}")
+        return day
+
+    @staticmethod
+    def _check_conflict_policy(on_conflict):
+        if on_conflict not in CONFLICT_POLICIES:
+            raise ValueError(
+                f"Cách xử lý trùng lặp không hợp lệ: {on_conflict} (chọn {', '.join(CONFLICT_POLICIES)})"
+            )
+
+    @_requires_schema
+    def add_attendance(self, employee_id, date, time_in, time_out, notes=None, on_conflict='error'):
+        """
+        Thêm bản ghi chấm công
+        Ràng buộc UNIQUE(employee_id, date) quyết định trùng lặp (không đếm trước)
+        Args:
+            on_conflict: Cách xử lý khi nhân viên đã có bản ghi ngày này
+                         (xem CONFLICT_POLICIES; mặc định báo lỗi)
+        Returns:
+            attendance_id của bản ghi được thêm/cập nhật (hoặc được giữ với 'first')
+        """
+        self._check_conflict_policy(on_conflict)
+
         # Validate dữ liệu
         errors = self.validate_attendance_data(employee_id, date, time_in, time_out)
         if errors:
             raise ValueError("; ".join(errors))
 
-        # Kiểm tra trùng lặp
-        if self.attendance_exists(employee_id, date):
-            raise ValueError(f"Đã có bản ghi chấm công cho nhân viên {employee_id} ngày {date}")
-
+        employee_id = employee_id.strip()
+        day = parse_date(date)
+        date = format_date(day)
         try:
             self.db.begin_transaction()
 
+            # Gộp vào bản ghi đã có: đọc bản ghi cũ (để mở rộng ca và ghi log)
+            existing = None
+            if on_conflict in ('last', 'widen'):
+                existing = self.db.get_record(
+                    ATTENDANCE_TABLE, 'employee_id = ? AND day = ?', [employee_id, day], columns=_ALL_COLUMNS
+                )
+                if existing and on_conflict == 'widen':
+                    time_in, time_out = widen_shift(existing['time_in'], existing['time_out'], time_in, time_out)
+
             # Tạo attendance_id
-            count = self.db.get_table_count('Attendance')
-            attendance_id = f"ATT{count + 1:06d}"
+            attendance_id = existing['attendance_id'] if existing else self.db.next_id('ATT')
 
             # Tính toán giờ làm việc
             work_hours, overtime_hours = self.calculate_work_hours(time_in, time_out)
@@ -118,10 +286,9 @@ class AttendanceManager:
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            # Sử dụng phương thức insert_record mới
             attendance_data = {
                 'attendance_id': attendance_id,
-                'employee_id': employee_id.strip(),
+                'employee_id': employee_id,
                 'date': date,
                 'time_in': time_in,
                 'time_out': time_out,
@@ -132,40 +299,612 @@ class AttendanceManager:
                 'created_date': current_time
             }
 
-            self.db.insert_record('Attendance', attendance_data)
+            # INSERT ... ON CONFLICT(employee_id, date): 'error'/'first' không ghi đè
+            update_columns = ()
+            if on_conflict in ('last', 'widen'):
+                update_columns = SHIFT_COLUMNS + (('notes',) if notes is not None else ())
+            written = self.db.upsert_record(
+                ATTENDANCE_TABLE, _stored_row(attendance_data), ATTENDANCE_KEY, update_columns
+            )
+            if written is None:
+                raise Exception("Lỗi ghi dữ liệu")
+
+            if not written:
+                if on_conflict == 'error':
+                    raise ValueError(f"Đã có bản ghi chấm công cho nhân viên {employee_id} ngày {date}")
+                # 'first': giữ nguyên bản ghi đã có
+                kept = self.db.get_record(
+                    ATTENDANCE_TABLE, 'employee_id = ? AND day = ?', [employee_id, day], columns="attendance_id"
+                )
+                self.db.rollback()
+                return kept['attendance_id'] if kept else None
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
-                action='ADD_ATTENDANCE',
+                action='UPDATE_ATTENDANCE' if existing else 'ADD_ATTENDANCE',
                 table_name='Attendance',
                 record_id=attendance_id,
-                new_values=json.dumps(attendance_data, default=str)
+                old_values=existing,
+                new_values=attendance_data
             )
 
             self.db.commit()
             return attendance_id
+        except ValueError:
+            self.db.rollback()
+            raise
         except Exception as e:
             self.db.rollback()
             raise Exception(f"Không thể thêm bản ghi chấm công: {str(e)}")
 
-    def determine_attendance_status(self, time_in, work_hours):
-        """Xác định trạng thái chấm công"""
+    @_requires_schema
+    def add_attendance_bulk(self, records, on_conflict='error'):
+        """
+        Thêm nhiều bản ghi chấm công trong một transaction (import hàng tháng)
+        Bản ghi trùng (nhân viên, ngày) - trong lô hoặc với database - được xử lý
+        theo on_conflict; ghi bằng INSERT ... ON CONFLICT(employee_id, day)
+        Args:
+            records: Danh sách dictionary {'employee_id', 'date', 'time_in', 'time_out', 'notes'}
+            on_conflict: Cách xử lý trùng lặp (xem CONFLICT_POLICIES). Khi gộp vào
+                         bản ghi đã có, ghi chú của bản ghi đó được giữ nguyên
+        Returns:
+            Dictionary {'added': [attendance_id], 'updated': [attendance_id],
+                        'skipped': [index], 'failed': [{'index', 'row', 'error'}]}
+        """
+        self._check_conflict_policy(on_conflict)
+
+        failed = []
+        skipped = []
+        # Gộp theo (nhân viên, số ngày): {khóa: {'indexes', 'minute_in', 'minute_out', 'notes'}}
+        merged = {}
+        for index, record in enumerate(records):
+            errors = self.validate_attendance_data(
+                record.get('employee_id'), record.get('date'),
+                record.get('time_in'), record.get('time_out')
+            )
+            if errors:
+                failed.append({'index': index, 'row': record, 'error': "; ".join(errors)})
+                continue
+
+            key = (record['employee_id'].strip(), parse_date(record['date']))
+            minute_in, minute_out = parse_time(record['time_in']), parse_time(record['time_out'])
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = {
+                    'indexes': [index], 'minute_in': minute_in,
+                    'minute_out': minute_out, 'notes': record.get('notes')
+                }
+            elif on_conflict == 'error':
+                failed.append({
+                    'index': index, 'row': record,
+                    'error': f"Đã có bản ghi chấm công cho nhân viên {key[0]} ngày {format_date(key[1])}"
+                })
+            elif on_conflict == 'first':
+                skipped.append(index)
+            else:
+                if on_conflict == 'last':
+                    entry['minute_in'], entry['minute_out'] = minute_in, minute_out
+                else:
+                    entry['minute_in'], entry['minute_out'] = widen_minutes(
+                        entry['minute_in'], entry['minute_out'], minute_in, minute_out
+                    )
+                if record.get('notes') is not None:
+                    entry['notes'] = record['notes']
+                entry['indexes'].append(index)
+
+        if not merged:
+            return {'added': [], 'updated': [], 'skipped': sorted(skipped),
+                    'failed': sorted(failed, key=lambda item: item['index'])}
+
         try:
-            time_in_obj = datetime.datetime.strptime(time_in, "%H:%M")
-            standard_start = datetime.datetime.strptime("08:00", "%H:%M")
-
-            if time_in_obj > standard_start:
-                return "Late"  # Đi muộn
-            elif work_hours < 4:
-                return "Half Day"  # Nửa ngày
-            elif work_hours < 8:
-                return "Early Leave"  # Về sớm
+            self.db.begin_transaction()
+
+            # Nạp sẵn các bản ghi đã có trong khoảng ngày của lô
+            days = [key[1] for key in merged]
+            existing = self._existing_records(min(days), max(days))
+
+            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            rows = []
+            entries = []
+            for key, entry in merged.items():
+                old = existing.get(key)
+                if old is not None:
+                    if on_conflict == 'error':
+                        failed.extend(
+                            {'index': index, 'row': records[index],
+                             'error': f"Đã có bản ghi chấm công cho nhân viên {key[0]} ngày {format_date(key[1])}"}
+                            for index in entry['indexes']
+                        )
+                        continue
+                    if on_conflict == 'first':
+                        skipped.extend(entry['indexes'])
+                        continue
+                    if on_conflict == 'widen':
+                        entry['minute_in'], entry['minute_out'] = widen_minutes(
+                            old['minute_in'], old['minute_out'], entry['minute_in'], entry['minute_out']
+                        )
+
+                rows.append({
+                    'attendance_id': old['attendance_id'] if old is not None else None,
+                    'employee_id': key[0],
+                    'day': key[1],
+                    'minute_in': entry['minute_in'],
+                    'minute_out': entry['minute_out'],
+                    'notes': entry['notes'],
+                    'created_date': current_time
+                })
+                entries.append(entry)
+
+            # Tính giờ làm cho cả lô một lần
+            work, overtime, statuses = calculate_attendance_minutes(
+                [row['minute_in'] for row in rows], [row['minute_out'] for row in rows]
+            )
+            for row, work_hours, overtime_hours, status in zip(rows, work, overtime, statuses):
+                row['work_hours'] = float(work_hours)
+                row['overtime_hours'] = float(overtime_hours)
+                row['status'] = status
+
+            new_rows = [row for row in rows if row['attendance_id'] is None]
+            for row, attendance_id in zip(new_rows, self.db.sequences.next_ids('ATT', len(new_rows))):
+                row['attendance_id'] = attendance_id
+
+            if on_conflict == 'error':
+                # INSERT thường: bản ghi trùng do luồng khác vừa ghi bị báo lỗi UNIQUE
+                result = self.db.bulk_insert(ATTENDANCE_TABLE, rows)
             else:
-                return "Present"  # Đúng giờ
-        except Exception:
+                result = self.db.bulk_upsert(
+                    ATTENDANCE_TABLE, rows, conflict_columns=ATTENDANCE_KEY,
+                    update_columns=SHIFT_COLUMNS if on_conflict != 'first' else ()
+                )
+            failed_rows = {item['index'] for item in result['failed']}
+            for item in result['failed']:
+                for index in entries[item['index']]['indexes']:
+                    failed.append({'index': index, 'row': records[index], 'error': item['error']})
+
+            added = []
+            updated = []
+            logs = []
+            for i, row in enumerate(rows):
+                if i not in failed_rows:
+                    old = existing.get((row['employee_id'], row['day']))
+                    (updated if old is not None else added).append(row['attendance_id'])
+                    logs.append(_import_log('system', 'IMPORT_ATTENDANCE', row, old))
+
+            # Log từng bản ghi được thêm/ghi đè
+            self.db.log_actions(logs)
+
+            self.db.commit()
+            return {
+                'added': added,
+                'updated': updated,
+                'skipped': sorted(skipped),
+                'failed': sorted(failed, key=lambda item: item['index'])
+            }
+        except Exception as e:
+            self.db.rollback()
+            raise Exception(f"Không thể import chấm công: {str(e)}")
+
+    @_requires_schema
+    def recalculate_work_hours(self, start_date=None, end_date=None, batch_size=50000, user_id='system'):
+        """
+        Tính lại giờ làm, giờ làm thêm và trạng thái từ giờ vào/giờ ra đã lưu
+        (vd: sau khi đổi giờ làm chuẩn). Độ dài ca được tính trong SQL từ số phút
+        đã lưu; mỗi lô batch_size bản ghi được tính theo cột, chỉ bản ghi có giá
+        trị thay đổi được ghi lại, mỗi lô một transaction
+        Returns:
+            Dictionary {'checked': số bản ghi đã tính, 'updated': số bản ghi thay đổi}
+        """
+        conditions = ["id > ?"]
+        params = []
+        if start_date:
+            conditions.append("day >= ?")
+            params.append(self._to_day(start_date))
+        if end_date:
+            conditions.append("day <= ?")
+            params.append(self._to_day(end_date))
+
+        checked = 0
+        updated = 0
+        last_id = 0
+        try:
+            while True:
+                rows = self.db.select_records(
+                    ATTENDANCE_TABLE,
+                    columns=f"id, minute_in, {_SHIFT_MINUTES}, work_hours, overtime_hours, status",
+                    condition=" AND ".join(conditions),
+                    params=[last_id] + params,
+                    order_by="id",
+                    limit=batch_size
+                )
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                work, overtime, statuses = split_hours_columns(
+                    [row[2] for row in rows], [row[1] for row in rows]
+                )
+                changes = [
+                    (float(work_hours), float(overtime_hours), status, row[0])
+                    for row, work_hours, overtime_hours, status in zip(rows, work, overtime, statuses)
+                    if (row[3], row[4], row[5]) != (work_hours, overtime_hours, status)
+                ]
+                if changes:
+                    with self.db.transaction():
+                        if not self.db.execute_many(
+                            f"UPDATE {ATTENDANCE_TABLE} SET work_hours = ?, overtime_hours = ?, status = ? WHERE id = ?",
+                            changes
+                        ):
+                            raise Exception("Không thể ghi giờ làm đã tính lại")
+
+                checked += len(rows)
+                updated += len(changes)
+
+            if updated:
+                self.db.log_change(
+                    user_id=user_id,
+                    action='RECALCULATE_ATTENDANCE',
+                    table_name='Attendance',
+                    new_values={'start_date': start_date, 'end_date': end_date,
+                                'checked': checked, 'updated': updated}
+                )
+            return {'checked': checked, 'updated': updated}
+        except Exception as e:
+            raise Exception(f"Không thể tính lại giờ làm: {str(e)}")
+
+    @staticmethod
+    def _parse_punch_part(text):
+        """
+        Đổi phần ngày ("YYYY-MM-DD", "DD/MM/YYYY") thành số thứ tự ngày, phần giờ
+        ("HH:MM[:SS]") thành số phút tính từ 00:00
+        Returns:
+            Số tương ứng, -1 nếu sai định dạng
+        """
+        match = _PUNCH_TIME.match(text)
+        if match:
+            hour, minute = int(match.group(1)), int(match.group(2))
+            return hour * 60 + minute if hour <= 23 and minute <= 59 else -1
+
+        match = _PUNCH_DATE.match(text)
+        if match:
+            year, month, day = match.groups()
+        else:
+            match = _PUNCH_DATE_DMY.match(text)
+            if not match:
+                return -1
+            day, month, year = match.groups()
+        try:
+            return datetime.date(int(year), int(month), int(day)).toordinal()
+        except ValueError:
+            return -1
+
+    def _parse_punch_time(self, value, cache):
+        """
+        Đổi thời điểm quẹt thẻ thành số phút tuyệt đối (ngày * 1440 + phút trong ngày)
+        Nhận "YYYY-MM-DD HH:MM[:SS]", "YYYY-MM-DDTHH:MM[:SS]" và "DD/MM/YYYY HH:MM[:SS]"
+        Args:
+            cache: Dictionary {phần ngày/giờ: giá trị} dùng chung cho cả file
+                   (file chấm công chỉ có ít ngày và giờ khác nhau)
+        Returns:
+            Số phút, None nếu sai định dạng
+        """
+        date_text, _, time_text = value.replace('T', ' ', 1).partition(' ')
+        day = cache.get(date_text)
+        if day is None:
+            day = cache[date_text] = self._parse_punch_part(date_text)
+        minute = cache.get(time_text)
+        if minute is None:
+            minute = cache[time_text] = self._parse_punch_part(time_text.strip())
+        if day < 0 or minute < 0:
+            return None
+        return day * MINUTES_PER_DAY + minute
+
+    @staticmethod
+    def _pair_punches(punches, reject):
+        """
+        Ghép các lần quẹt thẻ thành ca làm việc
+        Mỗi lần vào được ghép với lần ra kế tiếp của cùng nhân viên; ca tính cho
+        ngày của giờ vào (ca qua đêm thuộc ngày bắt đầu). Nhiều ca trong cùng
+        một ngày được gộp: giờ vào sớm nhất, giờ ra muộn nhất, tổng giờ là tổng
+        các ca (không tính thời gian nghỉ giữa ca)
+        Args:
+            punches: Danh sách (mã nhân viên, phút, vào?, số dòng, hàng gốc)
+                     đã sắp xếp theo (mã nhân viên, phút)
+            reject: Hàm reject(số dòng, hàng gốc, lỗi)
+        Returns:
+            (ca, số lần quẹt trùng) với ca là dictionary
+            {(mã nhân viên, ngày): [phút vào, phút ra, tổng phút, [(số dòng, hàng gốc)]]}
+        """
+        shifts = {}
+        duplicates = 0
+        current = None
+        opened = None  # Lần vào chưa có lần ra: (phút, số dòng, hàng gốc)
+        last = None    # Lần quẹt hợp lệ gần nhất: (vào?, phút)
+
+        for employee_id, minute, is_in, line_no, raw in punches:
+            if employee_id != current:
+                if opened is not None:
+                    reject(opened[1], opened[2], "Thiếu giờ ra")
+                current = employee_id
+                opened = None
+                last = None
+
+            if last is not None and last[0] == is_in and minute - last[1] <= DUPLICATE_PUNCH_MINUTES:
+                duplicates += 1
+                continue
+            last = (is_in, minute)
+
+            if is_in:
+                if opened is not None:
+                    reject(opened[1], opened[2], "Thiếu giờ ra")
+                opened = (minute, line_no, raw)
+                continue
+
+            if opened is None:
+                reject(line_no, raw, "Thiếu giờ vào")
+                continue
+
+            start, in_line_no, in_raw = opened
+            opened = None
+            if minute - start > MAX_SHIFT_MINUTES:
+                reject(in_line_no, in_raw, "Thiếu giờ ra")
+                reject(line_no, raw, "Thiếu giờ vào (ca vượt quá 24 giờ)")
+                continue
+
+            key = (employee_id, start // MINUTES_PER_DAY)
+            shift = shifts.get(key)
+            if shift is None:
+                shifts[key] = [start, minute, minute - start, [(in_line_no, in_raw), (line_no, raw)]]
+            else:
+                shift[1] = max(shift[1], minute)
+                shift[2] += minute - start
+                shift[3].append((in_line_no, in_raw))
+                shift[3].append((line_no, raw))
+
+        if opened is not None:
+            reject(opened[1], opened[2], "Thiếu giờ ra")
+        return shifts, duplicates
+
+    def _existing_records(self, from_day, to_day):
+        """Bản ghi đã có trong khoảng ngày: {(mã nhân viên, số ngày): dictionary theo _EXISTING_COLUMNS}"""
+        records = (
+            dict(zip(_EXISTING_COLUMNS, row))
+            for row in self.db.select_records(
+                ATTENDANCE_TABLE,
+                columns=_text_columns(*_EXISTING_COLUMNS),
+                condition="day BETWEEN ? AND ?",
+                params=[from_day, to_day]
+            )
+        )
+        return {(record['employee_id'], record['day']): record for record in records}
+
+    def _import_shifts_chunk(self, chunk, user_id, reject, on_conflict='last'):
+        """
+        Ghi một lô ca làm việc trong một transaction bằng một executemany
+        INSERT ... ON CONFLICT(employee_id, day) (không tạo dictionary cho từng
+        hàng); ngày đã có bản ghi chấm công được xử lý theo on_conflict. Lô lỗi
+        được rollback và mọi dòng của lô được ghi vào rejects
+        Args:
+            chunk: Danh sách ((mã nhân viên, ngày), ca) - xem _pair_punches
+            reject: Hàm reject(số dòng, hàng gốc, lỗi)
+            on_conflict: Cách xử lý trùng lặp (xem CONFLICT_POLICIES)
+        Returns:
+            (số bản ghi thêm mới, số bản ghi cập nhật, số ca bỏ qua)
+        """
+        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        work, overtime, statuses = split_hours_columns(
+            [shift[2] for _, shift in chunk], [shift[0] % MINUTES_PER_DAY for _, shift in chunk]
+        )
+        # [mã nhân viên, số ngày, phút vào, phút ra, giờ làm, giờ làm thêm, trạng thái]
+        shifts = [
+            [
+                employee_id, day - EPOCH_ORDINAL, start % MINUTES_PER_DAY, end % MINUTES_PER_DAY,
+                float(work_hours), float(overtime_hours), status
+            ]
+            for ((employee_id, day), (start, end, _, _)), work_hours, overtime_hours, status
+            in zip(chunk, work, overtime, statuses)
+        ]
+        from_day = min(shift[1] for shift in shifts)
+        to_day = max(shift[1] for shift in shifts)
+
+        try:
+            with self.db.transaction():
+                # Bản ghi đã có trong khoảng ngày của lô (lô sắp xếp theo ngày nên khoảng hẹp)
+                existing = self._existing_records(from_day, to_day)
+
+                targets = []  # (bản ghi đã có hoặc None, ca)
+                widened = []
+                skipped = 0
+                for (_, (_, _, _, lines)), shift in zip(chunk, shifts):
+                    old = existing.get((shift[0], shift[1]))
+                    if old is None:
+                        targets.append((None, shift))
+                    elif on_conflict == 'error':
+                        for line_no, raw in lines:
+                            reject(line_no, raw,
+                                   f"Đã có bản ghi chấm công cho nhân viên {shift[0]} ngày {format_date(shift[1])}")
+                    elif on_conflict == 'first':
+                        skipped += 1
+                    else:
+                        if on_conflict == 'widen':
+                            shift[2], shift[3] = widen_minutes(
+                                old['minute_in'], old['minute_out'], shift[2], shift[3]
+                            )
+                            widened.append(shift)
+                        targets.append((old, shift))
+
+                # Ca mở rộng: tính lại giờ làm từ khoảng mới
+                if widened:
+                    work, overtime, statuses = calculate_attendance_minutes(
+                        [shift[2] for shift in widened], [shift[3] for shift in widened]
+                    )
+                    for shift, work_hours, overtime_hours, status in zip(widened, work, overtime, statuses):
+                        shift[4:7] = float(work_hours), float(overtime_hours), status
+
+                inserted = sum(1 for old, _ in targets if old is None)
+                new_ids = iter(self.db.sequences.next_ids('ATT', inserted))
+                rows = [
+                    (old['attendance_id'] if old is not None else next(new_ids), *shift, current_time)
+                    for old, shift in targets
+                ]
+                if rows and not self.db.execute_many(_UPSERT_SHIFT[on_conflict], rows):
+                    raise Exception("Không thể ghi bản ghi chấm công")
+
+                # Log từng bản ghi được thêm/ghi đè
+                self.db.log_actions([
+                    _import_log(user_id, 'IMPORT_PUNCHES', dict(zip(_PUNCH_ROW_COLUMNS, row)), old)
+                    for (old, _), row in zip(targets, rows)
+                ])
+        except Exception as e:
+            for _, shift in chunk:
+                for line_no, raw in shift[3]:
+                    reject(line_no, raw, f"Lỗi ghi dữ liệu: {str(e)}")
+            return 0, 0, 0
+
+        return inserted, len(targets) - inserted, skipped
+
+    @_requires_schema
+    def import_punches_csv(self, file_path, rejects_path=None, chunk_size=5000,
+                           encoding='utf-8-sig', user_id='system', on_conflict='last'):
+        """
+        Nhập dữ liệu thô từ máy chấm công (mỗi dòng một lần quẹt thẻ vào/ra)
+        Các lần quẹt được ghép thành ca và tính giờ làm theo lô (xem _pair_punches),
+        mỗi lô chunk_size ca được ghi trong một transaction theo khóa
+        (mã nhân viên, ngày). Dòng lỗi (sai dữ liệu, nhân viên không tồn tại, lần
+        quẹt không ghép được, lỗi ghi) được ghi vào file rejects
+        Args:
+            file_path: File CSV có dòng tiêu đề (vd: employee_id,timestamp,direction
+                       hoặc Mã NV, Thời gian, Vào/Ra); chiều là IN/OUT, Vào/Ra hoặc 0/1
+            rejects_path: File ghi dòng lỗi (mặc định: <tên file>_rejects.csv)
+            chunk_size: Số ca mỗi transaction
+            encoding: Mã hóa file
+            user_id: Người thực hiện (ghi log)
+            on_conflict: Cách xử lý ngày đã có bản ghi chấm công (xem CONFLICT_POLICIES;
+                         mặc định ghi đè bằng dữ liệu máy chấm công)
+        Returns:
+            Dictionary {'inserted': số bản ghi thêm mới, 'updated': số bản ghi cập nhật,
+                        'skipped': số ca bỏ qua (on_conflict='first'),
+                        'duplicates': số lần quẹt trùng bị bỏ qua, 'rejected': số dòng lỗi,
+                        'rejects_path': file rejects hoặc None nếu không có dòng lỗi}
+        """
+        self._check_conflict_policy(on_conflict)
+        if rejects_path is None:
+            rejects_path = f"{os.path.splitext(file_path)[0]}_rejects.csv"
+
+        inserted = 0
+        updated = 0
+        skipped = 0
+        duplicates = 0
+        rejected = 0
+        rejects_file = None
+        rejects_writer = None
+
+        with open(file_path, newline='', encoding=encoding) as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+
+            reader = csv.reader(f, dialect)
+            header = next(reader, None)
+            if not header:
+                raise ValueError("File không có dòng tiêu đề")
+
+            # Vị trí của từng cột trong file
+            positions = {}
+            for index, title in enumerate(header):
+                column = _PUNCH_HEADERS.get(fold(title))
+                if column and column not in positions:
+                    positions[column] = index
+            missing = [column for column in PUNCH_COLUMNS if column not in positions]
+            if missing:
+                raise ValueError(f"File thiếu cột: {', '.join(missing)}")
+            id_pos, time_pos, direction_pos = (positions[column] for column in PUNCH_COLUMNS)
+            width = max(id_pos, time_pos, direction_pos) + 1
+
+            def reject(line_no, raw, error):
+                nonlocal rejected, rejects_file, rejects_writer
+                if rejects_writer is None:
+                    rejects_file = open(rejects_path, 'w', newline='', encoding='utf-8-sig')
+                    rejects_writer = csv.writer(rejects_file)
+                    rejects_writer.writerow(['Dòng', 'Lỗi'] + header)
+                rejects_writer.writerow([line_no, error] + raw)
+                rejected += 1
+
+            employee_ids = get_directory(self.db).ids()
+            today = datetime.date.today().toordinal()
+            cache = {}
+            directions = {}
+            punches = []
+
+            try:
+                for line_no, raw in enumerate(reader, start=2):
+                    if len(raw) < width:
+                        if any(cell.strip() for cell in raw):
+                            reject(line_no, raw, "Thiếu cột dữ liệu")
+                        continue
+
+                    employee_id = raw[id_pos].strip()
+                    if employee_id not in employee_ids:
+                        reject(line_no, raw, f"Nhân viên {employee_id} không tồn tại")
+                        continue
+                    minute = self._parse_punch_time(raw[time_pos].strip(), cache)
+                    if minute is None:
+                        reject(line_no, raw, "Định dạng thời gian không đúng (YYYY-MM-DD HH:MM)")
+                        continue
+                    if minute // MINUTES_PER_DAY > today:
+                        reject(line_no, raw, "Không thể chấm công cho ngày trong tương lai")
+                        continue
+                    direction = raw[direction_pos]
+                    is_in = directions.get(direction)
+                    if is_in is None:
+                        is_in = directions[direction] = _PUNCH_DIRECTIONS.get(fold(direction))
+                    if is_in is None:
+                        reject(line_no, raw, "Chiều chấm công không đúng (IN/OUT)")
+                        continue
+
+                    punches.append((employee_id, minute, is_in, line_no, raw))
+
+                # Lần ra cùng phút với lần vào được xếp trước (đóng ca cũ rồi mới mở ca mới)
+                punches.sort()
+                shifts, duplicates = self._pair_punches(punches, reject)
+                del punches
+
+                # Ghi theo ngày để mỗi lô chỉ đọc bản ghi đã có của vài ngày
+                ordered = sorted(shifts.items(), key=lambda item: (item[0][1], item[0][0]))
+                del shifts
+                for start in range(0, len(ordered), chunk_size):
+                    chunk_inserted, chunk_updated, chunk_skipped = self._import_shifts_chunk(
+                        ordered[start:start + chunk_size], user_id, reject, on_conflict
+                    )
+                    inserted += chunk_inserted
+                    updated += chunk_updated
+                    skipped += chunk_skipped
+            finally:
+                if rejects_file is not None:
+                    rejects_file.close()
+
+        return {
+            'inserted': inserted,
+            'updated': updated,
+            'skipped': skipped,
+            'duplicates': duplicates,
+            'rejected': rejected,
+            'rejects_path': rejects_path if rejected else None
+        }
+
+    def determine_attendance_status(self, time_in, work_hours):
+        """Xác định trạng thái chấm công"""
+        minutes_in = parse_time(time_in)
+        if minutes_in < 0:
             return "Present"
+        return attendance_status(minutes_in, work_hours)
 
+    @_requires_schema
     def update_attendance(self, attendance_id, employee_id, date, time_in, time_out, notes=None):
         """Cập nhật bản ghi chấm công"""
         # Validate dữ liệu
@@ -177,7 +916,9 @@ class AttendanceManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_attendance_by_id(attendance_id)
+            old_data = self.db.get_record('Attendance', 'attendance_id = ?', [attendance_id])
+            if not old_data:
+                raise ValueError(f"Không tìm thấy bản ghi chấm công {attendance_id}")
 
             # Tính toán lại giờ làm việc
             work_hours, overtime_hours = self.calculate_work_hours(time_in, time_out)
@@ -186,7 +927,7 @@ class AttendanceManager:
             # Sử dụng phương thức update_record mới
             attendance_data = {
                 'employee_id': employee_id.strip(),
-                'date': date,
+                'date': format_date(parse_date(date)),
                 'time_in': time_in,
                 'time_out': time_out,
                 'work_hours': work_hours,
@@ -195,47 +936,60 @@ class AttendanceManager:
                 'notes': notes
             }
 
-            self.db.update_record(
-                'Attendance',
-                attendance_data,
+            updated = self.db.update_record(
+                ATTENDANCE_TABLE,
+                _stored_row(attendance_data),
                 'attendance_id = ?',
                 [attendance_id]
             )
+            if not updated:
+                # Chỉ báo trùng khi vi phạm UNIQUE(employee_id, day): ngày mới đã có bản ghi khác
+                conflict = self.db.get_record(
+                    ATTENDANCE_TABLE, 'employee_id = ? AND day = ? AND attendance_id <> ?',
+                    [employee_id.strip(), parse_date(date), attendance_id], columns="attendance_id"
+                )
+                if conflict:
+                    raise ValueError(f"Đã có bản ghi chấm công cho nhân viên {employee_id.strip()} ngày {date}")
+                raise Exception("Lỗi ghi dữ liệu")
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='UPDATE_ATTENDANCE',
                 table_name='Attendance',
                 record_id=attendance_id,
-                old_values=json.dumps(old_data, default=str) if old_data else None,
-                new_values=json.dumps(attendance_data, default=str)
+                old_values=old_data,
+                new_values=attendance_data
             )
 
             self.db.commit()
             return True
+        except ValueError:
+            self.db.rollback()
+            raise
         except Exception as e:
             self.db.rollback()
             raise Exception(f"Không thể cập nhật bản ghi chấm công: {str(e)}")
 
+    @_requires_schema
     def delete_attendance(self, attendance_id):
         """Xóa bản ghi chấm công"""
         try:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_attendance_by_id(attendance_id)
+            old_data = self.db.get_record('Attendance', 'attendance_id = ?', [attendance_id])
 
             # Sử dụng phương thức delete_record mới
-            self.db.delete_record('Attendance', 'attendance_id = ?', [attendance_id])
+            self.db.delete_record(ATTENDANCE_TABLE, 'attendance_id = ?', [attendance_id])
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='DELETE_ATTENDANCE',
                 table_name='Attendance',
                 record_id=attendance_id,
-                old_values=json.dumps(old_data, default=str) if old_data else None
+                old_values=old_data
             )
 
             self.db.commit()
@@ -244,6 +998,7 @@ class AttendanceManager:
             self.db.rollback()
             raise Exception(f"Không thể xóa bản ghi chấm công: {str(e)}")
 
+    @_requires_schema
     def get_attendance_by_id(self, attendance_id):
         """Lấy bản ghi chấm công theo ID"""
         try:
@@ -256,6 +1011,7 @@ class AttendanceManager:
         except Exception as e:
             return None
 
+    @_requires_schema
     def get_attendance_by_employee(self, employee_id, start_date=None, end_date=None):
         """Lấy chấm công theo nhân viên"""
         try:
@@ -263,42 +1019,125 @@ class AttendanceManager:
             params = [employee_id]
 
             if start_date:
-                conditions.append("date >= ?")
-                params.append(start_date)
+                conditions.append("day >= ?")
+                params.append(self._to_day(start_date))
             if end_date:
-                conditions.append("date <= ?")
-                params.append(end_date)
+                conditions.append("day <= ?")
+                params.append(self._to_day(end_date))
 
             return self.db.select_records(
-                'Attendance',
-                columns="attendance_id, employee_id, date, time_in, time_out, work_hours, overtime_hours, status, notes",
+                ATTENDANCE_TABLE,
+                columns=_RECORD_COLUMNS,
                 condition=" AND ".join(conditions),
                 params=params,
-                order_by="date DESC"
+                order_by="day DESC"
             )
         except Exception as e:
             raise Exception(f"Không thể lấy dữ liệu chấm công: {str(e)}")
 
+    @_requires_schema
     def get_attendance_by_date_range(self, start_date, end_date, employee_id=None):
         """Lấy chấm công theo khoảng thời gian"""
         try:
-            conditions = ["date BETWEEN ? AND ?"]
-            params = [start_date, end_date]
+            conditions = ["day BETWEEN ? AND ?"]
+            params = [self._to_day(start_date), self._to_day(end_date)]
 
             if employee_id:
                 conditions.append("employee_id = ?")
                 params.append(employee_id)
 
             return self.db.select_records(
-                'Attendance',
-                columns="attendance_id, employee_id, date, time_in, time_out, work_hours, overtime_hours, status, notes",
+                ATTENDANCE_TABLE,
+                columns=_RECORD_COLUMNS,
                 condition=" AND ".join(conditions),
                 params=params,
-                order_by="date DESC, time_in DESC"
+                order_by="day DESC, minute_in DESC"
             )
         except Exception as e:
             raise Exception(f"Không thể lấy dữ liệu chấm công: {str(e)}")
 
+    @_requires_schema
+    def get_attendance_by_date_range_page(self, start_date, end_date, employee_id=None,
+                                          after=None, page_size=100):
+        """
+        Lấy một trang chấm công theo khoảng thời gian (keyset pagination)
+        Args:
+            after: next_key của trang trước, None để lấy trang đầu
+        Returns:
+            Dictionary {'rows': [...], 'next_key': ...} (xem Database.select_page)
+        """
+        try:
+            conditions = ["day BETWEEN ? AND ?"]
+            params = [self._to_day(start_date), self._to_day(end_date)]
+
+            if employee_id:
+                conditions.append("employee_id = ?")
+                params.append(employee_id)
+
+            return self.db.select_page(
+                ATTENDANCE_TABLE,
+                columns=_RECORD_COLUMNS,
+                condition=" AND ".join(conditions),
+                params=params,
+                order_by="day DESC, minute_in DESC, attendance_id DESC",
+                after=after,
+                page_size=page_size
+            )
+        except Exception as e:
+            raise Exception(f"Không thể lấy dữ liệu chấm công: {str(e)}")
+
+    @_requires_schema
+    def iter_attendance_by_date_range(self, start_date, end_date, employee_id=None, batch_size=500):
+        """Duyệt chấm công theo khoảng thời gian theo từng lô (không nạp toàn bộ)"""
+        conditions = ["day BETWEEN ? AND ?"]
+        params = [self._to_day(start_date), self._to_day(end_date)]
+
+        if employee_id:
+            conditions.append("employee_id = ?")
+            params.append(employee_id)
+
+        return self.db.iter_records(
+            ATTENDANCE_TABLE,
+            columns=_RECORD_COLUMNS,
+            condition=" AND ".join(conditions),
+            params=params,
+            order_by="day DESC, minute_in DESC",
+            batch_size=batch_size
+        )
+
+    @_requires_schema
+    def search_attendance(self, employee_filter=None, start_date=None, end_date=None):
+        """
+        Lọc chấm công theo một phần mã nhân viên và khoảng ngày (có thể bỏ trống)
+        Returns:
+            Danh sách (attendance_id, employee_id, date, time_in, time_out, work_hours),
+            mới nhất trước
+        """
+        try:
+            conditions = []
+            params = []
+
+            if employee_filter:
+                conditions.append("employee_id LIKE ?")
+                params.append(f"%{employee_filter}%")
+            if start_date:
+                conditions.append("day >= ?")
+                params.append(self._to_day(start_date))
+            if end_date:
+                conditions.append("day <= ?")
+                params.append(self._to_day(end_date))
+
+            return self.db.select_records(
+                ATTENDANCE_TABLE,
+                columns=_text_columns('attendance_id', 'employee_id', 'date', 'time_in', 'time_out', 'work_hours'),
+                condition=" AND ".join(conditions) or None,
+                params=params,
+                order_by="day DESC, minute_in DESC"
+            )
+        except Exception as e:
+            raise Exception(f"Không thể lấy dữ liệu chấm công: {str(e)}")
+
+    @_requires_schema
     def get_attendance_statistics(self, start_date=None, end_date=None):
         """Lấy thống kê chấm công"""
         try:
@@ -308,17 +1147,17 @@ class AttendanceManager:
             conditions = []
             params = []
             if start_date and end_date:
-                conditions.append("date BETWEEN ? AND ?")
-                params = [start_date, end_date]
+                conditions.append("day BETWEEN ? AND ?")
+                params = [self._to_day(start_date), self._to_day(end_date)]
 
             condition_str = " AND ".join(conditions) if conditions else None
 
             # Tổng số bản ghi chấm công
-            stats['total_records'] = self.db.get_table_count('Attendance', condition_str, params)
+            stats['total_records'] = self.db.get_table_count(ATTENDANCE_TABLE, condition_str, params)
 
             # Thống kê theo trạng thái
             status_stats = self.db.select_records(
-                'Attendance',
+                ATTENDANCE_TABLE,
                 columns="status, COUNT(*) as count",
                 condition=condition_str,
                 params=params,
@@ -328,7 +1167,7 @@ class AttendanceManager:
 
             # Tổng giờ làm việc và làm thêm
             hours_result = self.db.select_records(
-                'Attendance',
+                ATTENDANCE_TABLE,
                 columns="SUM(work_hours) as total_work, SUM(overtime_hours) as total_overtime",
                 condition=condition_str,
                 params=params
@@ -351,35 +1190,59 @@ class AttendanceManager:
         except Exception as e:
             raise Exception(f"Không thể lấy thống kê chấm công: {str(e)}")
 
+    @_requires_schema
     def get_monthly_attendance_summary(self, year, month, employee_id=None):
-        """Lấy tổng hợp chấm công theo tháng"""
+        """
+        Lấy tổng hợp chấm công theo tháng
+        Đọc từ bảng AttendanceMonthly (trigger cập nhật khi ghi Attendance):
+        một dòng mỗi nhân viên thay vì cộng lại mọi ngày chấm công
+        """
         try:
-            start_date = f"{year}-{month:02d}-01"
-            # Get last day of month
-            if month == 12:
-                next_month = f"{year + 1}-01-01"
-            else:
-                next_month = f"{year}-{month + 1:02d}-01"
-
-            conditions = ["date >= ? AND date < ?"]
-            params = [start_date, next_month]
+            conditions = ["year = ? AND month = ?"]
+            params = [year, month]
 
             if employee_id:
                 conditions.append("employee_id = ?")
                 params.append(employee_id)
 
             return self.db.select_records(
-                'Attendance',
-                columns="""employee_id, 
-                          COUNT(*) as total_days,
-                          SUM(work_hours) as total_work_hours,
-                          SUM(overtime_hours) as total_overtime_hours,
-                          SUM(CASE WHEN status = 'Late' THEN 1 ELSE 0 END) as late_days,
-                          SUM(CASE WHEN status = 'Present' THEN 1 ELSE 0 END) as present_days""",
+                'AttendanceMonthly',
+                columns="""employee_id,
+                          total_days,
+                          ROUND(total_work_hours, 2) as total_work_hours,
+                          ROUND(total_overtime_hours, 2) as total_overtime_hours,
+                          late_days,
+                          present_days""",
                 condition=" AND ".join(conditions),
                 params=params,
-                group_by="employee_id",
                 order_by="employee_id"
             )
         except Exception as e:
             raise Exception(f"Không thể lấy tổng hợp chấm công: {str(e)}")
+
+    @_requires_schema
+    def get_payroll_attendance(self, year, month, employee_id=None):
+        """
+        Số ngày công và giờ làm thêm trong tháng để điền sẵn bảng lương
+        Returns:
+            Dictionary {employee_id: {'actual_work_days', 'overtime_hours', 'late_days'}}
+            (nhân viên không có chấm công trong tháng không có trong kết quả)
+        """
+        summary = self.get_monthly_attendance_summary(year, month, employee_id)
+        return {
+            row[0]: {'actual_work_days': row[1], 'overtime_hours': row[3] or 0, 'late_days': row[4]}
+            for row in summary
+        }
+
+    @_requires_schema
+    def rebuild_monthly_summary(self, user_id="system"):
+        """Tính lại bảng AttendanceMonthly từ Attendance (sửa sai lệch)"""
+        if not self.db.rebuild_rollups('AttendanceMonthly'):
+            raise Exception("Không thể tính lại tổng hợp chấm công")
+
+        self.db.log_change(
+            user_id=user_id,
+            action='REBUILD_ATTENDANCE_MONTHLY',
+            table_name='AttendanceMonthly'
+        )
+        return True
@@ -1,7 +1,9 @@
 from src.db.database import get_db
 import datetime
 import re
-import json
+
+# Các cột tìm kiếm (cũng là các cột của bảng FTS tương ứng)
+SEARCH_COLUMNS = ('name', 'email', 'position', 'skills')
 
 
 class CandidateManager:
@@ -64,12 +66,11 @@ class CandidateManager:
                 conditions.append("id != ?")
                 params.append(exclude_id)
 
-            count = self.db.get_table_count(
+            return self.db.record_exists(
                 'Candidates',
                 " AND ".join(conditions),
                 params
             )
-            return count > 0
         except Exception:
             return False
 
@@ -93,8 +94,7 @@ class CandidateManager:
             self.db.begin_transaction()
 
             # Tạo candidate_id
-            count = self.db.get_table_count('Candidates')
-            candidate_id = f"CAN{count + 1:06d}"
+            candidate_id = self.db.next_id('CAN')
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             application_date = datetime.datetime.now().strftime("%Y-%m-%d")
@@ -119,12 +119,12 @@ class CandidateManager:
             self.db.insert_record('Candidates', candidate_data)
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='ADD_CANDIDATE',
                 table_name='Candidates',
                 record_id=candidate_id,
-                new_values=json.dumps(candidate_data, default=str)
+                new_values=candidate_data
             )
 
             self.db.commit()
@@ -149,7 +149,7 @@ class CandidateManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_candidate_by_id(id)
+            old_data = self.db.get_record('Candidates', 'id = ? OR candidate_id = ?', [id, id])
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -175,13 +175,13 @@ class CandidateManager:
             )
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='UPDATE_CANDIDATE',
                 table_name='Candidates',
-                record_id=str(id),
-                old_values=json.dumps(old_data, default=str) if old_data else None,
-                new_values=json.dumps(candidate_data, default=str)
+                record_id=old_data['candidate_id'] if old_data else str(id),
+                old_values=old_data,
+                new_values=candidate_data
             )
 
             self.db.commit()
@@ -196,7 +196,7 @@ class CandidateManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_candidate_by_id(candidate_id)
+            old_data = self.db.get_record('Candidates', 'id = ? OR candidate_id = ?', [candidate_id, candidate_id])
 
             # Sử dụng phương thức delete_record mới
             self.db.delete_record(
@@ -206,12 +206,12 @@ class CandidateManager:
             )
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='DELETE_CANDIDATE',
                 table_name='Candidates',
-                record_id=str(candidate_id),
-                old_values=json.dumps(old_data, default=str) if old_data else None
+                record_id=old_data['candidate_id'] if old_data else str(candidate_id),
+                old_values=old_data
             )
 
             self.db.commit()
@@ -243,23 +243,61 @@ class CandidateManager:
         except Exception as e:
             raise Exception(f"Không thể lấy danh sách ứng viên: {str(e)}")
 
+    def get_all_candidates_page(self, after=None, page_size=100):
+        """
+        Lấy một trang ứng viên (keyset pagination)
+        Args:
+            after: next_key của trang trước, None để lấy trang đầu
+        Returns:
+            Dictionary {'rows': [...], 'next_key': ...} (xem Database.select_page)
+        """
+        try:
+            return self.db.select_page(
+                'Candidates',
+                columns="id, candidate_id, name, email, phone, position, experience, education, skills, status, application_date, interview_date, notes",
+                order_by="application_date DESC, id DESC",
+                after=after,
+                page_size=page_size
+            )
+        except Exception as e:
+            raise Exception(f"Không thể lấy danh sách ứng viên: {str(e)}")
+
     def search_candidates(self, search_term):
         """Tìm kiếm ứng viên"""
         if not search_term or not search_term.strip():
             return self.get_all_candidates()
 
         try:
-            search_pattern = f"%{search_term.strip()}%"
-            return self.db.select_records(
+            # Xếp theo mức độ liên quan (FTS), LIKE nếu không có FTS
+            return self.db.search_records(
                 'Candidates',
+                search_term,
+                like_columns=SEARCH_COLUMNS,
                 columns="id, candidate_id, name, email, phone, position, experience, education, skills, status, application_date, interview_date, notes",
-                condition="name LIKE ? OR email LIKE ? OR position LIKE ? OR skills LIKE ?",
-                params=[search_pattern, search_pattern, search_pattern, search_pattern],
                 order_by="application_date DESC"
             )
         except Exception as e:
             raise Exception(f"Lỗi tìm kiếm ứng viên: {str(e)}")
 
+    def search_candidates_page(self, search_term, after=None, page_size=100):
+        """Tìm kiếm ứng viên theo từng trang (giống search_candidates)"""
+        if not search_term or not search_term.strip():
+            return self.get_all_candidates_page(after, page_size)
+
+        try:
+            search, params = self.db.search_condition('Candidates', search_term, SEARCH_COLUMNS)
+            return self.db.select_page(
+                'Candidates',
+                columns="id, candidate_id, name, email, phone, position, experience, education, skills, status, application_date, interview_date, notes",
+                condition=search,
+                params=params,
+                order_by="application_date DESC, id DESC",
+                after=after,
+                page_size=page_size
+            )
+        except Exception as e:
+            raise Exception(f"Lỗi tìm kiếm ứng viên: {str(e)}")
+
     def get_candidates_by_status(self, status):
         """Lấy ứng viên theo trạng thái"""
         try:
@@ -296,7 +334,7 @@ class CandidateManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_candidate_by_id(candidate_id)
+            old_data = self.db.get_record('Candidates', 'id = ? OR candidate_id = ?', [candidate_id, candidate_id])
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -316,13 +354,13 @@ class CandidateManager:
             )
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='UPDATE_CANDIDATE_STATUS',
                 table_name='Candidates',
-                record_id=str(candidate_id),
-                old_values=json.dumps(old_data, default=str) if old_data else None,
-                new_values=json.dumps(update_data, default=str)
+                record_id=old_data['candidate_id'] if old_data else str(candidate_id),
+                old_values=old_data,
+                new_values=update_data
             )
 
             self.db.commit()
@@ -340,7 +378,7 @@ class CandidateManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_candidate_by_id(candidate_id)
+            old_data = self.db.get_record('Candidates', 'id = ? OR candidate_id = ?', [candidate_id, candidate_id])
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -361,13 +399,13 @@ class CandidateManager:
             )
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='SCHEDULE_INTERVIEW',
                 table_name='Candidates',
-                record_id=str(candidate_id),
-                old_values=json.dumps(old_data, default=str) if old_data else None,
-                new_values=json.dumps(update_data, default=str)
+                record_id=old_data['candidate_id'] if old_data else str(candidate_id),
+                old_values=old_data,
+                new_values=update_data
             )
 
             self.db.commit()
@@ -422,11 +460,13 @@ class CandidateManager:
             stats['by_experience'] = dict(exp_stats)
 
             # Ứng viên mới trong tháng
-            current_month = datetime.datetime.now().strftime("%Y-%m")
+            # So sánh theo khoảng để dùng được index (LIKE 'YYYY-MM%' không dùng index)
+            month_start = datetime.date.today().replace(day=1)
+            next_month = (month_start + datetime.timedelta(days=32)).replace(day=1)
             stats['new_this_month'] = self.db.get_table_count(
                 'Candidates',
-                'application_date LIKE ?',
-                [f"{current_month}%"]
+                'application_date >= ? AND application_date < ?',
+                [month_start.isoformat(), next_month.isoformat()]
             )
 
             return stats
@@ -1,7 +1,40 @@
 from src.db.database import get_db
+from src.db.audit import encode_payload
+from src.db.normalize import fold
+from src.logic.employee_directory import get_directory
+import csv
 import datetime
+import math
+import os
 import re
-import json
+
+# Các cột tìm kiếm (cũng là các cột của bảng FTS tương ứng)
+SEARCH_COLUMNS = ('id', 'name', 'department', 'position')
+
+# Mức lương tối đa hợp lệ (VNĐ)
+MAX_SALARY = 1000000000
+
+# Mẫu kiểm tra dữ liệu (biên dịch một lần)
+_ID_PATTERN = re.compile(r'^[A-Z0-9]+$')
+_EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_PHONE_PATTERN = re.compile(r'^[0-9+\-\s()]{10,15}$')
+_DMY_DATE = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})$')
+_GROUPED_NUMBER = re.compile(r'^\d{1,3}(?:([.,])\d{3})(?:\1\d{3})*$')
+
+# Cột của file nhập nhân viên và các tên cột được chấp nhận (so khớp không dấu)
+IMPORT_COLUMNS = ('id', 'name', 'department', 'salary', 'join_date', 'email', 'phone', 'position')
+IMPORT_REQUIRED_COLUMNS = ('id', 'name', 'department', 'salary', 'join_date')
+_IMPORT_HEADER_ALIASES = {
+    'id': ('id', 'ma nv', 'ma nhan vien', 'employee id'),
+    'name': ('name', 'ho ten', 'ho va ten', 'ten nhan vien'),
+    'department': ('department', 'phong ban'),
+    'salary': ('salary', 'luong', 'muc luong'),
+    'join_date': ('join_date', 'join date', 'ngay vao lam', 'ngay vao'),
+    'email': ('email',),
+    'phone': ('phone', 'sdt', 'so dien thoai', 'dien thoai'),
+    'position': ('position', 'chuc vu', 'vi tri'),
+}
+_IMPORT_HEADERS = {alias: column for column, aliases in _IMPORT_HEADER_ALIASES.items() for alias in aliases}
 
 
 class EmployeeManager:
@@ -9,6 +42,11 @@ class EmployeeManager:
         self.db = get_db()
         self._ensure_tables()
 
+    @property
+    def directory(self):
+        """Danh bạ nhân viên trong bộ nhớ (dùng chung trong process)"""
+        return get_directory(self.db)
+
     def _ensure_tables(self):
         """Đảm bảo các bảng cần thiết tồn tại - đã được xử lý trong database.py"""
         pass
@@ -20,7 +58,7 @@ class EmployeeManager:
         # Validate ID
         if not id or not id.strip():
             errors.append("Mã nhân viên không được để trống")
-        elif not re.match(r'^[A-Z0-9]+$', id.strip()):
+        elif not _ID_PATTERN.match(id.strip()):
             errors.append("Mã nhân viên chỉ được chứa chữ cái in hoa và số")
 
         # Validate name
@@ -38,7 +76,7 @@ class EmployeeManager:
             salary_float = float(salary)
             if salary_float < 0:
                 errors.append("Lương không được âm")
-            elif salary_float > 1000000000:  # 1 tỷ
+            elif salary_float > MAX_SALARY:  # 1 tỷ
                 errors.append("Lương không được vượt quá 1 tỷ VNĐ")
         except (ValueError, TypeError):
             errors.append("Lương phải là số")
@@ -51,14 +89,12 @@ class EmployeeManager:
 
         # Validate email if provided
         if email and email.strip():
-            email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            if not re.match(email_pattern, email.strip()):
+            if not _EMAIL_PATTERN.match(email.strip()):
                 errors.append("Email không hợp lệ")
 
         # Validate phone if provided
         if phone and phone.strip():
-            phone_pattern = r'^[0-9+\-\s()]{10,15}$'
-            if not re.match(phone_pattern, phone.strip().replace(' ', '')):
+            if not _PHONE_PATTERN.match(phone.strip().replace(' ', '')):
                 errors.append("Số điện thoại không hợp lệ")
 
         return errors
@@ -66,8 +102,7 @@ class EmployeeManager:
     def employee_exists(self, employee_id):
         """Kiểm tra nhân viên có tồn tại không"""
         try:
-            count = self.db.get_table_count('Employees', 'id = ?', [employee_id])
-            return count > 0
+            return self.directory.exists(employee_id)
         except Exception:
             return False
 
@@ -83,7 +118,8 @@ class EmployeeManager:
             raise ValueError(f"Mã nhân viên {id} đã tồn tại")
 
         try:
-            self.db.begin_transaction()
+            if not self.db.begin_transaction():
+                raise Exception("Không thể bắt đầu transaction")
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -103,20 +139,25 @@ class EmployeeManager:
             }
 
             result = self.db.insert_record('Employees', employee_data)
+            if result is None:
+                raise Exception("Lỗi khi ghi bản ghi nhân viên")
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='ADD_EMPLOYEE',
                 table_name='Employees',
                 record_id=id.strip(),
-                new_values=json.dumps(employee_data, default=str)
+                new_values=employee_data
             )
 
-            self.db.commit()
+            if not self.db.commit():
+                raise Exception("Lỗi khi commit transaction")
+            self.directory.put(employee_data)
             return True
         except Exception as e:
             self.db.rollback()
+            self.directory.invalidate()
             raise Exception(f"Không thể thêm nhân viên: {str(e)}")
 
     def update_employee(self, id, name, dept, salary, join_date, email=None, phone=None, position=None):
@@ -134,7 +175,7 @@ class EmployeeManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_employee_by_id(id)
+            old_data = self.db.get_record('Employees', 'id = ?', [id.strip()])
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -158,19 +199,21 @@ class EmployeeManager:
             )
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='UPDATE_EMPLOYEE',
                 table_name='Employees',
                 record_id=id.strip(),
-                old_values=json.dumps(old_data, default=str) if old_data else None,
-                new_values=json.dumps(employee_data, default=str)
+                old_values=old_data,
+                new_values=employee_data
             )
 
             self.db.commit()
+            self.directory.put(dict(employee_data, id=id.strip()))
             return True
         except Exception as e:
             self.db.rollback()
+            self.directory.invalidate()
             raise Exception(f"Không thể cập nhật nhân viên: {str(e)}")
 
     def delete_employee(self, id):
@@ -185,131 +228,427 @@ class EmployeeManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_employee_by_id(id)
+            old_data = self.db.get_record('Employees', 'id = ?', [id.strip()])
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+            delete_data = {'status': 'Deleted', 'updated_date': current_time}
+
             # Sử dụng phương thức update_record mới
             self.db.update_record(
                 'Employees',
-                {'status': 'Deleted', 'updated_date': current_time},
+                delete_data,
                 'id = ?',
                 [id.strip()]
             )
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='DELETE_EMPLOYEE',
                 table_name='Employees',
                 record_id=id.strip(),
-                old_values=json.dumps(old_data, default=str) if old_data else None
+                old_values=old_data,
+                new_values=delete_data
             )
 
             self.db.commit()
+            self.directory.remove(id.strip())
             return True
         except Exception as e:
             self.db.rollback()
+            self.directory.invalidate()
             raise Exception(f"Không thể xóa nhân viên: {str(e)}")
 
+    @staticmethod
+    def _parse_import_value(column, value):
+        """Chuẩn hóa giá trị ô từ file nhập (số có dấu phân cách, ngày DD/MM/YYYY)"""
+        value = value.strip()
+        if column == 'salary':
+            value = value.replace(' ', '')
+            if _GROUPED_NUMBER.match(value):
+                value = value.replace(',', '').replace('.', '')
+        elif column == 'join_date':
+            match = _DMY_DATE.match(value)
+            if match:
+                day, month, year = match.groups()
+                value = f"{year}-{int(month):02d}-{int(day):02d}"
+        return value
+
+    def _import_chunk(self, chunk, user_id, reject):
+        """
+        Ghi một lô nhân viên trong một transaction
+        Args:
+            chunk: Danh sách (số dòng, hàng gốc, dữ liệu nhân viên)
+            reject: Hàm reject(số dòng, hàng gốc, lỗi)
+        Returns:
+            Số nhân viên đã ghi
+        """
+        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            dict(record, status='Active', created_date=current_time, updated_date=current_time)
+            for _, _, record in chunk
+        ]
+
+        try:
+            with self.db.transaction():
+                result = self.db.bulk_insert('Employees', rows, chunk_size=len(rows))
+                failed = {item['index']: item['error'] for item in result['failed']}
+
+                for index, row in enumerate(rows):
+                    if index not in failed:
+                        self.db.log_change(
+                            user_id=user_id,
+                            action='IMPORT_EMPLOYEE',
+                            table_name='Employees',
+                            record_id=row['id'],
+                            new_values=row
+                        )
+        except Exception as e:
+            for line_no, raw, _ in chunk:
+                reject(line_no, raw, f"Lỗi ghi dữ liệu: {str(e)}")
+            return 0
+
+        for index, error in failed.items():
+            line_no, raw, _ = chunk[index]
+            reject(line_no, raw, f"Lỗi ghi dữ liệu: {error}")
+        return len(rows) - len(failed)
+
+    def import_employees_csv(self, file_path, rejects_path=None, chunk_size=1000,
+                             encoding='utf-8-sig', user_id='system'):
+        """
+        Nhập nhân viên hàng loạt từ file CSV (kể cả CSV xuất từ Excel)
+        File được đọc tuần tự; mỗi lô chunk_size hàng hợp lệ được ghi trong một
+        transaction. Hàng lỗi (sai dữ liệu, trùng mã với database hoặc trong file,
+        lỗi ghi) được ghi vào file rejects kèm số dòng và lý do
+        Args:
+            file_path: File CSV có dòng tiêu đề (vd: id,name,department,salary,join_date,...
+                       hoặc Mã NV, Họ tên, Phòng ban, Lương, Ngày vào làm, ...)
+            rejects_path: File ghi hàng lỗi (mặc định: <tên file>_rejects.csv)
+            chunk_size: Số hàng mỗi transaction
+            encoding: Mã hóa file
+            user_id: Người thực hiện (ghi log)
+        Returns:
+            Dictionary {'imported': số nhân viên đã nhập, 'rejected': số hàng lỗi,
+                        'rejects_path': file rejects hoặc None nếu không có hàng lỗi}
+        """
+        if rejects_path is None:
+            rejects_path = f"{os.path.splitext(file_path)[0]}_rejects.csv"
+
+        imported = 0
+        rejected = 0
+        rejects_file = None
+        rejects_writer = None
+
+        with open(file_path, newline='', encoding=encoding) as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+
+            reader = csv.reader(f, dialect)
+            header = next(reader, None)
+            if not header:
+                raise ValueError("File không có dòng tiêu đề")
+
+            # Vị trí của từng cột trong file
+            positions = {}
+            for index, title in enumerate(header):
+                column = _IMPORT_HEADERS.get(fold(title))
+                if column and column not in positions:
+                    positions[column] = index
+            missing = [column for column in IMPORT_REQUIRED_COLUMNS if column not in positions]
+            if missing:
+                raise ValueError(f"File thiếu cột: {', '.join(missing)}")
+
+            def reject(line_no, raw, error):
+                nonlocal rejected, rejects_file, rejects_writer
+                if rejects_writer is None:
+                    rejects_file = open(rejects_path, 'w', newline='', encoding='utf-8-sig')
+                    rejects_writer = csv.writer(rejects_file)
+                    rejects_writer.writerow(['Dòng', 'Lỗi'] + header)
+                rejects_writer.writerow([line_no, error] + raw)
+                rejected += 1
+
+            # Mã đã có trong database (kể cả đã xóa mềm) và mã đã gặp trong file
+            existing_ids = self.directory.ids()
+            seen_ids = set()
+            chunk = []
+
+            try:
+                for line_no, raw in enumerate(reader, start=2):
+                    if not any(cell.strip() for cell in raw):
+                        continue
+
+                    record = {
+                        column: self._parse_import_value(column, raw[index]) if index < len(raw) else ''
+                        for column, index in positions.items()
+                    }
+                    errors = self.validate_employee_data(
+                        record['id'], record['name'], record['department'], record['salary'],
+                        record['join_date'], record.get('email'), record.get('phone')
+                    )
+                    if not errors:
+                        if record['id'] in existing_ids:
+                            errors.append(f"Mã nhân viên {record['id']} đã tồn tại")
+                        elif record['id'] in seen_ids:
+                            errors.append(f"Mã nhân viên {record['id']} bị trùng trong file")
+                    if errors:
+                        reject(line_no, raw, "; ".join(errors))
+                        continue
+
+                    seen_ids.add(record['id'])
+                    chunk.append((line_no, raw, {
+                        'id': record['id'],
+                        'name': record['name'],
+                        'department': record['department'],
+                        'salary': float(record['salary']),
+                        'join_date': record['join_date'],
+                        'email': record.get('email') or None,
+                        'phone': record.get('phone') or None,
+                        'position': record.get('position') or None
+                    }))
+
+                    if len(chunk) >= chunk_size:
+                        imported += self._import_chunk(chunk, user_id, reject)
+                        chunk = []
+
+                if chunk:
+                    imported += self._import_chunk(chunk, user_id, reject)
+            finally:
+                if rejects_file is not None:
+                    rejects_file.close()
+                # Nạp lại danh bạ một lần thay vì cập nhật từng nhân viên
+                if imported:
+                    self.directory.invalidate()
+
+        return {
+            'imported': imported,
+            'rejected': rejected,
+            'rejects_path': rejects_path if rejected else None
+        }
+
+    @staticmethod
+    def _salary_adjustment_filter(department=None, position=None, joined_from=None, joined_to=None):
+        """Điều kiện chọn nhân viên active cho điều chỉnh lương hàng loạt"""
+        conditions = ["status != 'Deleted'"]
+        params = []
+        if department:
+            conditions.append("department = ?")
+            params.append(department)
+        if position:
+            conditions.append("position = ?")
+            params.append(position)
+        for value, operator in ((joined_from, '>='), (joined_to, '<=')):
+            if value:
+                try:
+                    datetime.datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    raise ValueError("Ngày vào làm phải có định dạng YYYY-MM-DD")
+                conditions.append(f"join_date {operator} ?")
+                params.append(value)
+        return " AND ".join(conditions), params
+
+    @staticmethod
+    def _salary_expression(percent=None, amount=None):
+        """Biểu thức SQL của lương mới (làm tròn tới đồng)"""
+        if (percent is None) == (amount is None):
+            raise ValueError("Cần chỉ định một trong hai: tỷ lệ tăng (%) hoặc số tiền tăng")
+        try:
+            value = float(percent if percent is not None else amount)
+        except (ValueError, TypeError):
+            raise ValueError("Mức điều chỉnh phải là số")
+        # NaN/vô cực qua được float() nhưng bị lưu thành NULL, làm SUM() trả về NULL
+        if not math.isfinite(value):
+            raise ValueError("Mức điều chỉnh phải là số")
+        if percent is not None:
+            return "ROUND(salary * (1 + ? / 100.0))", [value]
+        return "ROUND(salary + ?)", [value]
+
+    def adjust_salaries(self, percent=None, amount=None, department=None, position=None,
+                        joined_from=None, joined_to=None, dry_run=False, user_id='system'):
+        """
+        Điều chỉnh lương hàng loạt bằng một câu lệnh UPDATE
+        Args:
+            percent: Tỷ lệ tăng (%), số âm để giảm
+            amount: Số tiền tăng (VNĐ), số âm để giảm (chỉ dùng một trong percent/amount)
+            department, position: Lọc theo phòng ban, vị trí (None: tất cả)
+            joined_from, joined_to: Lọc theo ngày vào làm (YYYY-MM-DD, gồm hai đầu)
+            dry_run: True để chỉ tính trước tổng quỹ lương, không ghi
+            user_id: Người thực hiện (ghi log)
+        Returns:
+            Dictionary {'employees', 'current_total', 'new_total', 'difference',
+                        'out_of_range', 'by_department': [(phòng ban, số NV, tổng cũ, tổng mới)],
+                        'dry_run'}
+        """
+        expression, expression_params = self._salary_expression(percent, amount)
+        condition, params = self._salary_adjustment_filter(department, position, joined_from, joined_to)
+
+        summary_query = f"""
+            SELECT department, COUNT(*), SUM(salary), SUM(new_salary),
+                   SUM(new_salary < 0 OR new_salary > {MAX_SALARY})
+            FROM (SELECT department, salary, {expression} AS new_salary FROM Employees WHERE {condition})
+            GROUP BY department ORDER BY department
+        """
+
+        def summarize():
+            rows = self.db.query(summary_query, expression_params + params).fetchall()
+            current_total = sum(row[2] for row in rows)
+            new_total = sum(row[3] for row in rows)
+            return {
+                'employees': sum(row[1] for row in rows),
+                'current_total': current_total,
+                'new_total': new_total,
+                'difference': new_total - current_total,
+                'out_of_range': sum(row[4] for row in rows),
+                'by_department': [(row[0], row[1], row[2], row[3]) for row in rows],
+                'dry_run': dry_run
+            }
+
+        try:
+            if dry_run:
+                return summarize()
+
+            with self.db.transaction():
+                summary = summarize()
+                if summary['out_of_range']:
+                    raise ValueError(f"{summary['out_of_range']} nhân viên có lương mới ngoài khoảng 0 - 1 tỷ VNĐ")
+                if not summary['employees']:
+                    return summary
+
+                changes = self.db.query(
+                    f"SELECT id, salary, {expression} FROM Employees WHERE {condition}",
+                    expression_params + params
+                ).fetchall()
+
+                current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                if not self.db.execute(
+                    f"UPDATE Employees SET salary = {expression}, updated_date = ? WHERE {condition}",
+                    expression_params + [current_time] + params
+                ):
+                    raise Exception("Lỗi cập nhật lương")
+
+                self.db.log_actions([
+                    {
+                        'user_id': user_id,
+                        'action': 'ADJUST_SALARY',
+                        'table_name': 'Employees',
+                        'record_id': emp_id,
+                        'old_values': encode_payload({'salary': old_salary}),
+                        'new_values': encode_payload({'salary': new_salary, 'updated_date': current_time})
+                    }
+                    for emp_id, old_salary, new_salary in changes
+                ])
+        except ValueError:
+            raise
+        except Exception as e:
+            self.directory.invalidate()
+            raise Exception(f"Không thể điều chỉnh lương: {str(e)}")
+
+        for emp_id, _, new_salary in changes:
+            self.directory.put({'id': emp_id, 'salary': new_salary})
+        return summary
+
     def search_employee(self, search_term):
         """Tìm kiếm nhân viên"""
         if not search_term or not search_term.strip():
             return self.get_all_employees()
 
         try:
-            search_pattern = f"%{search_term.strip()}%"
-
-            # Sử dụng phương thức select_records mới
-            return self.db.select_records(
+            # Xếp theo mức độ liên quan (FTS), LIKE nếu không có FTS
+            return self.db.search_records(
                 'Employees',
+                search_term,
+                like_columns=SEARCH_COLUMNS,
                 columns="id, name, department, salary, join_date, email, phone, position",
-                condition="status != 'Deleted' AND (id LIKE ? OR name LIKE ? OR department LIKE ? OR position LIKE ?)",
-                params=[search_pattern, search_pattern, search_pattern, search_pattern],
-                order_by="name"
+                condition="status != 'Deleted'",
+                order_by="name, id"
             )
         except Exception as e:
             raise Exception(f"Lỗi tìm kiếm: {str(e)}")
 
-    def get_all_employees(self):
-        """Lấy tất cả nhân viên active"""
+    def search_employee_page(self, search_term, after=None, page_size=100):
+        """Tìm kiếm nhân viên theo từng trang (giống search_employee)"""
+        if not search_term or not search_term.strip():
+            return self.get_all_employees_page(after, page_size)
+
         try:
-            # Sử dụng phương thức select_records mới
-            return self.db.select_records(
+            search, params = self.db.search_condition('Employees', search_term, SEARCH_COLUMNS)
+            return self.db.select_page(
                 'Employees',
                 columns="id, name, department, salary, join_date, email, phone, position",
-                condition="status != 'Deleted'",
-                order_by="name"
+                condition=f"status != 'Deleted' AND {search}",
+                params=params,
+                order_by="name, id",
+                after=after,
+                page_size=page_size
             )
+        except Exception as e:
+            raise Exception(f"Lỗi tìm kiếm: {str(e)}")
+
+    def get_all_employees(self):
+        """Lấy tất cả nhân viên active"""
+        try:
+            # Đọc từ danh bạ trong bộ nhớ (đã sắp xếp theo name, id)
+            return [record[:8] for record in self.directory.all()]
+        except Exception as e:
+            raise Exception(f"Không thể lấy danh sách nhân viên: {str(e)}")
+
+    def get_all_employees_page(self, after=None, page_size=100):
+        """
+        Lấy một trang nhân viên active (keyset pagination)
+        Args:
+            after: next_key của trang trước, None để lấy trang đầu
+        Returns:
+            Dictionary {'rows': [...], 'next_key': ...} (xem Database.select_page)
+        """
+        try:
+            records = self.directory.all(after=after, limit=page_size + 1)
+            next_key = (records[page_size - 1][1], records[page_size - 1][0]) if len(records) > page_size else None
+            return {'rows': [record[:8] for record in records[:page_size]], 'next_key': next_key}
         except Exception as e:
             raise Exception(f"Không thể lấy danh sách nhân viên: {str(e)}")
 
     def get_employee_by_id(self, employee_id):
         """Lấy thông tin nhân viên theo ID"""
         try:
-            # Sử dụng phương thức select_records mới
-            result = self.db.select_records(
-                'Employees',
-                columns="id, name, department, salary, join_date, email, phone, position, status",
-                condition="id = ? AND status != 'Deleted'",
-                params=[employee_id]
-            )
-            return result[0] if result else None
+            return self.directory.get(employee_id)
         except Exception as e:
             raise Exception(f"Không thể lấy thông tin nhân viên: {str(e)}")
 
     def get_employees_by_department(self, department):
         """Lấy nhân viên theo phòng ban"""
         try:
-            # Sử dụng phương thức select_records mới
-            return self.db.select_records(
-                'Employees',
-                columns="id, name, department, salary, join_date, email, phone, position",
-                condition="department = ? AND status != 'Deleted'",
-                params=[department],
-                order_by="name"
-            )
+            return [record[:8] for record in self.directory.by_department(department)]
         except Exception as e:
             raise Exception(f"Không thể lấy danh sách nhân viên theo phòng ban: {str(e)}")
 
     def get_employee_statistics(self):
-        """Lấy thống kê nhân viên"""
+        """Lấy thống kê nhân viên (đọc từ bảng tổng hợp DepartmentStats)"""
         try:
-            stats = {}
+            dept_rows = self.db.select_records(
+                'DepartmentStats',
+                columns="department, employee_count, salary_sum, min_salary, max_salary",
+                order_by="employee_count DESC"
+            )
 
-            # Tổng số nhân viên
-            stats['total_employees'] = self.db.get_table_count('Employees', "status != 'Deleted'")
+            total = sum(row[1] for row in dept_rows)
+            salary_sum = sum(row[2] for row in dept_rows)
 
-            # Thống kê theo phòng ban
-            dept_stats = self.db.select_records(
-                'Employees',
-                columns="department, COUNT(*) as count, AVG(salary) as avg_salary",
-                condition="status != 'Deleted'",
-                order_by="count DESC",
-                group_by="department"
-            )
-            stats['by_department'] = dept_stats
+            stats = {}
+            stats['total_employees'] = total
 
-            # Lương trung bình
-            avg_result = self.db.select_records(
-                'Employees',
-                columns="AVG(salary) as avg_salary",
-                condition="status != 'Deleted'"
-            )
-            stats['avg_salary'] = avg_result[0][0] if avg_result and avg_result[0][0] else 0
+            # Thống kê theo phòng ban: (department, count, avg_salary)
+            stats['by_department'] = [
+                (department, count, dept_sum / count if count else 0)
+                for department, count, dept_sum, _, _ in dept_rows
+            ]
 
-            # Lương cao nhất và thấp nhất
-            minmax_result = self.db.select_records(
-                'Employees',
-                columns="MAX(salary) as max_salary, MIN(salary) as min_salary",
-                condition="status != 'Deleted'"
-            )
-            if minmax_result and len(minmax_result[0]) >= 2:
-                stats['max_salary'] = minmax_result[0][0] if minmax_result[0][0] else 0
-                stats['min_salary'] = minmax_result[0][1] if minmax_result[0][1] else 0
-            else:
-                stats['max_salary'] = 0
-                stats['min_salary'] = 0
+            stats['avg_salary'] = salary_sum / total if total else 0
+            stats['max_salary'] = max((row[4] for row in dept_rows), default=0)
+            stats['min_salary'] = min((row[3] for row in dept_rows), default=0)
 
             return stats
         except Exception as e:
@@ -318,13 +657,6 @@ class EmployeeManager:
     def get_departments(self):
         """Lấy danh sách phòng ban"""
         try:
-            # Sử dụng phương thức select_records mới
-            result = self.db.select_records(
-                'Employees',
-                columns="DISTINCT department",
-                condition="status != 'Deleted' AND department IS NOT NULL",
-                order_by="department"
-            )
-            return [row[0] for row in result]
+            return self.directory.departments()
         except Exception as e:
             return []
@@ -0,0 +1,183 @@
+import bisect
+import threading
+import weakref
+
+# Các cột giữ trong bộ nhớ (cùng thứ tự với EmployeeManager.get_employee_by_id)
+DIRECTORY_COLUMNS = ('id', 'name', 'department', 'salary', 'join_date', 'email', 'phone', 'position', 'status')
+
+_ID, _NAME, _DEPARTMENT, _STATUS = 0, 1, 2, 8
+
+_directories = weakref.WeakKeyDictionary()
+_directories_lock = threading.Lock()
+
+
+def get_directory(db):
+    """Danh bạ nhân viên dùng chung trong process cho một instance Database"""
+    with _directories_lock:
+        directory = _directories.get(db)
+        if directory is None:
+            directory = EmployeeDirectory(db)
+            _directories[db] = directory
+            db.register_cache('Employees', directory)
+        return directory
+
+
+class EmployeeDirectory:
+    """
+    Danh bạ nhân viên trong bộ nhớ
+    - Nhân viên active theo id, index theo phòng ban và danh sách sắp xếp theo (name, id)
+    - Tập mã của mọi nhân viên (kể cả đã xóa mềm) cho employee_exists
+    Ghi qua EmployeeManager cập nhật trực tiếp (write-through); thay đổi từ
+    process khác được phát hiện qua PRAGMA data_version và nạp lại toàn bộ.
+    Ghi vào Employees qua chính instance Database này nhưng ngoài EmployeeManager
+    không đổi data_version: bulk_insert/bulk_upsert và restore_database tự xóa
+    danh bạ (Database.register_cache), ghi từng hàng phải gọi invalidate()
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._data_version = None
+        self._by_id = {}
+        self._ids = set()
+        self._by_department = {}
+        self._names = []
+
+    def _load(self):
+        """Nạp lại toàn bộ từ bảng Employees"""
+        data_version = self.db.get_data_version()
+        rows = self.db.query(f"SELECT {', '.join(DIRECTORY_COLUMNS)} FROM Employees").fetchall()
+
+        self._by_id = {}
+        self._ids = set()
+        self._by_department = {}
+        for row in rows:
+            self._ids.add(row[_ID])
+            if row[_STATUS] != 'Deleted':
+                self._by_id[row[_ID]] = tuple(row)
+                self._by_department.setdefault(row[_DEPARTMENT], set()).add(row[_ID])
+        self._names = sorted((row[_NAME], row[_ID]) for row in self._by_id.values())
+
+        self._data_version = data_version
+        self._loaded = True
+
+    def _ensure_fresh(self):
+        """Nạp lần đầu, hoặc nạp lại khi process khác đã commit thay đổi"""
+        if not self._loaded:
+            self._load()
+            return
+
+        # Không chờ khi kết nối ghi đang bận: dùng dữ liệu hiện có
+        data_version = self.db.get_data_version(blocking=False)
+        if data_version is not None and data_version != self._data_version:
+            self._load()
+
+    def invalidate(self):
+        """Bỏ dữ liệu hiện có, lần đọc sau nạp lại"""
+        with self._lock:
+            self._loaded = False
+
+    # Đọc
+
+    def exists(self, employee_id):
+        """Mã nhân viên đã tồn tại (kể cả đã xóa mềm)"""
+        with self._lock:
+            self._ensure_fresh()
+            return employee_id in self._ids
+
+    def ids(self):
+        """Tập mã của mọi nhân viên (bản sao, kể cả đã xóa mềm)"""
+        with self._lock:
+            self._ensure_fresh()
+            return set(self._ids)
+
+    def get(self, employee_id):
+        """Nhân viên active theo mã (tuple theo DIRECTORY_COLUMNS), None nếu không có"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._by_id.get(employee_id)
+
+    def departments(self):
+        """Các phòng ban có nhân viên active, sắp xếp theo tên"""
+        with self._lock:
+            self._ensure_fresh()
+            return sorted(dept for dept, ids in self._by_department.items() if dept is not None and ids)
+
+    def by_department(self, department):
+        """Nhân viên active của phòng ban, sắp xếp theo (name, id)"""
+        with self._lock:
+            self._ensure_fresh()
+            records = [self._by_id[emp_id] for emp_id in self._by_department.get(department, ())]
+        records.sort(key=lambda record: (record[_NAME], record[_ID]))
+        return records
+
+    def all(self, after=None, limit=None):
+        """
+        Nhân viên active sắp xếp theo (name, id)
+        Args:
+            after: Chỉ lấy sau khóa (name, id) này (giống next_key của select_page)
+            limit: Số bản ghi tối đa
+        """
+        with self._lock:
+            self._ensure_fresh()
+            start = bisect.bisect_right(self._names, tuple(after)) if after is not None else 0
+            end = len(self._names) if limit is None else min(len(self._names), start + limit)
+            return [self._by_id[emp_id] for _, emp_id in self._names[start:end]]
+
+    # Ghi (gọi sau khi transaction đã commit)
+
+    def put(self, record):
+        """
+        Thêm/cập nhật một nhân viên
+        Args:
+            record: Dictionary có các cột trong DIRECTORY_COLUMNS (thiếu cột dùng giá trị cũ)
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+
+            emp_id = record['id']
+            previous = self._by_id.get(emp_id)
+            if previous is None and emp_id in self._ids and 'status' not in record:
+                # Cập nhật nhân viên đã xóa mềm: vẫn không active
+                return
+            merged = tuple(
+                record[column] if column in record else (previous[i] if previous else None)
+                for i, column in enumerate(DIRECTORY_COLUMNS)
+            )
+
+            if (previous is not None and merged[_STATUS] != 'Deleted'
+                    and merged[_NAME] == previous[_NAME] and merged[_DEPARTMENT] == previous[_DEPARTMENT]):
+                # Không đổi tên/phòng ban (vd: chỉ đổi lương): giữ nguyên các index
+                self._by_id[emp_id] = merged
+                return
+
+            self._discard(emp_id)
+            self._ids.add(emp_id)
+            if merged[_STATUS] != 'Deleted':
+                self._by_id[emp_id] = merged
+                self._by_department.setdefault(merged[_DEPARTMENT], set()).add(emp_id)
+                bisect.insort(self._names, (merged[_NAME], emp_id))
+
+    def remove(self, employee_id):
+        """Bỏ nhân viên khỏi danh sách active (xóa mềm; mã vẫn được giữ)"""
+        with self._lock:
+            if self._loaded:
+                self._discard(employee_id)
+
+    def _discard(self, employee_id):
+        previous = self._by_id.pop(employee_id, None)
+        if previous is None:
+            return
+
+        ids = self._by_department.get(previous[_DEPARTMENT])
+        if ids is not None:
+            ids.discard(employee_id)
+            if not ids:
+                del self._by_department[previous[_DEPARTMENT]]
+
+        key = (previous[_NAME], employee_id)
+        index = bisect.bisect_left(self._names, key)
+        if index < len(self._names) and self._names[index] == key:
+            del self._names[index]
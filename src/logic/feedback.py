@@ -1,6 +1,8 @@
 from src.db.database import get_db
 import datetime
-import json
+
+# Các cột tìm kiếm (cũng là các cột của bảng FTS tương ứng)
+SEARCH_COLUMNS = ('employee_id', 'content', 'subject', 'response')
 
 
 class FeedbackManager:
@@ -55,8 +57,7 @@ class FeedbackManager:
             self.db.begin_transaction()
 
             # Tạo feedback_id
-            count = self.db.get_table_count('Feedbacks')
-            feedback_id = f"FB{count + 1:06d}"
+            feedback_id = self.db.next_id('FB')
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -77,12 +78,12 @@ class FeedbackManager:
             self.db.insert_record('Feedbacks', feedback_data)
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='ADD_FEEDBACK',
                 table_name='Feedbacks',
                 record_id=feedback_id,
-                new_values=json.dumps(feedback_data, default=str)
+                new_values=feedback_data
             )
 
             self.db.commit()
@@ -100,7 +101,7 @@ class FeedbackManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_feedback_by_id(feedback_id)
+            old_data = self.db.get_record('Feedbacks', 'feedback_id = ?', [feedback_id])
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -120,8 +121,7 @@ class FeedbackManager:
             )
 
             # Thêm vào bảng AdminResponses để tương thích
-            response_count = self.db.get_table_count('AdminResponses')
-            response_id = f"RES{response_count + 1:06d}"
+            response_id = self.db.next_id('RES')
 
             admin_response_data = {
                 'response_id': response_id,
@@ -133,13 +133,13 @@ class FeedbackManager:
             self.db.insert_record('AdminResponses', admin_response_data)
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='ADD_RESPONSE',
                 table_name='Feedbacks',
                 record_id=feedback_id,
-                old_values=json.dumps(old_data, default=str) if old_data else None,
-                new_values=json.dumps(feedback_update, default=str)
+                old_values=old_data,
+                new_values=feedback_update
             )
 
             self.db.commit()
@@ -158,7 +158,7 @@ class FeedbackManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_feedback_by_id(feedback_id)
+            old_data = self.db.get_record('Feedbacks', 'feedback_id = ?', [feedback_id])
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -176,13 +176,13 @@ class FeedbackManager:
             )
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='UPDATE_FEEDBACK_STATUS',
                 table_name='Feedbacks',
                 record_id=feedback_id,
-                old_values=json.dumps(old_data, default=str) if old_data else None,
-                new_values=json.dumps(update_data, default=str)
+                old_values=old_data,
+                new_values=update_data
             )
 
             self.db.commit()
@@ -213,6 +213,38 @@ class FeedbackManager:
         except Exception as e:
             raise Exception(f"Không thể lấy danh sách phản hồi: {str(e)}")
 
+    def get_all_feedbacks_with_responses_page(self, after=None, page_size=100):
+        """Lấy một trang phản hồi kèm trả lời (keyset pagination)"""
+        try:
+            return self.db.select_page(
+                'Feedbacks',
+                columns="feedback_id, employee_id, content, COALESCE(response, 'Chưa có trả lời') as response",
+                order_by="created_date DESC, id DESC",
+                after=after,
+                page_size=page_size
+            )
+        except Exception as e:
+            raise Exception(f"Không thể lấy danh sách phản hồi: {str(e)}")
+
+    def get_all_feedbacks_extended_page(self, after=None, page_size=100):
+        """
+        Lấy một trang phản hồi với thông tin mở rộng (keyset pagination)
+        Args:
+            after: next_key của trang trước, None để lấy trang đầu
+        Returns:
+            Dictionary {'rows': [...], 'next_key': ...} (xem Database.select_page)
+        """
+        try:
+            return self.db.select_page(
+                'Feedbacks',
+                columns="id, feedback_id, employee_id, category, priority, subject, content, status, is_anonymous, created_date, updated_date, handler, response, response_date",
+                order_by="created_date DESC, id DESC",
+                after=after,
+                page_size=page_size
+            )
+        except Exception as e:
+            raise Exception(f"Không thể lấy danh sách phản hồi: {str(e)}")
+
     def get_feedbacks_by_status(self, status):
         """Lấy phản hồi theo trạng thái"""
         try:
@@ -258,17 +290,36 @@ class FeedbackManager:
             return self.get_all_feedbacks_extended()
 
         try:
-            search_pattern = f"%{search_term.strip()}%"
-            return self.db.select_records(
+            # Xếp theo mức độ liên quan (FTS), LIKE nếu không có FTS
+            return self.db.search_records(
                 'Feedbacks',
+                search_term,
+                like_columns=SEARCH_COLUMNS,
                 columns="id, feedback_id, employee_id, category, priority, subject, content, status, is_anonymous, created_date, updated_date, handler, response, response_date",
-                condition="employee_id LIKE ? OR content LIKE ? OR subject LIKE ? OR response LIKE ?",
-                params=[search_pattern, search_pattern, search_pattern, search_pattern],
                 order_by="created_date DESC"
             )
         except Exception as e:
             raise Exception(f"Lỗi tìm kiếm phản hồi: {str(e)}")
 
+    def search_feedbacks_page(self, search_term, after=None, page_size=100):
+        """Tìm kiếm phản hồi theo từng trang (giống search_feedbacks)"""
+        if not search_term or not search_term.strip():
+            return self.get_all_feedbacks_extended_page(after, page_size)
+
+        try:
+            search, params = self.db.search_condition('Feedbacks', search_term, SEARCH_COLUMNS)
+            return self.db.select_page(
+                'Feedbacks',
+                columns="id, feedback_id, employee_id, category, priority, subject, content, status, is_anonymous, created_date, updated_date, handler, response, response_date",
+                condition=search,
+                params=params,
+                order_by="created_date DESC, id DESC",
+                after=after,
+                page_size=page_size
+            )
+        except Exception as e:
+            raise Exception(f"Lỗi tìm kiếm phản hồi: {str(e)}")
+
     def get_feedback_by_id(self, feedback_id):
         """Lấy phản hồi theo ID"""
         try:
@@ -330,11 +381,13 @@ class FeedbackManager:
             stats['by_priority'] = dict(priority_stats)
 
             # Phản hồi mới trong tháng
-            current_month = datetime.datetime.now().strftime("%Y-%m")
+            # So sánh theo khoảng để dùng được index (LIKE 'YYYY-MM%' không dùng index)
+            month_start = datetime.date.today().replace(day=1)
+            next_month = (month_start + datetime.timedelta(days=32)).replace(day=1)
             stats['new_this_month'] = self.db.get_table_count(
                 'Feedbacks',
-                'created_date LIKE ?',
-                [f"{current_month}%"]
+                'created_date >= ? AND created_date < ?',
+                [month_start.isoformat(), next_month.isoformat()]
             )
 
             # Tỷ lệ phản hồi đã xử lý
@@ -357,7 +410,7 @@ class FeedbackManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_feedback_by_id(feedback_id)
+            old_data = self.db.get_record('Feedbacks', 'feedback_id = ?', [feedback_id])
 
             # Xóa phản hồi admin trước
             self.db.delete_record('AdminResponses', 'feedback_id = ?', [feedback_id])
@@ -366,12 +419,12 @@ class FeedbackManager:
             self.db.delete_record('Feedbacks', 'feedback_id = ?', [feedback_id])
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='DELETE_FEEDBACK',
                 table_name='Feedbacks',
                 record_id=feedback_id,
-                old_values=json.dumps(old_data, default=str) if old_data else None
+                old_values=old_data
             )
 
             self.db.commit()
@@ -1,7 +1,7 @@
 from src.db.database import get_db
+from src.db.audit import encode_payload
 import datetime
 import calendar
-import json
 
 
 class SalaryManager:
@@ -105,51 +105,21 @@ class SalaryManager:
             self.db.begin_transaction()
 
             # Tạo payroll_id
-            count = self.db.get_table_count('Payrolls')
-            payroll_id = f"PAY{count + 1:06d}"
+            payroll_id = self.db.next_id('PAY')
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            # Sử dụng phương thức insert_record mới
-            payroll_record = {
-                'payroll_id': payroll_id,
-                'employee_id': payroll_data['employee_id'],
-                'month': payroll_data['month'],
-                'year': payroll_data['year'],
-                'basic_salary': payroll_data['basic_salary'],
-                'work_days': payroll_data['work_days'],
-                'actual_work_days': payroll_data['actual_work_days'],
-                'absent_days': payroll_data['absent_days'],
-                'overtime_hours': payroll_data['overtime_hours'],
-                'overtime_pay': payroll_data['overtime_pay'],
-                'allowances': payroll_data['allowances'],
-                'lunch_allowance': payroll_data['lunch_allowance'],
-                'transport_allowance': payroll_data['transport_allowance'],
-                'performance_bonus': payroll_data['performance_bonus'],
-                'other_bonus': payroll_data['other_bonus'],
-                'gross_salary': payroll_data['gross_salary'],
-                'social_insurance': payroll_data['social_insurance'],
-                'health_insurance': payroll_data['health_insurance'],
-                'unemployment_insurance': payroll_data['unemployment_insurance'],
-                'tax_deduction': payroll_data['tax_deduction'],
-                'other_deductions': payroll_data['other_deductions'],
-                'total_deductions': payroll_data['total_deductions'],
-                'net_salary': payroll_data['net_salary'],
-                'status': 'Draft',
-                'notes': notes,
-                'created_date': current_time,
-                'updated_date': current_time
-            }
+            payroll_record = self._build_payroll_record(payroll_data, payroll_id, notes, current_time)
 
             self.db.insert_record('Payrolls', payroll_record)
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='SAVE_PAYROLL',
                 table_name='Payrolls',
                 record_id=payroll_id,
-                new_values=json.dumps(payroll_record, default=str)
+                new_values=payroll_record
             )
 
             self.db.commit()
@@ -158,6 +128,80 @@ class SalaryManager:
             self.db.rollback()
             raise Exception(f"Không thể lưu bảng lương: {str(e)}")
 
+    def _build_payroll_record(self, payroll_data, payroll_id, notes, current_time):
+        """Tạo bản ghi Payrolls từ kết quả calculate_payroll"""
+        return {
+            'payroll_id': payroll_id,
+            'employee_id': payroll_data['employee_id'],
+            'month': payroll_data['month'],
+            'year': payroll_data['year'],
+            'basic_salary': payroll_data['basic_salary'],
+            'work_days': payroll_data['work_days'],
+            'actual_work_days': payroll_data['actual_work_days'],
+            'absent_days': payroll_data['absent_days'],
+            'overtime_hours': payroll_data['overtime_hours'],
+            'overtime_pay': payroll_data['overtime_pay'],
+            'allowances': payroll_data['allowances'],
+            'lunch_allowance': payroll_data['lunch_allowance'],
+            'transport_allowance': payroll_data['transport_allowance'],
+            'performance_bonus': payroll_data['performance_bonus'],
+            'other_bonus': payroll_data['other_bonus'],
+            'gross_salary': payroll_data['gross_salary'],
+            'social_insurance': payroll_data['social_insurance'],
+            'health_insurance': payroll_data['health_insurance'],
+            'unemployment_insurance': payroll_data['unemployment_insurance'],
+            'tax_deduction': payroll_data['tax_deduction'],
+            'other_deductions': payroll_data['other_deductions'],
+            'total_deductions': payroll_data['total_deductions'],
+            'net_salary': payroll_data['net_salary'],
+            'status': 'Draft',
+            'notes': notes,
+            'created_date': current_time,
+            'updated_date': current_time
+        }
+
+    def save_payrolls(self, payroll_list, notes=None):
+        """
+        Lưu nhiều bảng lương cùng lúc (chạy lương cả tháng)
+        Args:
+            payroll_list: Danh sách kết quả calculate_payroll
+            notes: Ghi chú chung
+        Returns:
+            Dictionary {'saved': [payroll_id], 'failed': [{'index', 'row', 'error'}]}
+        """
+        try:
+            self.db.begin_transaction()
+
+            payroll_ids = self.db.sequences.next_ids('PAY', len(payroll_list))
+            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            records = [
+                self._build_payroll_record(payroll_data, payroll_id, notes, current_time)
+                for payroll_data, payroll_id in zip(payroll_list, payroll_ids)
+            ]
+
+            result = self.db.bulk_insert('Payrolls', records)
+            failed_indexes = {item['index'] for item in result['failed']}
+            saved = [record for i, record in enumerate(records) if i not in failed_indexes]
+
+            # Log hành động
+            self.db.log_actions([
+                {
+                    'user_id': 'system',
+                    'action': 'SAVE_PAYROLL',
+                    'table_name': 'Payrolls',
+                    'record_id': record['payroll_id'],
+                    'new_values': encode_payload(record)
+                }
+                for record in saved
+            ])
+
+            self.db.commit()
+            return {'saved': [record['payroll_id'] for record in saved], 'failed': result['failed']}
+        except Exception as e:
+            self.db.rollback()
+            raise Exception(f"Không thể lưu bảng lương: {str(e)}")
+
     def get_payroll_by_employee(self, employee_id, month=None, year=None):
         """Lấy bảng lương theo nhân viên"""
         try:
@@ -219,11 +263,13 @@ class SalaryManager:
             condition_str = " AND ".join(conditions) if conditions else None
 
             # Tổng số nhân viên có lương
-            stats['total_employees'] = self.db.get_table_count(
+            employee_result = self.db.select_records(
                 'Payrolls',
-                'DISTINCT employee_id' + (' WHERE ' + condition_str if condition_str else ''),
-                params
+                columns="COUNT(DISTINCT employee_id)",
+                condition=condition_str,
+                params=params
             )
+            stats['total_employees'] = employee_result[0][0] if employee_result else 0
 
             # Tổng chi lương
             salary_result = self.db.select_records(
@@ -360,12 +406,12 @@ class SalaryManager:
             self.db.insert_record('SalaryComponents', component_data)
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='ADD_SALARY_COMPONENT',
                 table_name='SalaryComponents',
                 record_id=employee_id,
-                new_values=json.dumps(component_data, default=str)
+                new_values=component_data
             )
 
             self.db.commit()
@@ -403,7 +449,7 @@ class SalaryManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_payroll_by_id(payroll_id)
+            old_data = self.db.get_record('Payrolls', 'payroll_id = ?', [payroll_id])
 
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -420,13 +466,13 @@ class SalaryManager:
             )
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='UPDATE_PAYROLL_STATUS',
                 table_name='Payrolls',
                 record_id=payroll_id,
-                old_values=json.dumps(old_data, default=str) if old_data else None,
-                new_values=json.dumps(update_data, default=str)
+                old_values=old_data,
+                new_values=update_data
             )
 
             self.db.commit()
@@ -453,17 +499,17 @@ class SalaryManager:
             self.db.begin_transaction()
 
             # Lấy dữ liệu cũ để log
-            old_data = self.get_payroll_by_id(payroll_id)
+            old_data = self.db.get_record('Payrolls', 'payroll_id = ?', [payroll_id])
 
             self.db.delete_record('Payrolls', 'payroll_id = ?', [payroll_id])
 
             # Log hành động
-            self.db.log_action(
+            self.db.log_change(
                 user_id='system',
                 action='DELETE_PAYROLL',
                 table_name='Payrolls',
                 record_id=payroll_id,
-                old_values=json.dumps(old_data, default=str) if old_data else None
+                old_values=old_data
             )
 
             self.db.commit()
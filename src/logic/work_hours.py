@@ -0,0 +1,186 @@
+import datetime
+import functools
+import re
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là tùy chọn: không có thì tính bằng Python thuần
+    np = None
+
+# Giờ làm chuẩn mỗi ngày và giờ bắt đầu ca (phút tính từ 00:00)
+STANDARD_HOURS = 8
+STANDARD_START_MINUTES = 8 * 60
+MINUTES_PER_DAY = 24 * 60
+
+# Ngày chấm công được lưu dạng số ngày tính từ 1970-01-01 (migration 8)
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Giống định dạng giờ của AttendanceManager.validate_attendance_data
+_TIME = re.compile(r'^([01]?[0-9]|2[0-3]):([0-5][0-9])$')
+# Giống strptime("%Y-%m-%d") của validate_attendance_data (chấp nhận "2024-1-5")
+_DATE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_time(text):
+    """
+    Đổi "HH:MM" (hoặc "H:MM") thành số phút tính từ 00:00
+    Returns:
+        Số phút, -1 nếu sai định dạng
+    """
+    match = _TIME.match(text) if isinstance(text, str) else None
+    if not match:
+        return -1
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(text):
+    """
+    Đổi "YYYY-MM-DD" thành số ngày tính từ 1970-01-01
+    Returns:
+        Số ngày, None nếu sai định dạng
+    """
+    match = _DATE.match(text) if isinstance(text, str) else None
+    if not match:
+        return None
+    try:
+        return datetime.date(*(int(part) for part in match.groups())).toordinal() - EPOCH_ORDINAL
+    except ValueError:
+        return None
+
+
+def format_date(day):
+    """Số ngày tính từ 1970-01-01 thành 'YYYY-MM-DD'"""
+    return datetime.date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+
+def format_time(minutes):
+    """Số phút (có thể vượt quá một ngày) thành "HH:MM" trong ngày"""
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+def attendance_status(minutes_in, work_hours):
+    """Trạng thái chấm công theo giờ vào (phút tính từ 00:00) và giờ làm"""
+    if minutes_in > STANDARD_START_MINUTES:
+        return "Late"  # Đi muộn
+    elif work_hours < 4:
+        return "Half Day"  # Nửa ngày
+    elif work_hours < STANDARD_HOURS:
+        return "Early Leave"  # Về sớm
+    else:
+        return "Present"  # Đúng giờ
+
+
+def split_hours(total_minutes):
+    """Tách tổng số phút làm việc thành (giờ làm, giờ làm thêm)"""
+    total_hours = total_minutes / 60
+    work_hours = min(total_hours, STANDARD_HOURS)
+    overtime_hours = max(0, total_hours - STANDARD_HOURS)
+    return round(work_hours, 2), round(overtime_hours, 2)
+
+
+def calculate_work_hours(time_in, time_out):
+    """
+    Giờ làm và giờ làm thêm của một ca (ca qua đêm khi giờ ra <= giờ vào)
+    Returns:
+        (giờ làm, giờ làm thêm), (0, 0) nếu giờ sai định dạng
+    """
+    minutes_in = parse_time(time_in)
+    minutes_out = parse_time(time_out)
+    if minutes_in < 0 or minutes_out < 0:
+        return 0, 0
+    if minutes_out <= minutes_in:
+        minutes_out += MINUTES_PER_DAY
+    return split_hours(minutes_out - minutes_in)
+
+
+def widen_minutes(minute_in, minute_out, other_in, other_out):
+    """
+    Khoảng bao cả hai ca theo số phút tính từ 00:00: giờ vào sớm hơn, giờ ra
+    muộn hơn (ca qua đêm kết thúc vào ngày hôm sau), tối đa 24 giờ. Ca có giờ
+    âm (sai định dạng) bị bỏ qua
+    Returns:
+        (phút vào, phút ra) trong ngày
+    """
+    spans = []
+    for start, end in ((minute_in, minute_out), (other_in, other_out)):
+        if start >= 0 and end >= 0:
+            spans.append((start, end if end > start else end + MINUTES_PER_DAY))
+    if not spans:
+        return minute_in, minute_out
+
+    start = min(span[0] for span in spans)
+    end = min(max(span[1] for span in spans), start + MINUTES_PER_DAY)
+    return start, end % MINUTES_PER_DAY
+
+
+def widen_shift(time_in, time_out, other_in, other_out):
+    """
+    Như widen_minutes với giờ dạng "HH:MM"
+    Returns:
+        (giờ vào, giờ ra) dạng "HH:MM"
+    """
+    start, end = widen_minutes(parse_time(time_in), parse_time(time_out), parse_time(other_in), parse_time(other_out))
+    if start < 0 or end < 0:
+        return time_in, time_out
+    return format_time(start), format_time(end)
+
+
+def split_hours_columns(total_minutes, minutes_in):
+    """
+    Giờ làm, giờ làm thêm và trạng thái cho cả cột ca làm việc
+    Args:
+        total_minutes: Tổng số phút làm việc của từng ca (-1: ca không hợp lệ)
+        minutes_in: Giờ vào (phút tính từ 00:00) của từng ca
+    Returns:
+        (giờ làm, giờ làm thêm, trạng thái) - mảng NumPy (list nếu không có NumPy);
+        ca không hợp lệ có giờ làm 0, giờ vào sai định dạng (-1) có trạng thái "Present"
+    """
+    if np is None:
+        work, overtime, statuses = [], [], []
+        for minutes, start in zip(total_minutes, minutes_in):
+            work_hours, overtime_hours = split_hours(minutes) if minutes >= 0 else (0, 0)
+            status = attendance_status(start, work_hours) if start >= 0 else "Present"
+            work.append(work_hours)
+            overtime.append(overtime_hours)
+            statuses.append(status)
+        return work, overtime, statuses
+
+    total_minutes = np.asarray(total_minutes)
+    minutes_in = np.asarray(minutes_in)
+    valid = total_minutes >= 0
+
+    total_hours = np.where(valid, total_minutes, 0) / 60
+    work = np.round(np.minimum(total_hours, STANDARD_HOURS), 2)
+    overtime = np.round(np.maximum(total_hours - STANDARD_HOURS, 0), 2)
+    statuses = np.select(
+        [minutes_in < 0, minutes_in > STANDARD_START_MINUTES, work < 4, work < STANDARD_HOURS],
+        ["Present", "Late", "Half Day", "Early Leave"],
+        default="Present"
+    ).astype(object)
+    return work, overtime, statuses
+
+
+def calculate_attendance_minutes(minutes_in, minutes_out):
+    """
+    Tính giờ làm, giờ làm thêm và trạng thái cho cả cột giờ vào/giờ ra
+    Args:
+        minutes_in, minutes_out: Số phút tính từ 00:00 (-1: sai định dạng), cùng độ dài
+    Returns:
+        (giờ làm, giờ làm thêm, trạng thái) - xem split_hours_columns;
+        ca qua đêm (giờ ra <= giờ vào) được cộng thêm một ngày
+    """
+    if np is None:
+        total_minutes = [
+            -1 if start < 0 or end < 0 else (end - start if end > start else end + MINUTES_PER_DAY - start)
+            for start, end in zip(minutes_in, minutes_out)
+        ]
+        return split_hours_columns(total_minutes, minutes_in)
+
+    minutes_in = np.asarray(minutes_in)
+    minutes_out = np.asarray(minutes_out)
+    total_minutes = minutes_out - minutes_in
+    total_minutes = np.where(total_minutes <= 0, total_minutes + MINUTES_PER_DAY, total_minutes)
+    total_minutes = np.where((minutes_in < 0) | (minutes_out < 0), -1, total_minutes)
+    return split_hours_columns(total_minutes, minutes_in)
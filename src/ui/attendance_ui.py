@@ -1,7 +1,8 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 from src.logic.attendance import AttendanceManager
+from src.logic.work_hours import calculate_work_hours
 
 
 class AttendanceUI:
@@ -11,7 +12,21 @@ class AttendanceUI:
 
         self.setup_styles()
         self.create_layout()
+        self.load_when_ready()
+
+    def load_when_ready(self):
+        """
+        Tải danh sách và thống kê chấm công; khi migration nền còn đang dựng lại
+        bảng chấm công thì kiểm tra lại sau thay vì chờ (không treo giao diện)
+        """
+        if not self.stats_label.winfo_exists():
+            return
+        if self.attendance_mgr.schema_upgrading():
+            self.stats_label.config(text="⏳ Đang nâng cấp dữ liệu chấm công, vui lòng chờ...")
+            self.parent.after(1000, self.load_when_ready)
+            return
         self.load_attendance()
+        self.update_stats()
 
     def setup_styles(self):
         """Cấu hình styles"""
@@ -104,8 +119,6 @@ class AttendanceUI:
                                      font=("Arial", 10))
         self.stats_label.pack()
 
-        self.update_stats()
-
     def create_view_tab(self, parent):
         """Tạo tab xem chấm công"""
         container = ttk.Frame(parent, padding=20)
@@ -131,6 +144,8 @@ class AttendanceUI:
                    command=self.filter_attendance).grid(row=0, column=6, padx=10)
         ttk.Button(filter_frame, text="🔄 Tất cả",
                    command=self.load_attendance).grid(row=0, column=7, padx=5)
+        ttk.Button(filter_frame, text="📥 Nhập máy chấm công",
+                   command=self.import_punches).grid(row=0, column=8, padx=5)
 
         # Attendance list
         list_frame = ttk.LabelFrame(container, text="Danh sách chấm công", padding=10)
@@ -156,6 +171,10 @@ class AttendanceUI:
         v_scrollbar.grid(row=0, column=1, sticky="ns")
         h_scrollbar.grid(row=1, column=0, sticky="ew")
 
+        # Nút tải trang kế tiếp
+        self.load_more_btn = ttk.Button(list_frame, text="⬇️ Tải thêm", command=self.load_more_attendance)
+        self.load_more_btn.grid(row=2, column=0, columnspan=2, pady=(10, 0))
+
         list_frame.grid_rowconfigure(0, weight=1)
         list_frame.grid_columnconfigure(0, weight=1)
 
@@ -167,19 +186,10 @@ class AttendanceUI:
 
     def calculate_work_hours(self, time_in, time_out):
         """Tính tổng giờ làm việc"""
-        try:
-            time_in_obj = datetime.strptime(time_in, "%H:%M")
-            time_out_obj = datetime.strptime(time_out, "%H:%M")
-
-            # Handle case where time_out is next day
-            if time_out_obj < time_in_obj:
-                time_out_obj = time_out_obj.replace(day=time_out_obj.day + 1)
-
-            duration = time_out_obj - time_in_obj
-            hours = duration.total_seconds() / 3600
-            return f"{hours:.1f}h"
-        except:
+        work_hours, overtime_hours = calculate_work_hours(time_in, time_out)
+        if not work_hours and not overtime_hours:
             return "N/A"
+        return f"{work_hours + overtime_hours:.1f}h"
 
     def validate_attendance_input(self):
         """Validate attendance input"""
@@ -234,26 +244,59 @@ class AttendanceUI:
         except Exception as e:
             messagebox.showerror("Lỗi", str(e))
 
+    def import_punches(self):
+        """Nhập dữ liệu quẹt thẻ từ file CSV của máy chấm công"""
+        file_path = filedialog.askopenfilename(
+            title="Chọn file máy chấm công",
+            filetypes=[("CSV", "*.csv"), ("Tất cả", "*.*")]
+        )
+        if not file_path:
+            return
+
+        try:
+            result = self.attendance_mgr.import_punches_csv(file_path)
+            message = f"Thêm mới {result['inserted']}, cập nhật {result['updated']} bản ghi chấm công."
+            if result['rejected']:
+                message += f"\n{result['rejected']} dòng lỗi được ghi vào:\n{result['rejects_path']}"
+                messagebox.showwarning("Nhập máy chấm công", message)
+            else:
+                messagebox.showinfo("Nhập máy chấm công", message)
+            self.load_attendance()
+            self.update_stats()
+        except ValueError as e:
+            messagebox.showerror("Lỗi", str(e))
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể nhập file: {str(e)}")
+
     def load_attendance(self):
-        """Load danh sách chấm công"""
+        """Load trang đầu danh sách chấm công"""
         # Clear existing items
         for item in self.attendance_tree.get_children():
             self.attendance_tree.delete(item)
 
+        self.attendance_next_key = None
+        self.load_more_attendance()
+
+    def load_more_attendance(self):
+        """Load trang kế tiếp của danh sách chấm công"""
         try:
             # Sử dụng phương thức mới để lấy dữ liệu
-            records = self.attendance_mgr.get_attendance_by_date_range(
+            page = self.attendance_mgr.get_attendance_by_date_range_page(
                 start_date="2020-01-01",
-                end_date=datetime.now().strftime("%Y-%m-%d")
+                end_date=datetime.now().strftime("%Y-%m-%d"),
+                after=self.attendance_next_key
             )
 
-            for record in records:
+            for record in page['rows']:
                 # record format: (attendance_id, employee_id, date, time_in, time_out, work_hours, overtime_hours, status, notes)
                 work_hours_display = f"{record[5]:.1f}h" if len(record) > 5 and record[5] else "N/A"
                 self.attendance_tree.insert("", "end", values=(
                     record[0], record[1], record[2], record[3], record[4], work_hours_display
                 ))
 
+            self.attendance_next_key = page['next_key']
+            self.load_more_btn.state(["!disabled"] if page['next_key'] else ["disabled"])
+
         except Exception as e:
             messagebox.showerror("Lỗi", str(e))
 
@@ -262,35 +305,20 @@ class AttendanceUI:
         # Clear existing items
         for item in self.attendance_tree.get_children():
             self.attendance_tree.delete(item)
+        self.load_more_btn.state(["disabled"])
 
         try:
-            conditions = []
-            params = []
-
-            if self.filter_employee.get().strip():
-                conditions.append("employee_id LIKE ?")
-                params.append(f"%{self.filter_employee.get().strip()}%")
-
-            if self.filter_from_date.get().strip():
-                conditions.append("date >= ?")
-                params.append(self.filter_from_date.get().strip())
-
-            if self.filter_to_date.get().strip():
-                conditions.append("date <= ?")
-                params.append(self.filter_to_date.get().strip())
-
-            query = "SELECT * FROM Attendance"
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-            query += " ORDER BY date DESC, time_in DESC"
-
-            self.attendance_mgr.db.execute(query, params)
-            records = self.attendance_mgr.db.fetch_all()
+            records = self.attendance_mgr.search_attendance(
+                employee_filter=self.filter_employee.get().strip(),
+                start_date=self.filter_from_date.get().strip(),
+                end_date=self.filter_to_date.get().strip()
+            )
 
             for record in records:
-                work_hours = self.calculate_work_hours(record[3], record[4])
+                # Dùng giờ làm đã lưu, không tính lại cho từng dòng
+                work_hours_display = f"{record[5]:.1f}h" if record[5] else "N/A"
                 self.attendance_tree.insert("", "end", values=(
-                    record[0], record[1], record[2], record[3], record[4], work_hours
+                    record[0], record[1], record[2], record[3], record[4], work_hours_display
                 ))
 
         except Exception as e:
@@ -137,6 +137,10 @@ class CandidateUI:
         v_scrollbar.grid(row=0, column=1, sticky="ns")
         h_scrollbar.grid(row=1, column=0, sticky="ew")
 
+        # Nút tải trang kế tiếp
+        self.load_more_btn = ttk.Button(parent, text="⬇️ Tải thêm", command=self.load_more_candidates)
+        self.load_more_btn.grid(row=2, column=0, columnspan=2, pady=(10, 0))
+
         parent.grid_rowconfigure(0, weight=1)
         parent.grid_columnconfigure(0, weight=1)
 
@@ -294,16 +298,25 @@ class CandidateUI:
             except Exception as e:
                 messagebox.showerror("Lỗi", f"Không thể xóa ứng viên: {str(e)}")
 
-    def load_candidates(self):
-        """Load danh sách ứng viên"""
+    def load_candidates(self, search_term=None):
+        """Load trang đầu danh sách ứng viên (hoặc kết quả tìm kiếm)"""
         # Clear existing items
         for item in self.candidate_tree.get_children():
             self.candidate_tree.delete(item)
 
+        self.candidate_search_term = search_term
+        self.candidate_next_key = None
+        self.load_more_candidates()
+
+    def load_more_candidates(self):
+        """Load trang kế tiếp của danh sách ứng viên"""
         try:
-            candidates = self.candidate_mgr.get_all_candidates()
+            page = self.candidate_mgr.search_candidates_page(
+                self.candidate_search_term,
+                after=self.candidate_next_key
+            )
 
-            for candidate in candidates:
+            for candidate in page['rows']:
                 # candidate format: (id, candidate_id, name, email, phone, position, experience, education, skills, status, application_date, interview_date, notes)
                 display_values = (
                     candidate[0],  # ID
@@ -316,6 +329,8 @@ class CandidateUI:
                 )
                 self.candidate_tree.insert("", "end", values=display_values)
 
+            self.candidate_next_key = page['next_key']
+            self.load_more_btn.state(["!disabled"] if page['next_key'] else ["disabled"])
         except Exception as e:
             messagebox.showerror("Lỗi", str(e))
 
@@ -323,30 +338,10 @@ class CandidateUI:
         """Tìm kiếm ứng viên"""
         search_term = self.search_entry.get().strip()
 
-        # Clear existing items
-        for item in self.candidate_tree.get_children():
-            self.candidate_tree.delete(item)
-
-        try:
-            candidates = self.candidate_mgr.search_candidates(search_term)
-
-            for candidate in candidates:
-                display_values = (
-                    candidate[0],  # ID
-                    candidate[2],  # Name
-                    candidate[3],  # Email
-                    candidate[5],  # Position
-                    candidate[6] if candidate[6] else 0,  # Experience
-                    candidate[9],  # Status
-                    candidate[10]  # Application date
-                )
-                self.candidate_tree.insert("", "end", values=display_values)
-
-            if not candidates:
-                messagebox.showinfo("Thông báo", "Không tìm thấy ứng viên nào!")
+        self.load_candidates(search_term)
 
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        if not self.candidate_tree.get_children():
+            messagebox.showinfo("Thông báo", "Không tìm thấy ứng viên nào!")
 
 
     def on_candidate_select(self, event):
@@ -1,5 +1,5 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from ..logic.employee import EmployeeManager
 
 
@@ -90,7 +90,8 @@ class EmployeeUI:
             ("➕ Thêm", self.add_employee, "#27ae60"),
             ("✏️ Sửa", self.update_employee, "#f39c12"),
             ("🗑️ Xóa", self.delete_employee, "#e74c3c"),
-            ("🔄 Làm mới", self.clear_entries, "#95a5a6")
+            ("🔄 Làm mới", self.clear_entries, "#95a5a6"),
+            ("📥 Nhập CSV", self.import_employees, "#3498db")
         ]
 
         for i, (text, command, color) in enumerate(buttons):
@@ -120,6 +121,10 @@ class EmployeeUI:
         v_scrollbar.grid(row=0, column=1, sticky="ns")
         h_scrollbar.grid(row=1, column=0, sticky="ew")
 
+        # Nút tải trang kế tiếp
+        self.load_more_btn = ttk.Button(right_panel, text="⬇️ Tải thêm", command=self.load_more_employees)
+        self.load_more_btn.grid(row=2, column=0, columnspan=2, pady=(10, 0))
+
         right_panel.grid_rowconfigure(0, weight=1)
         right_panel.grid_columnconfigure(0, weight=1)
 
@@ -169,21 +174,33 @@ class EmployeeUI:
         self.search_tree.pack(side="left", fill="both", expand=True)
         search_v_scrollbar.pack(side="right", fill="y")
 
+        self.search_more_btn = ttk.Button(search_frame, text="⬇️ Tải thêm", command=self.load_more_search_results)
+        self.search_more_btn.pack(pady=(10, 0))
+        self.search_more_btn.state(["disabled"])
+
     def load_employees(self):
-        """Load danh sách nhân viên"""
+        """Load trang đầu danh sách nhân viên"""
         # Clear existing items
         for item in self.employee_tree.get_children():
             self.employee_tree.delete(item)
 
+        self.employee_next_key = None
+        self.load_more_employees()
+
+    def load_more_employees(self):
+        """Load trang kế tiếp của danh sách nhân viên"""
         try:
-            employees = self.employee_mgr.get_all_employees()
+            page = self.employee_mgr.get_all_employees_page(after=self.employee_next_key)
 
-            for employee in employees:
+            for employee in page['rows']:
                 # Format salary with thousand separators
                 formatted_salary = f"{float(employee[3]):,.0f}"
                 self.employee_tree.insert("", "end", values=(
                     employee[0], employee[1], employee[2], formatted_salary, employee[4]
                 ))
+
+            self.employee_next_key = page['next_key']
+            self.load_more_btn.state(["!disabled"] if page['next_key'] else ["disabled"])
         except Exception as e:
             messagebox.showerror("Lỗi", f"Không thể tải danh sách nhân viên: {str(e)}")
 
@@ -235,6 +252,29 @@ class EmployeeUI:
         except Exception as e:
             messagebox.showerror("Lỗi", str(e))
 
+    def import_employees(self):
+        """Nhập nhân viên hàng loạt từ file CSV"""
+        file_path = filedialog.askopenfilename(
+            title="Chọn file nhân viên",
+            filetypes=[("CSV", "*.csv"), ("Tất cả", "*.*")]
+        )
+        if not file_path:
+            return
+
+        try:
+            result = self.employee_mgr.import_employees_csv(file_path)
+            message = f"Đã nhập {result['imported']} nhân viên."
+            if result['rejected']:
+                message += f"\n{result['rejected']} dòng lỗi được ghi vào:\n{result['rejects_path']}"
+                messagebox.showwarning("Nhập nhân viên", message)
+            else:
+                messagebox.showinfo("Nhập nhân viên", message)
+            self.load_employees()
+        except ValueError as e:
+            messagebox.showerror("Lỗi validation", str(e))
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể nhập file: {str(e)}")
+
     def update_employee(self):
         """Cập nhật thông tin nhân viên"""
         if not self.validate_input():
@@ -284,19 +324,26 @@ class EmployeeUI:
         for item in self.search_tree.get_children():
             self.search_tree.delete(item)
 
-        try:
-            results = self.employee_mgr.search_employee(search_term)
+        self.search_term = search_term
+        self.search_next_key = None
+        self.load_more_search_results()
+
+        if not self.search_tree.get_children():
+            messagebox.showinfo("Thông báo", "Không tìm thấy nhân viên nào!")
 
-            if not results:
-                messagebox.showinfo("Thông báo", "Không tìm thấy nhân viên nào!")
-                return
+    def load_more_search_results(self):
+        """Load trang kế tiếp của kết quả tìm kiếm"""
+        try:
+            page = self.employee_mgr.search_employee_page(self.search_term, after=self.search_next_key)
 
-            for employee in results:
+            for employee in page['rows']:
                 formatted_salary = f"{float(employee[3]):,.0f}"
                 self.search_tree.insert("", "end", values=(
                     employee[0], employee[1], employee[2], formatted_salary, employee[4]
                 ))
 
+            self.search_next_key = page['next_key']
+            self.search_more_btn.state(["!disabled"] if page['next_key'] else ["disabled"])
         except Exception as e:
             messagebox.showerror("Lỗi", str(e))
 
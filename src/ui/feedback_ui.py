@@ -200,6 +200,10 @@ class FeedbackUI:
         v_scrollbar.grid(row=0, column=1, sticky="ns")
         h_scrollbar.grid(row=1, column=0, sticky="ew")
 
+        # Nút tải trang kế tiếp
+        self.load_more_btn = ttk.Button(list_frame, text="⬇️ Tải thêm", command=self.load_more_feedbacks)
+        self.load_more_btn.grid(row=2, column=0, columnspan=2, pady=(10, 0))
+
         list_frame.grid_rowconfigure(0, weight=1)
         list_frame.grid_columnconfigure(0, weight=1)
 
@@ -345,15 +349,20 @@ class FeedbackUI:
             messagebox.showerror("Lỗi", str(e))
 
     def load_feedbacks(self):
-        """Load danh sách phản hồi"""
+        """Load trang đầu danh sách phản hồi"""
         # Clear existing items
         for item in self.feedback_tree.get_children():
             self.feedback_tree.delete(item)
 
+        self.feedback_next_key = None
+        self.load_more_feedbacks()
+
+    def load_more_feedbacks(self):
+        """Load trang kế tiếp của danh sách phản hồi"""
         try:
-            feedbacks = self.feedback_mgr.get_all_feedbacks_extended()
+            page = self.feedback_mgr.get_all_feedbacks_extended_page(after=self.feedback_next_key)
 
-            for feedback in feedbacks:
+            for feedback in page['rows']:
                 # feedback format: (id, feedback_id, employee_id, category, priority, subject, content, status, is_anonymous, created_date, updated_date, handler, response, response_date)
                 display_values = (
                     feedback[0],  # ID
@@ -366,6 +375,8 @@ class FeedbackUI:
                 )
                 self.feedback_tree.insert("", "end", values=display_values)
 
+            self.feedback_next_key = page['next_key']
+            self.load_more_btn.state(["!disabled"] if page['next_key'] else ["disabled"])
         except Exception as e:
             messagebox.showerror("Lỗi", str(e))
 
@@ -380,8 +391,7 @@ class FeedbackUI:
                 ORDER BY created_date DESC 
                 LIMIT 5
             """
-            self.feedback_mgr.db.execute(query)
-            recent = self.feedback_mgr.db.fetch_all()
+            recent = self.feedback_mgr.db.query(query).fetchall()
 
             for item in recent:
                 display_text = f"{item[0]} - {item[1][:50]}..." if len(item[1]) > 50 else f"{item[0]} - {item[1]}"
@@ -426,8 +436,7 @@ class FeedbackUI:
                 query += " WHERE " + " AND ".join(conditions)
             query += " ORDER BY created_date DESC"
 
-            self.feedback_mgr.db.execute(query, params)
-            feedbacks = self.feedback_mgr.db.fetch_all()
+            feedbacks = self.feedback_mgr.db.query(query, params).fetchall()
 
             for feedback in feedbacks:
                 self.feedback_tree.insert("", "end", values=feedback)
@@ -444,8 +453,8 @@ class FeedbackUI:
 
             try:
                 # Load feedback detail
-                self.feedback_mgr.db.execute("SELECT content FROM Feedbacks WHERE id = ?", (feedback_id,))
-                result = self.feedback_mgr.db.fetch_one()
+                with self.feedback_mgr.db.query("SELECT content FROM Feedbacks WHERE id = ?", (feedback_id,)) as query:
+                    result = query.fetchone()
 
                 if result:
                     self.feedback_detail.config(state="normal")
@@ -455,8 +464,8 @@ class FeedbackUI:
 
                 # Load existing response if any
                 try:
-                    self.feedback_mgr.db.execute("SELECT response FROM Feedbacks WHERE id = ?", (feedback_id,))
-                    response_result = self.feedback_mgr.db.fetch_one()
+                    with self.feedback_mgr.db.query("SELECT response FROM Feedbacks WHERE id = ?", (feedback_id,)) as query:
+                        response_result = query.fetchone()
                     if response_result and response_result[0]:
                         self.response_text.delete("1.0", tk.END)
                         self.response_text.insert("1.0", response_result[0])
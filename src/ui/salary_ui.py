@@ -195,6 +195,11 @@ class SalaryUI:
             elif field_name in ["tax_deduction"]:
                 entry.insert(0, "10")  # 10% thuế
 
+        # Đổi tháng/năm ở bộ lọc thì điền lại dữ liệu chấm công của nhân viên đã tải
+        self.prefill_employee_id = None
+        self.month_var.trace_add('write', lambda *args: self.refresh_attendance_info())
+        self.year_var.trace_add('write', lambda *args: self.refresh_attendance_info())
+
         # Calculation buttons
         btn_frame = ttk.Frame(left_panel)
         btn_frame.grid(row=len(fields) + 1, column=0, columnspan=2, pady=20)
@@ -861,6 +866,10 @@ class SalaryUI:
                 self.payroll_entries['basic_salary'].delete(0, tk.END)
                 self.payroll_entries['basic_salary'].insert(0, str(basic_salary))
 
+                self.prefill_employee_id = employee_id
+                if not self.fill_attendance_info(employee_id):
+                    return
+
                 messagebox.showinfo("Thành công", f"Đã tải thông tin nhân viên {employee_id}")
             else:
                 messagebox.showwarning("Cảnh báo", "Không tìm thấy thông tin nhân viên!")
@@ -868,6 +877,41 @@ class SalaryUI:
         except Exception as e:
             messagebox.showerror("Lỗi", f"Không thể tải thông tin nhân viên: {str(e)}")
 
+    def fill_attendance_info(self, employee_id):
+        """
+        Điền sẵn ngày nghỉ và giờ làm thêm từ tổng hợp chấm công của tháng/năm đang chọn
+        (không có dữ liệu chấm công thì trở về giá trị mặc định 0)
+        Returns:
+            False nếu số ngày làm việc không đúng định dạng số
+        """
+        try:
+            work_days = int(self.payroll_entries['work_days'].get() or 22)
+        except ValueError:
+            messagebox.showerror("Lỗi", "Vui lòng nhập đúng định dạng số!")
+            return False
+
+        from ..logic.attendance import AttendanceManager
+        month = int(self.month_var.get())
+        year = int(self.year_var.get())
+        attendance = AttendanceManager().get_payroll_attendance(year, month, employee_id).get(employee_id)
+
+        absent_days = max(0, work_days - attendance['actual_work_days']) if attendance else 0
+        overtime_hours = attendance['overtime_hours'] if attendance else 0
+        self.payroll_entries['absent_days'].delete(0, tk.END)
+        self.payroll_entries['absent_days'].insert(0, str(absent_days))
+        self.payroll_entries['overtime_hours'].delete(0, tk.END)
+        self.payroll_entries['overtime_hours'].insert(0, str(overtime_hours))
+        return True
+
+    def refresh_attendance_info(self):
+        """Điền lại dữ liệu chấm công của nhân viên đã tải khi đổi tháng/năm"""
+        if not self.prefill_employee_id:
+            return
+        try:
+            self.fill_attendance_info(self.prefill_employee_id)
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể tải dữ liệu chấm công: {str(e)}")
+
     def calculate_salary(self):
         """Tính toán lương"""
         try:
@@ -887,8 +931,8 @@ class SalaryUI:
             actual_work_days = work_days - absent_days
             payroll_data = self.salary_mgr.calculate_payroll(
                 employee_id=self.payroll_employee_var.get().split(" - ")[0] if self.payroll_employee_var.get() else "",
-                month=datetime.now().month,
-                year=datetime.now().year,
+                month=int(self.month_var.get()),
+                year=int(self.year_var.get()),
                 basic_salary=basic_salary,
                 work_days=work_days,
                 actual_work_days=actual_work_days,
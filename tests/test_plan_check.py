@@ -0,0 +1,53 @@
+import pytest
+
+from src.db.database import DatabaseManager
+from src.db.plan_check import QueryPlanChecker, seed_database
+
+
+@pytest.fixture(scope="module")
+def report(tmp_path_factory):
+    """Chạy workload của plan_check trên database tạm đã có dữ liệu mẫu"""
+    manager = DatabaseManager()
+    manager.close_database()
+    db = manager.get_database(str(tmp_path_factory.mktemp("plan_check") / "plan_check.db"))
+    try:
+        seed_database(db)
+        yield QueryPlanChecker(db).check()
+    finally:
+        manager.close_database()
+
+
+def test_workload_runs_without_errors(report):
+    assert report['errors'] == []
+    assert report['queries']
+
+
+def test_no_regressions_against_baseline(report):
+    baseline = QueryPlanChecker.load_baseline()
+    assert baseline, "Chưa có query_plan_baseline.json"
+    assert QueryPlanChecker.compare(report, baseline) == []
+
+
+def test_compare_reports_lost_index():
+    baseline = {'q': {'full_scans': [], 'indexes': ['idx_a'], 'plan': []}}
+    report = {'queries': {'q': {'full_scans': ['Employees'], 'indexes': [], 'plan': []}}}
+
+    reasons = [item['reason'] for item in QueryPlanChecker.compare(report, baseline)]
+
+    assert len(reasons) == 2
+
+
+def test_schema_qualified_names_are_not_counted(tmp_path, capsys):
+    manager = DatabaseManager()
+    manager.close_database()
+    db = manager.get_database(str(tmp_path / "plan_check.db"))
+    try:
+        checker = QueryPlanChecker(db, large_table_rows=0)
+        # Câu lệnh nội bộ của FTS5 có kế hoạch "SCAN main.EmployeesFts_config"
+        result = checker.analyze("SELECT k, v FROM 'main'.'EmployeesFts_config'")
+    finally:
+        manager.close_database()
+
+    assert 'main' not in checker._table_rows
+    assert "no such table" not in capsys.readouterr().out
+    assert result['full_scans'] == ['EmployeesFts_config']